@@ -0,0 +1,68 @@
+"""
+Carga de request.user sin la columna carrito y con caché por usuario.
+
+AuthenticationMiddleware consulta el usuario en cada petición autenticada.
+Este backend no trae la columna heredada usuarios.carrito (el carrito vive en
+items_carrito y solo lo leen las vistas del carrito) y guarda el registro en
+USUARIO_CACHE_ALIAS durante USUARIO_CACHE_TIMEOUT segundos, así que todas las
+sesiones del usuario se ahorran la consulta. Cualquier cambio al usuario
+(activar, desactivar, convertir_en_admin, remover_admin, editar, borrar o
+cambiar la contraseña) borra la entrada al confirmarse la transacción
+(signals.py).
+
+El registro incluye is_active e is_staff, así que la caché debe ser
+compartida entre procesos: con una local, desactivar a un usuario o quitarle
+el rol de administrador solo borraría la copia del worker que atendió el
+cambio y los demás lo seguirían dejando pasar hasta que expirara.
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from .enrutador import PRIMARIO
+from .models import Usuario
+
+
+def _clave(usuario_id):
+    return f'autenticacion:usuario:{usuario_id}'
+
+
+def _cache():
+    return caches[getattr(settings, 'USUARIO_CACHE_ALIAS', 'compartida')]
+
+
+def _timeout():
+    # Solo un respaldo por si se pierde una invalidación; el valor es corto
+    return getattr(settings, 'USUARIO_CACHE_TIMEOUT', 60)
+
+
+def _usuarios():
+    # Siempre del primario, aunque la vista lea de una réplica (enrutador.py)
+    return Usuario._default_manager.db_manager(PRIMARIO).defer('carrito')
+
+
+def invalidar_usuarios(*usuario_ids):
+    _cache().delete_many([_clave(usuario_id) for usuario_id in usuario_ids])
+
+
+class UsuarioLigeroBackend(ModelBackend):
+    """ModelBackend que carga el usuario sin el carrito y lo guarda en caché"""
+
+    def get_user(self, user_id):
+        clave = _clave(user_id)
+        usuario = _cache().get(clave)
+        if usuario is None:
+            usuario = _usuarios().filter(pk=user_id).first()
+            if usuario is None:
+                return None
+            _cache().set(clave, usuario, _timeout())
+        return usuario if self.user_can_authenticate(usuario) else None
+
+    async def aget_user(self, user_id):
+        clave = _clave(user_id)
+        usuario = await _cache().aget(clave)
+        if usuario is None:
+            usuario = await _usuarios().filter(pk=user_id).afirst()
+            if usuario is None:
+                return None
+            await _cache().aset(clave, usuario, _timeout())
+        return usuario if self.user_can_authenticate(usuario) else None
@@ -0,0 +1,248 @@
+"""
+Búsqueda de productos por nombre, descripción y categoría.
+
+En PostgreSQL usa índices GIN de texto completo (to_tsvector) y de trigramas
+(pg_trgm); en SQLite usa una tabla virtual FTS5 sincronizada con triggers.
+Nunca recurre a icontains: si el motor no tiene índices de búsqueda se
+lanza BusquedaNoDisponible. En SQLite no se revisa antes si existe la tabla
+FTS (sería una consulta más en cada tecla del autocompletado): si falta, el
+error de la consulta se convierte en BusquedaNoDisponible.
+"""
+import re
+from django.db import OperationalError, connection, connections, router
+from .models import Producto
+
+LIMITE_RESULTADOS = 20
+LIMITE_SUGERENCIAS = 8
+
+# Configuración de texto de PostgreSQL
+IDIOMA = 'spanish'
+
+
+NO_DISPONIBLE = 'La búsqueda no está disponible en este motor de base de datos'
+
+
+class BusquedaNoDisponible(Exception):
+    pass
+
+
+def _palabras(texto):
+    return re.findall(r'\w+', (texto or '').lower())[:10]
+
+
+# --- Índices ---------------------------------------------------------------
+
+POSTGRES_INDICES = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    f"""CREATE INDEX IF NOT EXISTS productos_busqueda_idx ON productos
+        USING GIN (to_tsvector('{IDIOMA}', coalesce(nombre, '') || ' ' || coalesce(description, '')))""",
+    """CREATE INDEX IF NOT EXISTS productos_nombre_prefijo_idx ON productos
+        USING GIN (to_tsvector('simple', coalesce(nombre, '')))""",
+    """CREATE INDEX IF NOT EXISTS productos_nombre_trgm_idx ON productos
+        USING GIN (nombre gin_trgm_ops)""",
+    f"""CREATE INDEX IF NOT EXISTS categorias_busqueda_idx ON categorias
+        USING GIN (to_tsvector('{IDIOMA}', coalesce(nombre, '')))""",
+]
+
+POSTGRES_ELIMINAR = [
+    'DROP INDEX IF EXISTS productos_busqueda_idx',
+    'DROP INDEX IF EXISTS productos_nombre_prefijo_idx',
+    'DROP INDEX IF EXISTS productos_nombre_trgm_idx',
+    'DROP INDEX IF EXISTS categorias_busqueda_idx',
+]
+
+_SQLITE_FILA_FTS = """
+    INSERT INTO productos_fts(rowid, nombre, descripcion, categoria)
+    VALUES (new.id, new.nombre, coalesce(new.description, ''),
+            coalesce((SELECT nombre FROM categorias WHERE id = new.categoria_id), ''));
+"""
+
+SQLITE_INDICES = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS productos_fts USING fts5(
+        nombre, descripcion, categoria,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS productos_fts_ai AFTER INSERT ON productos BEGIN
+        {_SQLITE_FILA_FTS}
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS productos_fts_ad AFTER DELETE ON productos BEGIN
+        DELETE FROM productos_fts WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS productos_fts_au
+        AFTER UPDATE OF nombre, description, categoria_id ON productos BEGIN
+        DELETE FROM productos_fts WHERE rowid = old.id;
+        {_SQLITE_FILA_FTS}
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS categorias_fts_au AFTER UPDATE OF nombre ON categorias BEGIN
+        UPDATE productos_fts SET categoria = new.nombre
+        WHERE rowid IN (SELECT id FROM productos WHERE categoria_id = new.id);
+    END""",
+    """INSERT INTO productos_fts(rowid, nombre, descripcion, categoria)
+        SELECT p.id, p.nombre, coalesce(p.description, ''), coalesce(c.nombre, '')
+        FROM productos p LEFT JOIN categorias c ON c.id = p.categoria_id
+        WHERE p.id NOT IN (SELECT rowid FROM productos_fts)""",
+]
+
+SQLITE_ELIMINAR = [
+    'DROP TRIGGER IF EXISTS productos_fts_ai',
+    'DROP TRIGGER IF EXISTS productos_fts_ad',
+    'DROP TRIGGER IF EXISTS productos_fts_au',
+    'DROP TRIGGER IF EXISTS categorias_fts_au',
+    'DROP TABLE IF EXISTS productos_fts',
+]
+
+
+def crear_indices_busqueda(conexion=connection):
+    """Crea los índices de búsqueda del motor actual, si las tablas existen"""
+    with conexion.cursor() as cursor:
+        tablas = conexion.introspection.table_names(cursor)
+        if 'productos' not in tablas or 'categorias' not in tablas:
+            return False
+        if conexion.vendor == 'postgresql':
+            sentencias = POSTGRES_INDICES
+        elif conexion.vendor == 'sqlite':
+            sentencias = SQLITE_INDICES
+        else:
+            return False
+        for sql in sentencias:
+            cursor.execute(sql)
+    return True
+
+
+def eliminar_indices_busqueda(conexion=connection):
+    sentencias = {'postgresql': POSTGRES_ELIMINAR, 'sqlite': SQLITE_ELIMINAR}.get(conexion.vendor, [])
+    with conexion.cursor() as cursor:
+        for sql in sentencias:
+            cursor.execute(sql)
+
+
+def _ejecutar_sqlite(cursor, sql, parametros):
+    try:
+        cursor.execute(sql, parametros)
+    except OperationalError as e:
+        # Sin la tabla de la migración 0007 (o de crear_indices_busqueda)
+        if 'productos_fts' in str(e):
+            raise BusquedaNoDisponible(NO_DISPONIBLE) from e
+        raise
+
+
+def _conexion_lectura():
+    # Las búsquedas son de solo lectura: pueden ir a una réplica (ver enrutador.py)
+    return connections[router.db_for_read(Producto)]
+
+
+# --- Consultas ---------------------------------------------------------------
+
+def buscar_ids(texto, limite=LIMITE_RESULTADOS):
+    """IDs de productos activos ordenados por relevancia"""
+    palabras = _palabras(texto)
+    if not palabras:
+        return []
+
+    conexion = _conexion_lectura()
+    with conexion.cursor() as cursor:
+        if conexion.vendor == 'postgresql':
+            return _buscar_postgres(cursor, ' '.join(palabras), limite)
+        if conexion.vendor == 'sqlite':
+            return _buscar_sqlite(cursor, palabras, limite)
+    raise BusquedaNoDisponible(NO_DISPONIBLE)
+
+
+def autocompletar(prefijo, limite=LIMITE_SUGERENCIAS):
+    """Nombres de productos activos cuyas palabras empiezan con lo escrito"""
+    palabras = _palabras(prefijo)
+    if not palabras:
+        return []
+
+    conexion = _conexion_lectura()
+    with conexion.cursor() as cursor:
+        if conexion.vendor == 'postgresql':
+            consulta = ' & '.join(palabras[:-1] + [palabras[-1] + ':*'])
+            cursor.execute(
+                """
+                SELECT id, nombre FROM productos
+                WHERE activo AND to_tsvector('simple', coalesce(nombre, '')) @@ to_tsquery('simple', %s)
+                ORDER BY length(nombre), nombre
+                LIMIT %s
+                """,
+                [consulta, limite],
+            )
+        elif conexion.vendor == 'sqlite':
+            consulta = ' '.join([f'"{p}"' for p in palabras[:-1]] + [f'"{palabras[-1]}"*'])
+            _ejecutar_sqlite(
+                cursor,
+                """
+                SELECT p.id, p.nombre FROM productos_fts f
+                JOIN productos p ON p.id = f.rowid
+                WHERE productos_fts MATCH %s AND p.activo
+                ORDER BY length(p.nombre), p.nombre
+                LIMIT %s
+                """,
+                [f'nombre : ({consulta})', limite],
+            )
+        else:
+            raise BusquedaNoDisponible(NO_DISPONIBLE)
+        return [{'id': fila[0], 'nombre': fila[1]} for fila in cursor.fetchall()]
+
+
+def _buscar_postgres(cursor, texto, limite):
+    cursor.execute(
+        f"""
+        WITH q AS (SELECT websearch_to_tsquery('{IDIOMA}', %s) AS consulta),
+        por_texto AS (
+            SELECT p.id, ts_rank(
+                to_tsvector('{IDIOMA}', coalesce(p.nombre, '') || ' ' || coalesce(p.description, '')),
+                q.consulta) AS rank
+            FROM productos p, q
+            WHERE p.activo
+              AND to_tsvector('{IDIOMA}', coalesce(p.nombre, '') || ' ' || coalesce(p.description, ''))
+                  @@ q.consulta
+        ),
+        por_categoria AS (
+            SELECT p.id, 0.05 AS rank
+            FROM productos p
+            JOIN categorias c ON c.id = p.categoria_id, q
+            WHERE p.activo AND to_tsvector('{IDIOMA}', coalesce(c.nombre, '')) @@ q.consulta
+        )
+        SELECT id, max(rank) AS rank FROM (
+            SELECT * FROM por_texto UNION ALL SELECT * FROM por_categoria
+        ) r
+        GROUP BY id
+        ORDER BY rank DESC, id
+        LIMIT %s
+        """,
+        [texto, limite],
+    )
+    filas = cursor.fetchall()
+    if filas:
+        return [fila[0] for fila in filas]
+
+    # Sin coincidencias exactas: se intenta por parecido (errores de tecleo) con el índice de trigramas
+    cursor.execute(
+        """
+        SELECT id FROM productos
+        WHERE activo AND nombre %% %s
+        ORDER BY similarity(nombre, %s) DESC, id
+        LIMIT %s
+        """,
+        [texto, texto, limite],
+    )
+    return [fila[0] for fila in cursor.fetchall()]
+
+
+def _buscar_sqlite(cursor, palabras, limite):
+    consulta = ' '.join(f'"{p}"' for p in palabras)
+    # bm25 devuelve valores más bajos para mejores coincidencias; pesos: nombre, descripción, categoría
+    _ejecutar_sqlite(
+        cursor,
+        """
+        SELECT p.id FROM productos_fts f
+        JOIN productos p ON p.id = f.rowid
+        WHERE productos_fts MATCH %s AND p.activo
+        ORDER BY bm25(productos_fts, 10.0, 2.0, 4.0), p.id
+        LIMIT %s
+        """,
+        [consulta, limite],
+    )
+    return [fila[0] for fila in cursor.fetchall()]
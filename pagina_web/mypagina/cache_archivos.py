@@ -0,0 +1,59 @@
+"""
+Caché en archivos para las sesiones y las cachés compartidas entre procesos.
+
+FileBasedCache de Django lista el directorio completo en cada set() para
+saber si pasó de MAX_ENTRIES, y al llegar al límite borra un tercio de las
+entradas al azar, vencidas o no. Con las sesiones eso cuesta O(sesiones) en
+cada petición que guarda la sesión y, al llenarse, cierra la sesión a
+usuarios activos mientras los archivos vencidos siguen en el disco (solo se
+borran cuando alguien los vuelve a leer).
+
+CacheArchivos revisa el tamaño en promedio una de cada OPTIONS['REVISAR_CADA']
+escrituras (100 por defecto) y, si se pasó del límite, borra primero lo
+vencido y después lo escrito hace más tiempo. limpiar_sesiones llama a
+borrar_vencidos() para no esperar a llenar la caché.
+"""
+import os
+import random
+from django.core.cache.backends.filebased import FileBasedCache
+
+
+class CacheArchivos(FileBasedCache):
+    """FileBasedCache que recorre el directorio pocas veces y descarta lo vencido antes que lo vigente"""
+
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        self._revisar_cada = max(1, int(params.get('OPTIONS', {}).get('REVISAR_CADA', 100)))
+
+    def _vencido(self, ruta):
+        """Borra el archivo si ya venció; False si otro proceso lo borró antes"""
+        try:
+            with open(ruta, 'rb') as archivo:
+                return self._is_expired(archivo)
+        except (FileNotFoundError, EOFError):
+            return False
+
+    def borrar_vencidos(self):
+        """Borra todas las entradas vencidas y devuelve cuántas eran"""
+        return sum(self._vencido(ruta) for ruta in self._list_cache_files())
+
+    def _cull(self):
+        if random.random() * self._revisar_cada >= 1:
+            return
+        archivos = self._list_cache_files()
+        if len(archivos) < self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            return self.clear()
+
+        vigentes = [ruta for ruta in archivos if not self._vencido(ruta)]
+        if len(vigentes) < self._max_entries:
+            return
+        fechas = {}
+        for ruta in vigentes:
+            try:
+                fechas[ruta] = os.path.getmtime(ruta)
+            except FileNotFoundError:
+                pass
+        for ruta in sorted(fechas, key=fechas.get)[:len(vigentes) // self._cull_frequency]:
+            self._delete(ruta)
@@ -0,0 +1,136 @@
+"""
+Caché del catálogo de la tienda con claves versionadas.
+
+Cada categoría tiene su propio número de versión; las listas de productos se
+guardan bajo una clave que incluye esa versión, así que al cambiar un
+producto basta con incrementar la versión de su categoría y las entradas
+viejas simplemente dejan de leerse y expiran solas.
+"""
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+from .enrutador import PRIMARIO
+from .models import Categoria, Producto
+
+VERSION_CATEGORIAS = 'catalogo:version:categorias'
+# Cambia con cualquier producto de cualquier categoría (tabla del inventario)
+VERSION_PRODUCTOS = 'catalogo:version:productos'
+
+
+def _cache():
+    try:
+        return caches['catalogo']
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+def _timeout():
+    return getattr(settings, 'CATALOGO_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def _clave_version_categoria(categoria_id):
+    return f'catalogo:version:categoria:{categoria_id}'
+
+
+def _version_nueva():
+    # Se parte del reloj para que una versión que se perdió (caché vaciada o
+    # desalojada) nunca vuelva a un número que ya tenga datos viejos guardados
+    return time.time_ns()
+
+
+def _version(clave):
+    cache = _cache()
+    version = cache.get(clave)
+    if version is None:
+        cache.add(clave, _version_nueva(), None)
+        version = cache.get(clave)
+    return version
+
+
+def _incrementar(clave):
+    cache = _cache()
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.set(clave, _version_nueva(), None)
+
+
+def version_categorias():
+    return _version(VERSION_CATEGORIAS)
+
+
+def version_categoria(categoria_id):
+    return _version(_clave_version_categoria(categoria_id))
+
+
+def version_productos():
+    return _version(VERSION_PRODUCTOS)
+
+
+def obtener_categorias():
+    """Todas las categorías, en el orden de la base de datos"""
+    cache = _cache()
+    clave = f'catalogo:categorias:v{_version(VERSION_CATEGORIAS)}'
+    categorias = cache.get(clave)
+    if categorias is None:
+        # Del primario aunque la vista lea de réplica (ver enrutador.py)
+        categorias = list(Categoria.objects.using(PRIMARIO))
+        cache.set(clave, categorias, _timeout())
+    return categorias
+
+
+def obtener_categoria(categoria_id):
+    """Busca la categoría en la lista cacheada; None si no existe"""
+    try:
+        categoria_id = int(categoria_id)
+    except (TypeError, ValueError):
+        return None
+    for categoria in obtener_categorias():
+        if categoria.id == categoria_id:
+            return categoria
+    return None
+
+
+# Datos de presentación por categoría, guardados en memoria del proceso
+_datos_categorias = {'version': None, 'datos': {}}
+
+
+def datos_categoria(categoria_id):
+    """{'nombre', 'emoji'} de una categoría sin consultar la base de datos en cada producto"""
+    version = _version(VERSION_CATEGORIAS)
+    if _datos_categorias['version'] != version:
+        _datos_categorias['datos'] = {
+            categoria.id: {'nombre': categoria.nombre, 'emoji': categoria.emoji}
+            for categoria in obtener_categorias()
+        }
+        _datos_categorias['version'] = version
+    return _datos_categorias['datos'].get(categoria_id)
+
+
+def obtener_productos(categoria):
+    """Productos activos de una categoría"""
+    cache = _cache()
+    version = _version(_clave_version_categoria(categoria.id))
+    clave = f'catalogo:productos:{categoria.id}:v{version}'
+    productos = cache.get(clave)
+    if productos is None:
+        productos = list(
+            Producto.objects.using(PRIMARIO).filter(categoria_id=categoria.id, activo=True)
+            .select_related('categoria')
+        )
+        cache.set(clave, productos, _timeout())
+    return productos
+
+
+def invalidar_categoria(*categoria_ids):
+    """Marca como viejos los productos cacheados de las categorías indicadas"""
+    for categoria_id in set(categoria_ids):
+        if categoria_id is not None:
+            _incrementar(_clave_version_categoria(categoria_id))
+    _incrementar(VERSION_PRODUCTOS)
+
+
+def invalidar_categorias():
+    """Marca como vieja la lista de categorías"""
+    _incrementar(VERSION_CATEGORIAS)
@@ -0,0 +1,24 @@
+"""Revisiones de manage.py check propias de la tienda"""
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Tags, Warning, register
+from django.utils.module_loading import import_string
+
+# Cachés que se invalidan desde un worker y se leen desde otro
+CACHES_ENTRE_PROCESOS = ('catalogo', 'sesiones', 'compartida')
+
+
+@register(Tags.caches, deploy=True)
+def revisar_caches_compartidas(app_configs, **kwargs):
+    """Una caché local a cada proceso solo sirve con un único worker (runserver)"""
+    avisos = []
+    for alias in CACHES_ENTRE_PROCESOS:
+        configuracion = settings.CACHES.get(alias)
+        if configuracion and issubclass(import_string(configuracion['BACKEND']), LocMemCache):
+            avisos.append(Warning(
+                f"La caché '{alias}' es LocMemCache: cada worker tiene la suya y las "
+                'invalidaciones de un proceso no llegan a los demás.',
+                hint='Úsala solo con un único proceso; con varios workers configúrala en archivos o Redis.',
+                id='mypagina.W001',
+            ))
+    return avisos
@@ -0,0 +1,101 @@
+"""Proceso de compra: convierte el carrito en un pedido y descuenta el inventario"""
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from .models import Pedido, Producto
+from .estadisticas import invalidar_estadisticas_productos
+from . import catalogo
+from .precios import calcular_totales
+
+
+class CarritoVacio(Exception):
+    pass
+
+
+class StockInsuficiente(Exception):
+    def __init__(self, lineas):
+        super().__init__('Stock insuficiente')
+        self.lineas = lineas
+
+
+def descontar_stock(cantidades):
+    """
+    Descuenta {producto_id: cantidad} con un solo UPDATE condicional.
+    Devuelve True solo si todas las líneas tenían stock suficiente; debe
+    llamarse dentro de una transacción para poder revertir si falla alguna.
+    """
+    cantidad = Case(
+        *[When(id=producto_id, then=Value(c)) for producto_id, c in cantidades.items()],
+        output_field=IntegerField(),
+    )
+    actualizados = Producto.objects.filter(
+        id__in=list(cantidades),
+        activo=True,
+        stock__gte=cantidad,
+    ).update(stock=F('stock') - cantidad)
+
+    # update() no dispara post_save: se invalidan a mano los contadores y el catálogo
+    categoria_ids = list(
+        Producto.objects.filter(id__in=list(cantidades)).values_list('categoria_id', flat=True).distinct()
+    )
+    transaction.on_commit(invalidar_estadisticas_productos)
+    transaction.on_commit(lambda: catalogo.invalidar_categoria(*categoria_ids))
+    return actualizados == len(cantidades)
+
+
+def _descontar_o_revertir(cantidades):
+    """descontar_stock dentro de un savepoint que se deshace si falta stock"""
+    with transaction.atomic():
+        if descontar_stock(cantidades):
+            return True
+        transaction.set_rollback(True)
+    return False
+
+
+def lineas_sin_stock(items):
+    """
+    Líneas del carrito que no se pueden surtir con el stock actual. Bloquea
+    los productos, así que el resultado vale hasta el final de la transacción.
+    """
+    productos = {
+        p['id']: p
+        for p in Producto.objects.select_for_update().filter(id__in=[item.producto_id for item in items])
+        .order_by('id').values('id', 'stock', 'activo')
+    }
+    lineas = []
+    for item in items:
+        producto = productos.get(item.producto_id)
+        disponible = producto['stock'] if producto and producto['activo'] else 0
+        if disponible < item.cantidad:
+            lineas.append({
+                'id': item.producto_id,
+                'nombre': item.nombre,
+                'solicitado': item.cantidad,
+                'disponible': max(disponible, 0),
+            })
+    return lineas
+
+
+def procesar_compra(usuario):
+    """Convierte el carrito del usuario en un pedido y descuenta el inventario"""
+    with transaction.atomic():
+        items = list(usuario.items_carrito.select_for_update().order_by('producto_id'))
+        if not items:
+            raise CarritoVacio()
+
+        cantidades = {item.producto_id: item.cantidad for item in items}
+        if not _descontar_o_revertir(cantidades):
+            # Se revisa dentro de la transacción y con los productos bloqueados.
+            # Si alguien reabasteció después del UPDATE no falta nada y el
+            # segundo intento ya no puede fallar.
+            sin_stock = lineas_sin_stock(items)
+            if sin_stock or not _descontar_o_revertir(cantidades):
+                raise StockInsuficiente(sin_stock)
+
+        totales = calcular_totales(
+            sum(item.cantidad * item.precio for item in items),
+            sum(item.cantidad for item in items),
+        )
+        pedido = Pedido.objects.crear_desde_items(usuario, items, totales)
+        usuario.retirar_items_carrito(items)
+
+    return pedido
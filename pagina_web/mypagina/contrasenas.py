@@ -0,0 +1,129 @@
+"""
+Hash y verificación de contraseñas fuera del bucle de eventos.
+
+PBKDF2 tarda decenas de milisegundos por contraseña; las vistas asíncronas
+de inicio de sesión y registro lo calculan en un pool de hilos acotado
+(hashlib libera el GIL mientras calcula) para que una ráfaga de logins no
+detenga el tráfico del carrito y el catálogo del mismo worker.
+
+Como máximo CONTRASENAS_MAX_CONCURRENCIA hashes se calculan a la vez y
+CONTRASENAS_MAX_COLA esperan turno; por encima de eso se rechaza la
+petición con PoolSaturado en lugar de acumular esperas sin límite.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+
+_bloqueo = threading.Lock()
+_pool = {'executor': None}
+_metricas = {
+    'en_curso': 0,
+    'en_cola': 0,
+    'completadas': 0,
+    'rechazadas': 0,
+    'espera_total': 0.0,
+    'espera_maxima': 0.0,
+    'calculo_total': 0.0,
+}
+
+
+class PoolSaturado(Exception):
+    pass
+
+
+def _concurrencia():
+    return getattr(settings, 'CONTRASENAS_MAX_CONCURRENCIA', os.cpu_count() or 1)
+
+
+def _max_cola():
+    return getattr(settings, 'CONTRASENAS_MAX_COLA', 64)
+
+
+def _executor():
+    with _bloqueo:
+        if _pool['executor'] is None:
+            _pool['executor'] = ThreadPoolExecutor(
+                max_workers=_concurrencia(), thread_name_prefix='contrasenas'
+            )
+        return _pool['executor']
+
+
+async def _ejecutar(funcion, *args):
+    with _bloqueo:
+        if _metricas['en_cola'] >= _max_cola():
+            _metricas['rechazadas'] += 1
+            raise PoolSaturado('Hay demasiados inicios de sesión en curso, intenta de nuevo en unos segundos')
+        _metricas['en_cola'] += 1
+    encolada = time.perf_counter()
+
+    def tarea():
+        inicio = time.perf_counter()
+        with _bloqueo:
+            _metricas['en_cola'] -= 1
+            _metricas['en_curso'] += 1
+            _metricas['espera_total'] += inicio - encolada
+            _metricas['espera_maxima'] = max(_metricas['espera_maxima'], inicio - encolada)
+        try:
+            return funcion(*args)
+        finally:
+            with _bloqueo:
+                _metricas['en_curso'] -= 1
+                _metricas['completadas'] += 1
+                _metricas['calculo_total'] += time.perf_counter() - inicio
+
+    def al_terminar(futuro):
+        # Cancelada antes de empezar (el cliente se fue mientras esperaba
+        # turno): tarea() no corrió y el lugar en la cola se libera aquí
+        if futuro.cancelled():
+            with _bloqueo:
+                _metricas['en_cola'] -= 1
+
+    try:
+        futuro = _executor().submit(tarea)
+    except BaseException:
+        with _bloqueo:
+            _metricas['en_cola'] -= 1
+        raise
+    futuro.add_done_callback(al_terminar)
+    return await asyncio.wrap_future(futuro)
+
+
+async def cifrar(contrasena):
+    """Equivalente asíncrono de make_password"""
+    return await _ejecutar(make_password, contrasena)
+
+
+async def verificar(usuario, contrasena):
+    """
+    Equivalente asíncrono de usuario.check_password. Si el hash usa un
+    algoritmo o número de iteraciones viejo se recalcula y se guarda.
+    """
+    desactualizada = []
+    correcta = await _ejecutar(check_password, contrasena, usuario.password, desactualizada.append)
+    if correcta and desactualizada:
+        usuario.password = await cifrar(contrasena)
+        await usuario.asave(update_fields=['password'])
+    return correcta
+
+
+def metricas():
+    """Estado del pool: ocupación, cola y tiempos promedio en milisegundos"""
+    with _bloqueo:
+        datos = dict(_metricas)
+    atendidas = datos['completadas'] + datos['en_curso']
+    return {
+        'max_concurrencia': _concurrencia(),
+        'max_cola': _max_cola(),
+        'en_curso': datos['en_curso'],
+        'en_cola': datos['en_cola'],
+        'completadas': datos['completadas'],
+        'rechazadas': datos['rechazadas'],
+        'espera_promedio_ms': round(datos['espera_total'] / atendidas * 1000, 2) if atendidas else 0.0,
+        'espera_maxima_ms': round(datos['espera_maxima'] * 1000, 2),
+        'calculo_promedio_ms': round(datos['calculo_total'] / datos['completadas'] * 1000, 2)
+        if datos['completadas'] else 0.0,
+    }
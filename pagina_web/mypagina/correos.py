@@ -0,0 +1,172 @@
+"""
+Comprobación rápida de si un correo ya está registrado.
+
+Cada proceso mantiene un filtro de Bloom con los correos normalizados
+(sin espacios y en minúsculas). Si el filtro dice que un correo no está,
+seguro que no está y no se consulta la base de datos; si dice que puede
+estar, se confirma con una búsqueda por LOWER(email), que usa el índice
+usuarios_email_lower_idx.
+
+El filtro no admite borrados y otro proceso puede registrar o editar
+usuarios que este no ha visto. Cada alta y cada cambio de correo confirmado
+incrementa un contador en CORREOS_CACHE_ALIAS (una caché compartida entre
+procesos): si cambió el de altas se agregan los usuarios con id mayor al
+último conocido y si cambió el de ediciones se reconstruye el filtro, porque
+el correo nuevo puede tener un id ya cargado. Leer los dos contadores es una
+sola consulta a la caché por comprobación. Como respaldo (p. ej. si la caché
+perdió los contadores) se revisan las altas cada pocos segundos y se
+reconstruye todo cada cierto tiempo.
+"""
+import hashlib
+import math
+import threading
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.functions import Lower
+from .models import Usuario
+from .paginacion import recorrer_por_lotes
+
+TASA_FALSOS_POSITIVOS = 0.01
+CAPACIDAD_MINIMA = 10000
+TAMANO_LOTE = 5000
+CLAVE_ALTAS = 'correos:altas'
+CLAVE_EDICIONES = 'correos:ediciones'
+
+
+def normalizar_email(email):
+    return (email or '').strip().lower()
+
+
+class FiltroBloom:
+    """Conjunto probabilístico: puede dar falsos positivos, nunca falsos negativos"""
+
+    def __init__(self, capacidad, tasa_error=TASA_FALSOS_POSITIVOS):
+        self.capacidad = capacidad
+        self.num_bits = max(8, math.ceil(-capacidad * math.log(tasa_error) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacidad * math.log(2)))
+        self.bits = bytearray(math.ceil(self.num_bits / 8))
+        self.elementos = 0
+
+    def _posiciones(self, valor):
+        # Doble hashing: k posiciones a partir de un solo resumen de 128 bits
+        resumen = hashlib.blake2b(valor.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(resumen[:8], 'little')
+        h2 = int.from_bytes(resumen[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def agregar(self, valor):
+        for posicion in self._posiciones(valor):
+            self.bits[posicion >> 3] |= 1 << (posicion & 7)
+        self.elementos += 1
+
+    def __contains__(self, valor):
+        return all(self.bits[posicion >> 3] & (1 << (posicion & 7)) for posicion in self._posiciones(valor))
+
+    @property
+    def lleno(self):
+        return self.elementos > self.capacidad
+
+
+_estado = {'filtro': None, 'ultimo_id': 0, 'construido': 0.0, 'revisado': 0.0, 'altas': None, 'ediciones': None}
+_bloqueo = threading.Lock()
+
+
+def _segundos_refresco():
+    return getattr(settings, 'CORREOS_FILTRO_REFRESCO', 30)
+
+
+def _segundos_reconstruccion():
+    return getattr(settings, 'CORREOS_FILTRO_RECONSTRUCCION', 60 * 60)
+
+
+def _cache():
+    return caches[getattr(settings, 'CORREOS_CACHE_ALIAS', 'compartida')]
+
+
+def _contadores():
+    valores = _cache().get_many([CLAVE_ALTAS, CLAVE_EDICIONES])
+    return valores.get(CLAVE_ALTAS), valores.get(CLAVE_EDICIONES)
+
+
+def _incrementar(clave):
+    cache = _cache()
+    try:
+        cache.incr(clave)
+    except ValueError:
+        # Sin contador (primera vez o desalojado): cualquier valor distinto al
+        # que recuerdan los procesos sirve para que lo noten
+        cache.set(clave, time.time_ns(), None)
+
+
+def avisar_alta():
+    """Llamar al confirmar un usuario nuevo: los demás procesos lo cargarán"""
+    _incrementar(CLAVE_ALTAS)
+
+
+def avisar_edicion():
+    """Llamar al confirmar un cambio de correo: los demás procesos reconstruirán su filtro"""
+    _incrementar(CLAVE_EDICIONES)
+
+
+def _cargar(filtro, usuarios):
+    ultimo_id = 0
+    for fila in recorrer_por_lotes(usuarios.values('id', 'email'), TAMANO_LOTE):
+        filtro.agregar(normalizar_email(fila['email']))
+        ultimo_id = fila['id']
+    return ultimo_id
+
+
+def reconstruir_filtro():
+    """Vuelve a leer todos los correos; descarta los de usuarios eliminados"""
+    with _bloqueo:
+        # Los contadores se leen antes que la tabla: un cambio posterior se notará
+        altas, ediciones = _contadores()
+        filtro = FiltroBloom(max(CAPACIDAD_MINIMA, Usuario.objects.count() * 2))
+        ultimo_id = _cargar(filtro, Usuario.objects.all())
+        ahora = time.monotonic()
+        _estado.update(filtro=filtro, ultimo_id=ultimo_id, construido=ahora, revisado=ahora,
+                       altas=altas, ediciones=ediciones)
+    return filtro
+
+
+def _filtro():
+    ahora = time.monotonic()
+    filtro = _estado['filtro']
+    altas, ediciones = _contadores()
+    if (filtro is None or filtro.lleno or ediciones != _estado['ediciones']
+            or ahora - _estado['construido'] > _segundos_reconstruccion()):
+        return reconstruir_filtro()
+
+    def pendiente():
+        return altas != _estado['altas'] or ahora - _estado['revisado'] > _segundos_refresco()
+
+    if pendiente():
+        with _bloqueo:
+            if pendiente():
+                nuevos = Usuario.objects.filter(id__gt=_estado['ultimo_id'])
+                _estado['ultimo_id'] = max(_estado['ultimo_id'], _cargar(filtro, nuevos))
+                _estado.update(revisado=time.monotonic(), altas=altas)
+    return filtro
+
+
+def registrar_email(email):
+    """Agrega un correo nuevo o editado al filtro de este proceso"""
+    filtro = _estado['filtro']
+    if filtro is not None:
+        filtro.agregar(normalizar_email(email))
+
+
+def email_en_base_de_datos(email):
+    """Búsqueda sin distinguir mayúsculas, siempre contra la base de datos"""
+    return Usuario.objects.alias(email_normalizado=Lower('email')).filter(
+        email_normalizado=normalizar_email(email)
+    ).exists()
+
+
+def email_registrado(email):
+    """True si el correo ya pertenece a algún usuario"""
+    email = normalizar_email(email)
+    if not email or email not in _filtro():
+        return False
+    return email_en_base_de_datos(email)
@@ -0,0 +1,108 @@
+"""
+Réplicas de lectura.
+
+Las vistas de solo lectura del catálogo y de los reportes del panel
+(@lectura_en_replica) leen de una de las réplicas configuradas en
+settings.DATABASES. Todo lo demás va a 'default': escrituras, carrito,
+sesiones, autenticación y cualquier lectura dentro de una transacción.
+
+Una réplica puede ir atrasada, así que después de una petición que modifica
+datos el navegador recibe la cookie REPLICA_COOKIE por REPLICA_PEGAJOSIDAD
+segundos y mientras la tenga todas sus lecturas van al primario: quien acaba
+de crear o editar un producto lo ve en el inventario de inmediato.
+
+Lo que se guarda en caché (catalogo.py, estadisticas.py y los datos de los
+fragmentos {% cache %}) se lee siempre con .using(PRIMARIO): se guarda bajo la
+versión recién incrementada y por horas, así que un dato atrasado de la
+réplica quedaría servido mucho más allá del atraso de la réplica.
+"""
+import contextvars
+import random
+from django.conf import settings
+from django.db import connections
+
+PRIMARIO = 'default'
+METODOS_SEGUROS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+# Se leen siempre del primario aunque la vista use réplica
+MODELOS_PRIMARIO = {'mypagina.itemcarrito', 'mypagina.resumencarrito', 'sessions.session'}
+
+_leer_de_replica = contextvars.ContextVar('leer_de_replica', default=False)
+
+
+def replicas():
+    return [alias for alias in settings.DATABASES if alias != PRIMARIO]
+
+
+def _cookie():
+    return getattr(settings, 'REPLICA_COOKIE', 'leer_primario')
+
+
+def _pegajosidad():
+    return getattr(settings, 'REPLICA_PEGAJOSIDAD', 10)
+
+
+def lectura_en_replica(vista):
+    """Marca una vista de solo lectura; va justo encima del def, debajo de los demás decoradores"""
+    vista.lectura_en_replica = True
+    return vista
+
+
+class EnrutadorReplicas:
+    def db_for_read(self, model, **hints):
+        if not _leer_de_replica.get() or model._meta.label_lower in MODELOS_PRIMARIO:
+            return PRIMARIO
+        disponibles = replicas()
+        if not disponibles or connections[PRIMARIO].in_atomic_block:
+            return PRIMARIO
+        return random.choice(disponibles)
+
+    def db_for_write(self, model, **hints):
+        return PRIMARIO
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Las réplicas tienen los mismos datos que el primario
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARIO
+
+
+def _en_replica(contenido):
+    """Las respuestas en streaming consultan mientras se envían, después de la vista"""
+    _leer_de_replica.set(True)
+    try:
+        yield from contenido
+    finally:
+        _leer_de_replica.set(False)
+
+
+class ReplicasMiddleware:
+    """Activa las réplicas en las vistas marcadas y fija al primario a quien acaba de escribir"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.lectura_en_replica = False
+        try:
+            response = self.get_response(request)
+        finally:
+            _leer_de_replica.set(False)
+
+        if not replicas():
+            return response
+        if request.lectura_en_replica and response.streaming:
+            response.streaming_content = _en_replica(response.streaming_content)
+        if request.method not in METODOS_SEGUROS and response.status_code < 400:
+            response.set_cookie(_cookie(), '1', max_age=_pegajosidad(), httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, vista, args, kwargs):
+        request.lectura_en_replica = (
+            getattr(vista, 'lectura_en_replica', False)
+            and request.method in METODOS_SEGUROS
+            and _cookie() not in request.COOKIES
+            and bool(replicas())
+        )
+        _leer_de_replica.set(request.lectura_en_replica)
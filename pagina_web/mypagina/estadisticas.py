@@ -0,0 +1,57 @@
+"""
+Contadores del panel de administración, calculados en una sola consulta y
+cacheados en ESTADISTICAS_CACHE_ALIAS. Esa caché debe ser compartida entre
+procesos: las señales invalidan los contadores desde el worker que hizo el
+cambio y los demás tienen que ver lo mismo. Se calculan siempre en el
+primario, aunque la vista lea de una réplica (ver enrutador.py).
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, Q
+from .enrutador import PRIMARIO
+from .models import Producto, Usuario
+
+CLAVE_PRODUCTOS = 'estadisticas:productos'
+CLAVE_USUARIOS = 'estadisticas:usuarios'
+
+
+def _cache():
+    return caches[getattr(settings, 'ESTADISTICAS_CACHE_ALIAS', 'default')]
+
+
+def _timeout():
+    return getattr(settings, 'ESTADISTICAS_CACHE_TIMEOUT', 60 * 60)
+
+
+def estadisticas_productos():
+    """total_productos, productos_bajo_stock y productos_agotados"""
+    datos = _cache().get(CLAVE_PRODUCTOS)
+    if datos is None:
+        datos = Producto.objects.using(PRIMARIO).aggregate(
+            total_productos=Count('id'),
+            productos_bajo_stock=Count('id', filter=Q(stock__lt=10)),
+            productos_agotados=Count('id', filter=Q(stock=0)),
+        )
+        _cache().set(CLAVE_PRODUCTOS, datos, _timeout())
+    return datos
+
+
+def estadisticas_usuarios():
+    """total_usuarios, usuarios_activos y administradores"""
+    datos = _cache().get(CLAVE_USUARIOS)
+    if datos is None:
+        datos = Usuario.objects.using(PRIMARIO).aggregate(
+            total_usuarios=Count('id'),
+            usuarios_activos=Count('id', filter=Q(is_active=True)),
+            administradores=Count('id', filter=Q(is_staff_field=1)),
+        )
+        _cache().set(CLAVE_USUARIOS, datos, _timeout())
+    return datos
+
+
+def invalidar_estadisticas_productos():
+    _cache().delete(CLAVE_PRODUCTOS)
+
+
+def invalidar_estadisticas_usuarios():
+    _cache().delete(CLAVE_USUARIOS)
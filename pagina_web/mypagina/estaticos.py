@@ -0,0 +1,382 @@
+"""
+Archivos estáticos para producción.
+
+manage.py construir_estaticos (o collectstatic) usa AlmacenEstaticos, que:
+  1. minifica los .css y .js de la tienda copiados a STATIC_ROOT,
+  2. arma los paquetes de settings.PAQUETES_ESTATICOS uniendo sus fuentes,
+  3. agrega el hash del contenido al nombre (ManifestStaticFilesStorage) y
+  4. deja junto a cada archivo con hash sus versiones .gz y .br.
+
+EstaticosMiddleware sirve esos archivos desde STATIC_ROOT con la variante
+comprimida que acepte el navegador. Los nombres con hash cambian cuando cambia
+el contenido, así que se mandan con Cache-Control immutable por un año.
+
+Todo funciona sin conexión: los minificadores son propios y brotli es
+opcional (si el módulo no está instalado solo se generan los .gz).
+"""
+import gzip
+import mimetypes
+import os
+import re
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.core.files.base import ContentFile
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Solo los archivos propios; los de django.contrib.admin ya vienen minificados
+PREFIJOS_MINIFICABLES = ('css/', 'js/')
+COMPRIMIBLES = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.map')
+# Por debajo de esto la cabecera Content-Encoding cuesta más de lo que se ahorra
+TAMANO_MINIMO_COMPRESION = 256
+CACHE_INMUTABLE = 'public, max-age=31536000, immutable'
+
+
+# --- Minificación --------------------------------------------------------
+
+_TOKENS_CSS = re.compile(r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|(/\*.*?\*/)|(\s+)|([{};,>():]|[^"'/\s{};,>():]+|/)""", re.S)
+# Sin espacio antes ni después; ':' solo después porque "a :hover" no es "a:hover"
+_CSS_SIN_ESPACIO_ANTES = set('{};,>)')
+_CSS_SIN_ESPACIO_DESPUES = set('{};,>(:')
+
+
+def minificar_css(texto):
+    """Quita comentarios y espacios sobrantes; no toca el contenido de las cadenas"""
+    partes = []
+    for cadena, comentario, espacio, otro in _TOKENS_CSS.findall(texto):
+        if comentario:
+            continue
+        if espacio:
+            if partes and partes[-1] != ' ':
+                partes.append(' ')
+            continue
+        if otro == '}':
+            while partes and partes[-1] == ' ':
+                partes.pop()
+            if partes and partes[-1] == ';':
+                partes.pop()
+        partes.append(cadena or otro)
+
+    salida = []
+    for i, parte in enumerate(partes):
+        if parte == ' ':
+            anterior = salida[-1][-1] if salida else ''
+            siguiente = partes[i + 1][0] if i + 1 < len(partes) else ''
+            if (not anterior or not siguiente or anterior in _CSS_SIN_ESPACIO_DESPUES
+                    or siguiente in _CSS_SIN_ESPACIO_ANTES):
+                continue
+        salida.append(parte)
+    return ''.join(salida) + '\n'
+
+
+# Después de estos caracteres o palabras un '/' empieza una expresión regular
+_ANTES_DE_REGEX = set('(,=:[!&|?{};+-*%<>~^')
+_PALABRAS_ANTES_DE_REGEX = {
+    'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete', 'void', 'throw',
+    'instanceof', 'yield', 'await',
+}
+# Un salto de línea junto a estos caracteres nunca activa la inserción automática
+# de ';'. No están '+', '-' ni '/': pueden cerrar "a++" o una expresión regular.
+_JS_SALTO_INNECESARIO_ANTES = set('{;,([=*%<>!&|?:')
+_JS_SALTO_INNECESARIO_DESPUES = set('}]),;.=?:')
+# Pares que al juntarse cambiarían de significado ("a + +b" no es "a++b")
+_JS_PARES_SEPARADOS = {'++', '--', '//', '/*', '*/'}
+
+
+def _es_identificador(caracter):
+    return caracter.isalnum() or caracter in '_$\\' or ord(caracter) > 127
+
+
+def _leer_cadena(texto, i):
+    """Índice después de la cadena que empieza en texto[i]"""
+    comilla = texto[i]
+    i += 1
+    while i < len(texto) and texto[i] != comilla and texto[i] != '\n':
+        i += 2 if texto[i] == '\\' else 1
+    return i + 1
+
+
+def _leer_regex(texto, i):
+    en_clase = False
+    i += 1
+    while i < len(texto) and texto[i] != '\n':
+        caracter = texto[i]
+        if caracter == '\\':
+            i += 2
+            continue
+        if caracter == '[':
+            en_clase = True
+        elif caracter == ']':
+            en_clase = False
+        elif caracter == '/' and not en_clase:
+            i += 1
+            break
+        i += 1
+    while i < len(texto) and _es_identificador(texto[i]):
+        i += 1
+    return i
+
+
+def minificar_js(texto):
+    """
+    Quita comentarios, sangría y espacios sobrantes. Es conservador: no
+    renombra nada y conserva los saltos de línea de los que depende la
+    inserción automática de ';'. Las cadenas, plantillas `...` y
+    expresiones regulares se copian tal cual.
+    """
+    salida = []
+    # Profundidad de llaves de cada ${ ... } abierto dentro de una plantilla
+    plantillas = []
+    pendiente = ''   # espacio (' ' o '\n') entre el último token y el siguiente
+    palabra = ''     # último identificador, para distinguir '/' de una regex
+    i = 0
+    n = len(texto)
+
+    def emitir(token):
+        nonlocal pendiente
+        if pendiente and salida:
+            anterior, siguiente = salida[-1][-1], token[0]
+            if (anterior + siguiente) in _JS_PARES_SEPARADOS:
+                salida.append(' ')
+            elif pendiente == '\n' and not (anterior in _JS_SALTO_INNECESARIO_ANTES
+                                            or siguiente in _JS_SALTO_INNECESARIO_DESPUES):
+                salida.append('\n')
+            elif _es_identificador(anterior) and _es_identificador(siguiente):
+                salida.append(' ')
+        pendiente = ''
+        salida.append(token)
+
+    def leer_plantilla(i):
+        """Copia una plantilla `...` hasta su cierre o hasta el siguiente ${"""
+        inicio = i
+        i += 1
+        while i < n:
+            if texto[i] == '\\':
+                i += 2
+            elif texto[i] == '`':
+                return texto[inicio:i + 1], i + 1, False
+            elif texto.startswith('${', i):
+                return texto[inicio:i + 2], i + 2, True
+            else:
+                i += 1
+        return texto[inicio:], n, False
+
+    while i < n:
+        caracter = texto[i]
+        if caracter.isspace():
+            if caracter == '\n' or pendiente == '\n':
+                pendiente = '\n'
+            else:
+                pendiente = pendiente or ' '
+            i += 1
+        elif texto.startswith('//', i):
+            fin = texto.find('\n', i)
+            i = n if fin == -1 else fin
+        elif texto.startswith('/*', i):
+            fin = texto.find('*/', i + 2)
+            i = n if fin == -1 else fin + 2
+            pendiente = pendiente or ' '
+        elif caracter in '\'"':
+            fin = _leer_cadena(texto, i)
+            emitir(texto[i:fin])
+            palabra = ''
+            i = fin
+        elif caracter == '`':
+            token, i, abierta = leer_plantilla(i)
+            emitir(token)
+            if abierta:
+                plantillas.append(0)
+            palabra = ''
+        elif caracter == '}' and plantillas and plantillas[-1] == 0:
+            # Cierre de ${ ... }: sigue el texto de la plantilla
+            plantillas.pop()
+            token, i, abierta = leer_plantilla(i)
+            emitir('}' + token[1:])
+            if abierta:
+                plantillas.append(0)
+            palabra = ''
+        elif caracter == '/':
+            anterior = salida[-1][-1] if salida else ''
+            if not anterior or anterior in _ANTES_DE_REGEX or palabra in _PALABRAS_ANTES_DE_REGEX:
+                fin = _leer_regex(texto, i)
+                emitir(texto[i:fin])
+            else:
+                emitir('/')
+                fin = i + 1
+            palabra = ''
+            i = fin
+        elif _es_identificador(caracter):
+            fin = i
+            while fin < n and _es_identificador(texto[fin]):
+                fin += 1
+            palabra = texto[i:fin]
+            emitir(palabra)
+            i = fin
+        else:
+            if plantillas:
+                if caracter == '{':
+                    plantillas[-1] += 1
+                elif caracter == '}':
+                    plantillas[-1] -= 1
+            emitir(caracter)
+            palabra = ''
+            i += 1
+    return ''.join(salida) + '\n'
+
+
+MINIFICADORES = {'.css': minificar_css, '.js': minificar_js}
+
+
+def paquetes():
+    return getattr(settings, 'PAQUETES_ESTATICOS', {})
+
+
+# --- Construcción --------------------------------------------------------
+
+class AlmacenEstaticos(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage que además minifica, arma paquetes y comprime"""
+
+    def stored_name(self, name):
+        # Sin construir todavía (desarrollo y pruebas) se usan los nombres originales
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def _reemplazar(self, nombre, contenido):
+        if self.exists(nombre):
+            self.delete(nombre)
+        self._save(nombre, ContentFile(contenido))
+
+    def _leer(self, nombre):
+        with self.open(nombre) as archivo:
+            return archivo.read()
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            yield from super().post_process(paths, dry_run, **options)
+            return
+
+        for nombre in list(paths):
+            minificador = MINIFICADORES.get(os.path.splitext(nombre)[1])
+            if minificador and nombre.startswith(PREFIJOS_MINIFICABLES) and '.min.' not in nombre:
+                self._reemplazar(nombre, minificador(self._leer(nombre).decode('utf-8')).encode('utf-8'))
+                # El hash se calcula sobre lo que se lee de aquí, ya minificado
+                paths[nombre] = (self, nombre)
+
+        for paquete, fuentes in paquetes().items():
+            faltantes = [fuente for fuente in fuentes if fuente not in paths]
+            if faltantes:
+                raise ImproperlyConfigured(f'El paquete {paquete} usa archivos que no existen: {", ".join(faltantes)}')
+            self._reemplazar(paquete, b''.join(self._leer(fuente) for fuente in fuentes))
+            paths[paquete] = (self, paquete)
+
+        yield from super().post_process(paths, dry_run, **options)
+
+        for nombre in set(self.hashed_files.values()):
+            if nombre.endswith(COMPRIMIBLES):
+                self._comprimir(nombre)
+
+    def _comprimir(self, nombre):
+        datos = self._leer(nombre)
+        if len(datos) < TAMANO_MINIMO_COMPRESION:
+            return
+        # mtime=0: el mismo archivo siempre produce el mismo .gz
+        variantes = {'.gz': gzip.compress(datos, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variantes['.br'] = brotli.compress(datos, quality=11)
+        for extension, comprimido in variantes.items():
+            if len(comprimido) < len(datos):
+                self._reemplazar(nombre + extension, comprimido)
+
+
+def paquete_construido(nombre):
+    """True si collectstatic ya generó el paquete (hay manifiesto y lo incluye)"""
+    return nombre in getattr(staticfiles_storage, 'hashed_files', {})
+
+
+# --- Servidor ------------------------------------------------------------
+
+CODIFICACIONES = (('br', '.br'), ('gzip', '.gz'))
+
+
+def _acepta(accept_encoding, codificacion):
+    for opcion in accept_encoding.split(','):
+        nombre, _, parametros = opcion.strip().partition(';')
+        if nombre.strip() == codificacion:
+            return parametros.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+    return False
+
+
+class EstaticosMiddleware:
+    """Sirve STATIC_ROOT con la variante .br/.gz adecuada y caché larga para los nombres con hash"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        prefijo = settings.STATIC_URL or ''
+        raiz = getattr(settings, 'STATIC_ROOT', None)
+        if (settings.DEBUG or not raiz or '//' in prefijo
+                or not os.path.isfile(os.path.join(raiz, 'staticfiles.json'))):
+            # En desarrollo runserver sirve las fuentes; sin construir (o con los
+            # estáticos en otro dominio) no hay nada que servir aquí
+            raise MiddlewareNotUsed
+        self.prefijo = '/' + prefijo.strip('/') + '/'
+        self.archivos = self._indice(str(raiz))
+        self.inmutables = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+        self.max_age = getattr(settings, 'ESTATICOS_MAX_AGE', 60)
+
+    def _indice(self, raiz):
+        """{ruta relativa: (archivo, {codificación: archivo comprimido})}, leído una sola vez"""
+        archivos = {}
+        for directorio, _, nombres in os.walk(raiz):
+            presentes = set(nombres)
+            for nombre in nombres:
+                if nombre.endswith(('.gz', '.br')):
+                    continue
+                ruta = os.path.join(directorio, nombre)
+                variantes = {
+                    codificacion: ruta + extension
+                    for codificacion, extension in CODIFICACIONES
+                    if nombre + extension in presentes
+                }
+                archivos[os.path.relpath(ruta, raiz).replace(os.sep, '/')] = (ruta, variantes)
+        return archivos
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD') and request.path.startswith(self.prefijo):
+            archivo = self.archivos.get(request.path[len(self.prefijo):])
+            if archivo is not None:
+                return self.servir(request, request.path[len(self.prefijo):], *archivo)
+        return self.get_response(request)
+
+    def servir(self, request, nombre, ruta, variantes):
+        codificacion = None
+        aceptadas = request.headers.get('Accept-Encoding', '')
+        for opcion, _ in CODIFICACIONES:
+            if opcion in variantes and _acepta(aceptadas, opcion):
+                codificacion, ruta = opcion, variantes[opcion]
+                break
+
+        modificado = os.stat(ruta).st_mtime
+        if not was_modified_since(request.headers.get('If-Modified-Since'), modificado):
+            respuesta = HttpResponseNotModified()
+        else:
+            tipo, _ = mimetypes.guess_type(nombre)
+            respuesta = FileResponse(open(ruta, 'rb'), content_type=tipo or 'application/octet-stream')
+            del respuesta['Content-Disposition']
+            respuesta['Last-Modified'] = http_date(modificado)
+            if codificacion:
+                respuesta['Content-Encoding'] = codificacion
+
+        if variantes:
+            respuesta['Vary'] = 'Accept-Encoding'
+        respuesta['Cache-Control'] = (
+            CACHE_INMUTABLE if nombre in self.inmutables else f'public, max-age={self.max_age}'
+        )
+        return respuesta
@@ -0,0 +1,122 @@
+"""Ajustes de inventario en lote, por ejemplo al recibir la entrega de un proveedor"""
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from .models import Producto
+from .estadisticas import invalidar_estadisticas_productos
+from . import catalogo
+
+# Límite por petición para que el CASE no crezca sin control
+MAX_AJUSTES = 1000
+
+
+class AjusteInvalido(ValueError):
+    def __init__(self, mensaje, lineas=None):
+        super().__init__(mensaje)
+        self.lineas = lineas or []
+
+
+def _entero(valor, descripcion):
+    if isinstance(valor, bool) or (isinstance(valor, float) and not valor.is_integer()):
+        raise AjusteInvalido(f'{descripcion} debe ser un número entero')
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        raise AjusteInvalido(f'{descripcion} debe ser un número entero')
+
+
+def normalizar_ajustes(ajustes):
+    """
+    Convierte [{'producto_id', 'delta' | 'stock'}, ...] en {producto_id: (tipo, valor)}.
+    Varios 'delta' del mismo producto se suman; 'stock' fija la cantidad exacta
+    y no puede combinarse con otros ajustes del mismo producto.
+    """
+    if not isinstance(ajustes, list) or not ajustes:
+        raise AjusteInvalido('Envía una lista de ajustes')
+    if len(ajustes) > MAX_AJUSTES:
+        raise AjusteInvalido(f'Se permiten como máximo {MAX_AJUSTES} ajustes por petición')
+
+    normalizados = {}
+    for posicion, ajuste in enumerate(ajustes, start=1):
+        if not isinstance(ajuste, dict):
+            raise AjusteInvalido(f'Ajuste {posicion}: formato inválido')
+        producto_id = _entero(ajuste.get('producto_id'), f'Ajuste {posicion}: producto_id')
+
+        tiene_delta = ajuste.get('delta') is not None
+        tiene_stock = ajuste.get('stock') is not None
+        if tiene_delta == tiene_stock:
+            raise AjusteInvalido(f'Ajuste {posicion}: indica "delta" o "stock" (solo uno)')
+
+        previo = normalizados.get(producto_id)
+        if tiene_stock:
+            stock = _entero(ajuste['stock'], f'Ajuste {posicion}: stock')
+            if stock < 0:
+                raise AjusteInvalido(f'Ajuste {posicion}: el stock no puede ser negativo')
+            if previo is not None:
+                raise AjusteInvalido(f'Ajuste {posicion}: el producto {producto_id} ya tiene otro ajuste')
+            normalizados[producto_id] = ('stock', stock)
+        else:
+            delta = _entero(ajuste['delta'], f'Ajuste {posicion}: delta')
+            if previo is not None and previo[0] == 'stock':
+                raise AjusteInvalido(f'Ajuste {posicion}: el producto {producto_id} ya tiene otro ajuste')
+            normalizados[producto_id] = ('delta', delta + (previo[1] if previo else 0))
+
+    return normalizados
+
+
+def ajustar_stock(ajustes):
+    """
+    Aplica {producto_id: (tipo, valor)} con un solo UPDATE condicional y
+    devuelve el stock resultante de cada producto. Si algún producto no
+    existe o quedaría con stock negativo no se aplica ningún cambio.
+    """
+    nuevo_stock = Case(
+        *[
+            When(id=producto_id, then=F('stock') + Value(valor) if tipo == 'delta' else Value(valor))
+            for producto_id, (tipo, valor) in ajustes.items()
+        ],
+        output_field=IntegerField(),
+    )
+
+    resultado = None
+    with transaction.atomic():
+        actualizados = (
+            Producto.objects.filter(id__in=list(ajustes))
+            .alias(nuevo_stock=nuevo_stock)
+            .filter(nuevo_stock__gte=0)
+            .update(stock=nuevo_stock)
+        )
+        if actualizados == len(ajustes):
+            resultado = list(
+                Producto.objects.filter(id__in=list(ajustes))
+                .order_by('id')
+                .values('id', 'nombre', 'stock', 'categoria_id')
+            )
+            # update() no dispara post_save: se invalidan a mano los contadores y el catálogo
+            categoria_ids = {fila.pop('categoria_id') for fila in resultado}
+            transaction.on_commit(invalidar_estadisticas_productos)
+            transaction.on_commit(lambda: catalogo.invalidar_categoria(*categoria_ids))
+        else:
+            transaction.set_rollback(True)
+
+    if resultado is None:
+        actuales = Producto.objects.filter(id__in=list(ajustes)).values('id', 'nombre', 'stock')
+        raise AjusteInvalido('No se aplicó ningún ajuste', _lineas_invalidas(ajustes, actuales))
+
+    return resultado
+
+
+def _lineas_invalidas(ajustes, filas):
+    """Productos que no existen o que quedarían con stock negativo"""
+    existentes = {fila['id']: fila for fila in filas}
+    lineas = []
+    for producto_id, (tipo, valor) in ajustes.items():
+        fila = existentes.get(producto_id)
+        if fila is None:
+            lineas.append({'id': producto_id, 'motivo': 'No existe el producto'})
+        elif tipo == 'delta' and fila['stock'] + valor < 0:
+            lineas.append({
+                'id': producto_id,
+                'nombre': fila['nombre'],
+                'motivo': f'Stock insuficiente: hay {fila["stock"]} y se intentan retirar {-valor}',
+            })
+    return lineas
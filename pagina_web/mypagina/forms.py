@@ -1,5 +1,7 @@
 from django import forms
 from .models import Usuario
+from .correos import email_en_base_de_datos
+from . import contrasenas
 import re
 
 class RegistroForm(forms.ModelForm):
@@ -47,8 +49,9 @@ class RegistroForm(forms.ModelForm):
         if not re.match(email_regex, email):
             raise forms.ValidationError('Por favor ingresa un email válido')
         
-        # Validar si el email ya existe
-        if Usuario.objects.filter(email=email).exists():
+        # Validar si el email ya existe (sin distinguir mayúsculas); al enviar el
+        # formulario se consulta siempre la base de datos, no el filtro del proceso
+        if email_en_base_de_datos(email):
             raise forms.ValidationError('Este email ya está registrado')
             
         return email
@@ -97,6 +100,13 @@ class RegistroForm(forms.ModelForm):
             usuario.save()
         return usuario
 
+    async def asave(self):
+        """Como save(), pero el hash se calcula en el pool de contraseñas"""
+        usuario = super().save(commit=False)
+        usuario.password = await contrasenas.cifrar(self.cleaned_data['password'])
+        await usuario.asave()
+        return usuario
+
 class LoginForm(forms.Form):
     email = forms.EmailField(
         widget=forms.EmailInput(attrs={'placeholder': 'tu@email.com'}),
@@ -0,0 +1,49 @@
+"""
+Caché de fragmentos de plantilla.
+
+Las partes pesadas de inicioUsuario.html, inventario.html y
+administrar_usuarios.html van dentro de {% cache %} y varían según la versión
+de los datos que muestran: las del catálogo (catalogo.py) o la de la tabla de
+usuarios, que vive aquí. Un cambio solo incrementa la versión; los fragmentos
+viejos no se vuelven a leer y expiran solos.
+
+Los fragmentos se guardan en la caché local de cada proceso, pero las
+versiones no: un cambio hecho en un worker debe renovar la tabla en todos, así
+que la de usuarios vive en ESTADISTICAS_CACHE_ALIAS (compartida entre procesos).
+
+Las vistas pasan los datos de esos bloques sin evaluar (querysets o
+SimpleLazyObject), así que cuando el fragmento está en caché no se consultan.
+"""
+import time
+from django.conf import settings
+from django.core.cache import caches
+
+VERSION_USUARIOS = 'fragmentos:version:usuarios'
+
+
+def timeout():
+    return getattr(settings, 'FRAGMENTOS_CACHE_TIMEOUT', 60 * 60)
+
+
+def _cache():
+    # La misma que los contadores de estadisticas.py, para que la tabla y los
+    # contadores de la página cambien a la vez
+    return caches[getattr(settings, 'ESTADISTICAS_CACHE_ALIAS', 'default')]
+
+
+def version_usuarios():
+    cache = _cache()
+    version = cache.get(VERSION_USUARIOS)
+    if version is None:
+        cache.add(VERSION_USUARIOS, time.time_ns(), None)
+        version = cache.get(VERSION_USUARIOS)
+    return version
+
+
+def invalidar_usuarios():
+    """Marca como vieja la tabla de usuarios del panel"""
+    cache = _cache()
+    try:
+        cache.incr(VERSION_USUARIOS)
+    except ValueError:
+        cache.set(VERSION_USUARIOS, time.time_ns(), None)
@@ -0,0 +1,91 @@
+"""Operaciones masivas del panel de administración sobre usuarios seleccionados"""
+from django.db import models, transaction
+from .models import Usuario
+from .estadisticas import invalidar_estadisticas_usuarios
+from .autenticacion import invalidar_usuarios
+from . import fragmentos
+
+MAX_SELECCION = 10000
+
+# Columnas que cambia cada acción (un solo UPDATE sobre toda la selección)
+CAMBIOS = {
+    'activar': {'is_active': True},
+    'desactivar': {'is_active': False},
+    'hacer_admin': {'is_staff_field': 1, 'is_admin_field': 1},
+    'quitar_admin': {'is_staff_field': 0, 'is_admin_field': 0},
+}
+ACCIONES = set(CAMBIOS) | {'eliminar'}
+
+# Un administrador no puede aplicarse estas acciones a sí mismo
+ACCIONES_SOBRE_SI_MISMO_PROHIBIDAS = {'desactivar', 'quitar_admin', 'eliminar'}
+
+
+class SeleccionInvalida(ValueError):
+    pass
+
+
+def leer_ids(valores):
+    """Lista de ids de usuario sin repetidos; acepta enteros o textos numéricos"""
+    if not isinstance(valores, list) or not valores:
+        raise SeleccionInvalida('Selecciona al menos un usuario')
+    if len(valores) > MAX_SELECCION:
+        raise SeleccionInvalida(f'Se pueden seleccionar como máximo {MAX_SELECCION} usuarios')
+    try:
+        return sorted({int(valor) for valor in valores if not isinstance(valor, bool)})
+    except (TypeError, ValueError):
+        raise SeleccionInvalida('La selección contiene ids inválidos')
+
+
+def _eliminar(seleccion):
+    """
+    Borra la selección con un DELETE por tabla, sin cargar los usuarios.
+    Usuario tiene receptores de post_delete (cachés y contadores), y con ellos
+    QuerySet.delete() traería cada fila y mandaría una señal por usuario; aquí
+    se borran o desvinculan sus relaciones directamente y quien llama invalida
+    las cachés una sola vez.
+    """
+    relaciones = Usuario._meta.related_objects
+    if any(relacion.on_delete not in (models.CASCADE, models.SET_NULL) for relacion in relaciones):
+        # PROTECT, RESTRICT, etc. necesitan las comprobaciones del Collector
+        _, por_modelo = seleccion.only('id').delete()
+        return por_modelo.get(Usuario._meta.label, 0)
+
+    for relacion in relaciones:
+        relacionados = relacion.related_model._base_manager.filter(**{f'{relacion.field.name}__in': seleccion})
+        if relacion.on_delete is models.CASCADE:
+            relacionados.delete()
+        else:
+            relacionados.update(**{relacion.field.name: None})
+    return seleccion._raw_delete(seleccion.db)
+
+
+def aplicar_accion(accion, ids, administrador):
+    """
+    Aplica la acción a todos los usuarios seleccionados. Devuelve cuántos
+    cambiaron y qué ids se omitieron (el propio administrador).
+    """
+    if accion not in ACCIONES:
+        raise SeleccionInvalida('Acción no válida')
+
+    omitidos = []
+    if accion in ACCIONES_SOBRE_SI_MISMO_PROHIBIDAS and administrador.id in ids:
+        omitidos.append(administrador.id)
+        ids = [usuario_id for usuario_id in ids if usuario_id != administrador.id]
+
+    seleccion = Usuario.objects.filter(id__in=ids)
+    with transaction.atomic():
+        if accion == 'eliminar':
+            afectados = _eliminar(seleccion)
+        else:
+            # Se omiten los que ya tienen esos valores para no reescribir filas de más
+            cambios = CAMBIOS[accion]
+            afectados = seleccion.exclude(**cambios).update(**cambios)
+
+        # Ni update() ni _eliminar() disparan señales: se invalidan a mano los
+        # contadores, la tabla del panel y los usuarios guardados para request.user
+        if afectados:
+            transaction.on_commit(invalidar_estadisticas_usuarios)
+            transaction.on_commit(fragmentos.invalidar_usuarios)
+            transaction.on_commit(lambda: invalidar_usuarios(*ids))
+
+    return {'afectados': afectados, 'omitidos': omitidos}
@@ -0,0 +1,337 @@
+"""
+Importación y exportación masiva del catálogo de productos.
+
+Los archivos (CSV, lista JSON o JSON por líneas) se leen fila por fila y se
+procesan en lotes: cada lote se valida, se completa con los datos actuales de
+los productos que ya existen y se guarda con un solo bulk_create que inserta
+o actualiza (ON CONFLICT). Ni el archivo ni el catálogo se cargan completos
+en memoria.
+"""
+import csv
+import io
+import itertools
+import json
+import re
+from decimal import Decimal, InvalidOperation
+from django.db import connection, transaction
+from django.db.models import Q
+from .models import Producto
+from .paginacion import recorrer_por_lotes
+from .precios import redondear
+from .streaming import generar_csv, generar_lista_json
+from . import catalogo, estadisticas
+
+TAMANO_LOTE = 1000
+MAX_ERRORES_REPORTADOS = 100
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'json': 'application/json',
+}
+
+# Columnas del archivo; 'categoria' es el nombre y sirve en lugar de 'categoria_id'
+COLUMNAS = [
+    'id', 'nombre', 'descripcion', 'precio', 'precio_original', 'stock',
+    'descuento', 'destacado', 'activo', 'categoria_id', 'categoria',
+]
+
+# Campos que se sobrescriben cuando el producto ya existe
+CAMPOS_ACTUALIZABLES = [
+    'nombre', 'descripcion', 'precio', 'precio_original', 'stock',
+    'descuento', 'destacado', 'activo', 'categoria_id',
+]
+
+VERDADEROS = {'1', 'true', 'si', 'sí', 'yes', 'x', 'verdadero'}
+FALSOS = {'0', 'false', 'no', 'falso'}
+
+PRECIO_MAXIMO = Decimal('99999999.99')
+
+
+class ArchivoInvalido(ValueError):
+    pass
+
+
+def formato_de(nombre_archivo, formato=None):
+    """Formato indicado o, si no hay, el de la extensión del archivo"""
+    formato = (formato or (nombre_archivo or '').rsplit('.', 1)[-1]).lower()
+    if formato in ('jsonl', 'ndjson'):
+        formato = 'json'
+    if formato not in FORMATOS:
+        raise ArchivoInvalido('Formato no soportado; usa CSV o JSON')
+    return formato
+
+
+# --- Lectura -----------------------------------------------------------------
+
+def leer_filas(archivo, formato):
+    """Itera (número de fila, diccionario) de un archivo abierto en binario"""
+    texto = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+    if formato == 'csv':
+        return _leer_csv(texto)
+    return _leer_json(texto)
+
+
+def _leer_csv(texto):
+    lector = csv.reader(texto)
+    encabezado = next(lector, None)
+    if encabezado is None:
+        return
+    columnas = [columna.strip().lower() for columna in encabezado]
+    if 'id' not in columnas and 'nombre' not in columnas:
+        raise ArchivoInvalido('El CSV debe tener al menos la columna "id" o "nombre"')
+
+    for valores in lector:
+        if any(valores):
+            yield lector.line_num, dict(zip(columnas, valores))
+
+
+# Espacios y separadores entre objetos: sirve para listas JSON y para JSON por líneas
+_SEPARADORES = re.compile(r'[\s,\[\]]*')
+
+
+def _leer_json(texto, tamano_bloque=64 * 1024):
+    decodificador = json.JSONDecoder()
+    buffer = ''
+    posicion = 0
+    agotado = False
+    numero = 0
+
+    while True:
+        posicion = _SEPARADORES.match(buffer, posicion).end()
+        objeto = None
+        if posicion < len(buffer):
+            try:
+                objeto, posicion = decodificador.raw_decode(buffer, posicion)
+            except json.JSONDecodeError:
+                if agotado:
+                    raise ArchivoInvalido(f'JSON inválido después del objeto {numero}')
+        elif agotado:
+            return
+
+        if objeto is None:
+            # Objeto incompleto o buffer vacío: se lee el siguiente bloque
+            bloque = texto.read(tamano_bloque)
+            agotado = not bloque
+            buffer = buffer[posicion:] + bloque
+            posicion = 0
+            continue
+
+        numero += 1
+        if not isinstance(objeto, dict):
+            raise ArchivoInvalido(f'El elemento {numero} no es un objeto JSON')
+        yield numero, {str(clave).strip().lower(): valor for clave, valor in objeto.items()}
+
+
+# --- Validación --------------------------------------------------------------
+
+def _vacio(valor):
+    return valor is None or (isinstance(valor, str) and not valor.strip())
+
+
+def _decimal(valor, campo, errores):
+    try:
+        numero = Decimal(str(valor).strip().replace('$', ''))
+    except InvalidOperation:
+        errores.append(f'{campo}: "{valor}" no es un número')
+        return None
+    if not numero.is_finite() or numero < 0 or numero > PRECIO_MAXIMO:
+        errores.append(f'{campo}: {valor} está fuera de rango')
+        return None
+    return redondear(numero)
+
+
+def _entero(valor, campo, errores, minimo=0, maximo=None):
+    try:
+        numero = Decimal(str(valor).strip())
+        if numero != numero.to_integral_value():
+            raise InvalidOperation
+        numero = int(numero)
+    except (InvalidOperation, ValueError):
+        errores.append(f'{campo}: "{valor}" no es un número entero')
+        return None
+    if numero < minimo or (maximo is not None and numero > maximo):
+        errores.append(f'{campo}: {valor} está fuera de rango')
+        return None
+    return numero
+
+
+def _booleano(valor, campo, errores):
+    if isinstance(valor, bool):
+        return valor
+    texto = str(valor).strip().lower()
+    if texto in VERDADEROS:
+        return True
+    if texto in FALSOS:
+        return False
+    errores.append(f'{campo}: "{valor}" no es sí/no')
+    return None
+
+
+def validar_fila(fila, ids_categorias, categorias_por_nombre):
+    """Convierte los valores de una fila; devuelve (campos presentes, errores)"""
+    campos = {}
+    errores = []
+
+    def valor(columna):
+        dato = fila.get(columna)
+        return None if _vacio(dato) else dato
+
+    if valor('id') is not None:
+        campos['id'] = _entero(valor('id'), 'id', errores, minimo=1)
+
+    if valor('nombre') is not None:
+        nombre = str(valor('nombre')).strip()
+        if len(nombre) > 255:
+            errores.append('nombre: más de 255 caracteres')
+        campos['nombre'] = nombre
+
+    if valor('descripcion') is not None:
+        campos['descripcion'] = str(valor('descripcion')).strip()
+
+    for columna in ('precio', 'precio_original'):
+        if valor(columna) is not None:
+            campos[columna] = _decimal(valor(columna), columna, errores)
+
+    if valor('stock') is not None:
+        campos['stock'] = _entero(valor('stock'), 'stock', errores)
+    if valor('descuento') is not None:
+        campos['descuento'] = _entero(valor('descuento'), 'descuento', errores, maximo=100)
+
+    for columna in ('destacado', 'activo'):
+        if valor(columna) is not None:
+            campos[columna] = _booleano(valor(columna), columna, errores)
+
+    if valor('categoria_id') is not None:
+        categoria_id = _entero(valor('categoria_id'), 'categoria_id', errores, minimo=1)
+        if categoria_id is not None and categoria_id not in ids_categorias:
+            errores.append(f'categoria_id: no existe la categoría {categoria_id}')
+        campos['categoria_id'] = categoria_id
+    elif valor('categoria') is not None:
+        nombre_categoria = str(valor('categoria')).strip().lower()
+        if nombre_categoria not in categorias_por_nombre:
+            errores.append(f'categoria: no existe la categoría "{valor("categoria")}"')
+        campos['categoria_id'] = categorias_por_nombre.get(nombre_categoria)
+
+    if 'id' not in campos and 'nombre' not in campos:
+        errores.append('Cada fila necesita "id" o "nombre"')
+
+    return campos, errores
+
+
+# --- Importación -------------------------------------------------------------
+
+def _registrar_error(resumen, numero, errores):
+    resumen['con_errores'] += 1
+    if len(resumen['errores']) < MAX_ERRORES_REPORTADOS:
+        resumen['errores'].append({'fila': numero, 'errores': errores})
+
+
+def _guardar_lote(lote, ids_categorias, categorias_por_nombre, resumen, categorias_afectadas, simular):
+    validas = []
+    for numero, fila in lote:
+        campos, errores = validar_fila(fila, ids_categorias, categorias_por_nombre)
+        if errores:
+            _registrar_error(resumen, numero, errores)
+        else:
+            validas.append((numero, campos))
+
+    # Una sola consulta trae los productos existentes del lote, por id o por nombre
+    ids = {campos['id'] for _, campos in validas if 'id' in campos}
+    nombres = {campos['nombre'] for _, campos in validas if 'id' not in campos}
+    por_id = {}
+    por_nombre = {}
+    if validas:
+        existentes = (
+            Producto.objects.filter(Q(id__in=ids) | Q(nombre__in=nombres))
+            .order_by('-id')
+            .values('id', *CAMPOS_ACTUALIZABLES)
+        )
+        for actual in existentes:
+            por_id[actual['id']] = actual
+            # Con nombres repetidos gana el producto más antiguo
+            por_nombre[actual['nombre']] = actual
+
+    # Si un producto aparece varias veces en el lote, gana la última fila
+    productos = {}
+    for numero, campos in validas:
+        if 'id' in campos:
+            actual = por_id.get(campos['id'])
+            if actual is None:
+                _registrar_error(resumen, numero, [f'id: no existe el producto {campos["id"]}'])
+                continue
+        else:
+            actual = por_nombre.get(campos['nombre'])
+
+        if actual is None:
+            faltan = [campo for campo in ('precio', 'categoria_id') if campos.get(campo) is None]
+            if faltan:
+                _registrar_error(resumen, numero, [f'Faltan datos para un producto nuevo: {", ".join(faltan)}'])
+                continue
+            productos[('nuevo', campos['nombre'])] = campos
+        else:
+            categorias_afectadas.add(actual['categoria_id'])
+            productos[actual['id']] = {**actual, **campos}
+        categorias_afectadas.add(campos.get('categoria_id'))
+
+    nuevos = sum(1 for clave in productos if isinstance(clave, tuple))
+    resumen['creados'] += nuevos
+    resumen['actualizados'] += len(productos) - nuevos
+    if simular or not productos:
+        return
+
+    opciones = {'update_conflicts': True, 'update_fields': CAMPOS_ACTUALIZABLES}
+    if connection.features.supports_update_conflicts_with_target:
+        opciones['unique_fields'] = ['id']
+    with transaction.atomic():
+        Producto.objects.bulk_create([Producto(**datos) for datos in productos.values()], **opciones)
+
+
+def importar(archivo, formato, tamano_lote=TAMANO_LOTE, simular=False):
+    """
+    Inserta o actualiza productos desde un archivo CSV/JSON abierto en binario.
+    Las filas con id actualizan ese producto; las que solo traen nombre
+    actualizan el producto con ese nombre o crean uno nuevo. Las filas con
+    errores se omiten y se reportan en el resumen.
+    """
+    categorias = catalogo.obtener_categorias()
+    ids_categorias = {categoria.id for categoria in categorias}
+    categorias_por_nombre = {categoria.nombre.strip().lower(): categoria.id for categoria in categorias}
+
+    resumen = {'filas': 0, 'creados': 0, 'actualizados': 0, 'con_errores': 0, 'errores': []}
+    categorias_afectadas = set()
+
+    filas = leer_filas(archivo, formato)
+    while lote := list(itertools.islice(filas, tamano_lote)):
+        resumen['filas'] += len(lote)
+        _guardar_lote(lote, ids_categorias, categorias_por_nombre, resumen, categorias_afectadas, simular)
+
+    resumen['errores'].sort(key=lambda error: error['fila'])
+    if not simular and (resumen['creados'] or resumen['actualizados']):
+        # bulk_create no dispara señales: se invalidan a mano las cachés del catálogo
+        def invalidar():
+            catalogo.invalidar_categoria(*categorias_afectadas)
+            estadisticas.invalidar_estadisticas_productos()
+        transaction.on_commit(invalidar)
+
+    return resumen
+
+
+# --- Exportación -------------------------------------------------------------
+
+def filas_exportacion(categoria_id=None):
+    """Todos los productos (activos o no) en el formato de COLUMNAS, leídos por partes"""
+    productos = Producto.objects.all()
+    if categoria_id:
+        productos = productos.filter(categoria_id=categoria_id)
+    columnas = [columna for columna in COLUMNAS if columna != 'categoria']
+    for fila in recorrer_por_lotes(productos.values(*columnas, 'categoria__nombre'), TAMANO_LOTE):
+        fila['categoria'] = fila.pop('categoria__nombre')
+        yield fila
+
+
+def exportar(formato, categoria_id=None):
+    """Generador con el texto del archivo exportado"""
+    filas = filas_exportacion(categoria_id)
+    if formato == 'csv':
+        return generar_csv(COLUMNAS, filas)
+    return generar_lista_json(filas)
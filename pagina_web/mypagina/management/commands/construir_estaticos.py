@@ -0,0 +1,53 @@
+# mypagina/management/commands/construir_estaticos.py
+import os
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from mypagina.estaticos import PREFIJOS_MINIFICABLES, paquetes
+
+
+def _tamano(ruta):
+    return os.path.getsize(ruta) if os.path.isfile(ruta) else None
+
+
+class Command(BaseCommand):
+    help = (
+        'Construye STATIC_ROOT para producción (collectstatic con AlmacenEstaticos: minifica, '
+        'arma los paquetes, agrega el hash al nombre y comprime) y muestra cuánto pesa cada archivo'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sin-limpiar', action='store_true',
+                            help='No borrar STATIC_ROOT antes de copiar (quedan las versiones anteriores)')
+
+    def handle(self, *args, **options):
+        call_command('collectstatic', interactive=False, clear=not options['sin_limpiar'],
+                     verbosity=max(options['verbosity'] - 1, 0))
+        manifiesto, _ = staticfiles_storage.load_manifest()
+
+        nombres = sorted(
+            nombre for nombre in manifiesto
+            if nombre.startswith(PREFIJOS_MINIFICABLES) and nombre.endswith(('.css', '.js'))
+        )
+        self.stdout.write(f'{"Archivo":<28} {"original":>9} {"final":>9} {"gzip":>9} {"brotli":>9}')
+        totales = [0, 0, 0, 0]
+        for nombre in nombres:
+            if nombre in paquetes():
+                original = sum(os.path.getsize(finders.find(fuente)) for fuente in paquetes()[nombre])
+            else:
+                original = os.path.getsize(finders.find(nombre))
+            ruta = os.path.join(settings.STATIC_ROOT, manifiesto[nombre])
+            tamanos = [original, _tamano(ruta), _tamano(ruta + '.gz'), _tamano(ruta + '.br')]
+            # Los paquetes repiten el contenido de sus fuentes: no suman al total
+            if nombre not in paquetes():
+                for i, tamano in enumerate(tamanos):
+                    totales[i] += tamano or 0
+            columnas = ' '.join(f'{tamano if tamano is not None else "-":>9}' for tamano in tamanos)
+            self.stdout.write(f'{nombre:<28} {columnas}')
+        self.stdout.write(f'{"Total":<28} ' + ' '.join(f'{total or "-":>9}' for total in totales))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Estáticos listos en {settings.STATIC_ROOT} ({len(manifiesto)} archivos con hash)'
+        ))
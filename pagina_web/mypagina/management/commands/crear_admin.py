@@ -11,8 +11,8 @@ class Command(BaseCommand):
         try:
             with connection.cursor() as cursor:
                 # 1. Verificar estructura de la tabla
-                cursor.execute("DESCRIBE usuarios")
-                columns = [row[0] for row in cursor.fetchall()]
+                # (DESCRIBE solo existe en MySQL; la introspección de Django sirve en cualquier motor)
+                columns = [col.name for col in connection.introspection.get_table_description(cursor, 'usuarios')]
                 self.stdout.write(f"Columnas en tabla usuarios: {columns}")
                 
                 # 2. Agregar columnas is_staff e is_admin si no existen
@@ -0,0 +1,24 @@
+# mypagina/management/commands/exportar_productos.py
+from django.core.management.base import BaseCommand
+from mypagina import importacion
+
+
+class Command(BaseCommand):
+    help = 'Exporta el catálogo de productos a CSV o JSON sin cargarlo completo en memoria'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--formato', choices=list(importacion.FORMATOS), default='csv')
+        parser.add_argument('--categoria', type=int, help='Exportar solo esta categoría (id)')
+        parser.add_argument('--salida', help='Archivo de salida (por defecto, la salida estándar)')
+
+    def handle(self, *args, **options):
+        partes = importacion.exportar(options['formato'], options['categoria'])
+        if not options['salida']:
+            for parte in partes:
+                self.stdout.write(parte, ending='')
+            return
+
+        with open(options['salida'], 'w', encoding='utf-8', newline='') as archivo:
+            for parte in partes:
+                archivo.write(parte)
+        self.stderr.write(self.style.SUCCESS(f'✅ Catálogo exportado a {options["salida"]}'))
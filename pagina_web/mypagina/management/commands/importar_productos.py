@@ -0,0 +1,42 @@
+# mypagina/management/commands/importar_productos.py
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from mypagina import importacion
+
+
+class Command(BaseCommand):
+    help = 'Crea o actualiza productos en masa desde un archivo CSV o JSON (o "-" para la entrada estándar)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo')
+        parser.add_argument('--formato', choices=list(importacion.FORMATOS),
+                            help='Por defecto se toma de la extensión del archivo')
+        parser.add_argument('--lote', type=int, default=importacion.TAMANO_LOTE, help='Filas por lote')
+        parser.add_argument('--simular', action='store_true', help='Validar sin guardar nada')
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1:
+            raise CommandError('--lote debe ser mayor que cero')
+
+        try:
+            formato = importacion.formato_de(options['archivo'], options['formato'])
+            if options['archivo'] == '-':
+                resumen = importacion.importar(sys.stdin.buffer, formato, options['lote'], options['simular'])
+            else:
+                with open(options['archivo'], 'rb') as archivo:
+                    resumen = importacion.importar(archivo, formato, options['lote'], options['simular'])
+        except (OSError, importacion.ArchivoInvalido) as e:
+            raise CommandError(str(e))
+
+        for error in resumen['errores']:
+            self.stdout.write(self.style.WARNING(f'Fila {error["fila"]}: {"; ".join(error["errores"])}'))
+        if resumen['con_errores'] > len(resumen['errores']):
+            self.stdout.write(self.style.WARNING(
+                f'... y {resumen["con_errores"] - len(resumen["errores"])} filas más con errores'
+            ))
+
+        prefijo = '🔎 Simulación: ' if options['simular'] else '✅ '
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefijo}{resumen["filas"]} filas leídas, {resumen["creados"]} productos nuevos, '
+            f'{resumen["actualizados"]} actualizados, {resumen["con_errores"]} con errores'
+        ))
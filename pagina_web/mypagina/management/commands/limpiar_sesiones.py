@@ -0,0 +1,51 @@
+# mypagina/management/commands/limpiar_sesiones.py
+import time
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from mypagina.cache_archivos import CacheArchivos
+
+
+class Command(BaseCommand):
+    help = (
+        'Borra de django_session las sesiones vencidas en lotes pequeños, para no bloquear la tabla '
+        'con un solo DELETE como clearsessions. Programarlo con cron (por ejemplo cada hora). '
+        'También borra los archivos vencidos de la caché de sesiones cuando es en archivos '
+        '(SESIONES_CACHE=file); en redis y locmem vencen solos con su timeout.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=1000, help='Sesiones borradas por transacción')
+        parser.add_argument('--pausa', type=float, default=0,
+                            help='Segundos de espera entre lotes para no saturar la base')
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1:
+            raise CommandError('--lote debe ser mayor que cero')
+
+        # Con SESIONES_PERFIL=cache no se crean filas nuevas, pero pueden quedar
+        # las de cuando se usaba la base
+        vencidas = Session.objects.filter(expire_date__lt=timezone.now())
+        total = 0
+        while True:
+            claves = list(vencidas.values_list('session_key', flat=True)[:options['lote']])
+            if not claves:
+                break
+            borradas, _ = vencidas.filter(session_key__in=claves).delete()
+            total += borradas
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{total} sesiones borradas...')
+            if options['pausa']:
+                time.sleep(options['pausa'])
+
+        # FileBasedCache solo borra un archivo vencido cuando alguien lo vuelve a
+        # leer, y las sesiones abandonadas no se vuelven a leer
+        cache = caches[settings.SESSION_CACHE_ALIAS]
+        archivos = cache.borrar_vencidos() if isinstance(cache, CacheArchivos) else 0
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {total} sesiones vencidas eliminadas y {archivos} archivos vencidos de la caché '
+            f'(perfil de sesiones: {settings.SESIONES_PERFIL})'
+        ))
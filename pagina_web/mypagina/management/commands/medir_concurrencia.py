@@ -0,0 +1,168 @@
+# mypagina/management/commands/medir_concurrencia.py
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.db.backends.signals import connection_created
+from django.test import AsyncRequestFactory, RequestFactory, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from mypagina import views, views_async
+from mypagina.models import Usuario, Categoria, Producto
+from mypagina.runner import TestRunner
+from .medir_latencia import percentil, PERCENTILES
+
+ITEMS_CARRITO = 10
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara las peticiones por segundo de la API del carrito con las vistas síncronas '
+        '(hilos de un worker WSGI) y las asíncronas (ASGI) cuando la base de datos responde '
+        'lento y muchos clientes esperan a la vez'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, nargs='+', default=[10, 50, 200],
+                            help='Peticiones simultáneas')
+        parser.add_argument('--hilos', type=int, default=4,
+                            help='Hilos del worker WSGI con las vistas síncronas')
+        parser.add_argument('--latencia-bd', type=float, default=20,
+                            help='Milisegundos que se agregan a cada consulta')
+        parser.add_argument('--peticiones', type=int, default=400,
+                            help='Peticiones medidas por escenario')
+        parser.add_argument('--salida', help='Archivo donde guardar el JSON (por defecto, la salida estándar)')
+
+    def handle(self, *args, **options):
+        if options['hilos'] < 1 or options['peticiones'] < 1 or min(options['clientes']) < 1:
+            raise CommandError('--hilos, --peticiones y --clientes deben ser mayores que cero')
+
+        # Se trabaja siempre sobre una base de pruebas nueva; nunca se tocan los datos reales
+        setup_test_environment()
+        runner = TestRunner(verbosity=0, interactive=False)
+        bases = runner.setup_databases()
+        try:
+            with override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher']):
+                resultado = self.medir(options)
+        finally:
+            connection_created.disconnect(self.agregar_latencia)
+            runner.teardown_databases(bases)
+            teardown_test_environment()
+
+        texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                archivo.write(texto + '\n')
+            self.stderr.write(f'Resultados guardados en {options["salida"]}')
+        else:
+            self.stdout.write(texto)
+
+    # --- Base de datos lenta -----------------------------------------------
+
+    def agregar_latencia(self, sender, connection, **kwargs):
+        """Cada conexión nueva espera --latencia-bd antes de cada consulta, como una base remota"""
+        segundos = self.latencia_bd / 1000
+
+        def demorar(execute, sql, params, many, context):
+            time.sleep(segundos)
+            return execute(sql, params, many, context)
+
+        connection.execute_wrappers.append(demorar)
+
+    def preparar_cliente(self):
+        categoria = Categoria.objects.create(nombre='Lácteos', descripcion='Lácteos')
+        Producto.objects.bulk_create([
+            Producto(nombre=f'Leche marca {i}', precio=10 + i, stock=1000, categoria=categoria)
+            for i in range(ITEMS_CARRITO)
+        ])
+        cliente = Usuario.objects.create_user('cliente@concurrencia.local', 'Cliente', 'Cliente123!')
+        cliente.guardar_carrito([
+            {'id': p['id'], 'nombre': p['nombre'], 'precio': p['precio'], 'cantidad': 1}
+            for p in Producto.objects.values('id', 'nombre', 'precio')
+        ])
+        return cliente
+
+    # --- Medición ----------------------------------------------------------
+
+    def medir_sincrono(self, cliente, url, clientes, options):
+        """Las vistas de views.py en un pool del tamaño del worker WSGI"""
+        fabrica = RequestFactory()
+
+        def peticion():
+            inicio = time.perf_counter()
+            request = fabrica.get(url)
+            request.user = cliente
+            respuesta = views.obtener_carrito(request)
+            # Como al terminar una petición WSGI con CONN_MAX_AGE = 0
+            close_old_connections()
+            return respuesta.status_code, time.perf_counter() - inicio
+
+        with ThreadPoolExecutor(max_workers=min(options['hilos'], clientes)) as pool:
+            inicio = time.perf_counter()
+            resultados = list(pool.map(lambda _: peticion(), range(options['peticiones'])))
+            return resultados, time.perf_counter() - inicio
+
+    def medir_asincrono(self, cliente, url, clientes, options):
+        """Las vistas de views_async.py con `clientes` peticiones en curso a la vez"""
+        fabrica = AsyncRequestFactory()
+
+        async def auser():
+            return cliente
+
+        async def peticion(limite):
+            async with limite:
+                # Igual que ASGIHandler: cada petición tiene su propio hilo para el código síncrono
+                async with ThreadSensitiveContext():
+                    inicio = time.perf_counter()
+                    request = fabrica.get(url)
+                    request.auser = auser
+                    respuesta = await views_async.obtener_carrito(request)
+                    await sync_to_async(close_old_connections)()
+                    return respuesta.status_code, time.perf_counter() - inicio
+
+        async def todas():
+            limite = asyncio.Semaphore(clientes)
+            inicio = time.perf_counter()
+            resultados = await asyncio.gather(*[peticion(limite) for _ in range(options['peticiones'])])
+            return resultados, time.perf_counter() - inicio
+
+        return asyncio.run(todas())
+
+    def resumir(self, resultados, total_segundos):
+        errores = [estado for estado, _ in resultados if estado >= 400]
+        if errores:
+            raise CommandError(f'{len(errores)} peticiones fallaron (estado {errores[0]})')
+        tiempos = sorted(segundos * 1000 for _, segundos in resultados)
+        resumen = {f'p{p}_ms': round(percentil(tiempos, p), 3) for p in PERCENTILES}
+        resumen['peticiones_por_segundo'] = round(len(resultados) / total_segundos, 1)
+        return resumen
+
+    def medir(self, options):
+        cliente = self.preparar_cliente()
+        url = reverse('obtener_carrito')
+        self.latencia_bd = options['latencia_bd']
+        connection_created.connect(self.agregar_latencia)
+
+        escenarios = []
+        for clientes in sorted(options['clientes']):
+            self.stderr.write(f'{clientes} clientes simultáneos...')
+            sincrono = self.resumir(*self.medir_sincrono(cliente, url, clientes, options))
+            asincrono = self.resumir(*self.medir_asincrono(cliente, url, clientes, options))
+            escenarios.append({
+                'clientes': clientes,
+                'wsgi_sincrono': sincrono,
+                'asgi_asincrono': asincrono,
+                'mejora': round(asincrono['peticiones_por_segundo'] / sincrono['peticiones_por_segundo'], 2),
+            })
+
+        return {
+            'endpoint': 'obtener_carrito',
+            'motor': connection.vendor,
+            'latencia_bd_ms': options['latencia_bd'],
+            'hilos_wsgi': options['hilos'],
+            'peticiones': options['peticiones'],
+            'escenarios': escenarios,
+        }
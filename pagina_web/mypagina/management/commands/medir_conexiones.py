@@ -0,0 +1,120 @@
+# mypagina/management/commands/medir_conexiones.py
+import json
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import connection
+from django.db.backends.signals import connection_created
+from .medir_latencia import percentil, PERCENTILES
+
+# Un saludo TCP + TLS + autenticación de Postgres cuesta unos 3 viajes de ida y vuelta
+VIAJES_POR_CONEXION = 3
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide cuánto cuesta por petición abrir conexiones a la base de datos con cada perfil '
+        'de DB_PERFIL, simulando el ciclo de conexiones de Django (request_started / '
+        'request_finished). Usar contra un Postgres local (DB_HOST=localhost) como sustituto del pooler.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--perfiles', nargs='+', choices=list(settings.PERFILES_DB),
+                            help='Perfiles a comparar (por defecto, sin-persistencia y el de DB_PERFIL)')
+        parser.add_argument('--peticiones', type=int, default=200, help='Peticiones simuladas por perfil')
+        parser.add_argument('--consultas', type=int, default=3, help='Consultas por petición')
+        parser.add_argument('--latencia-red', type=float, default=0,
+                            help='Milisegundos de ida y vuelta que se agregan para imitar una base remota')
+        parser.add_argument('--salida', help='Archivo donde guardar el JSON (por defecto, la salida estándar)')
+
+    def handle(self, *args, **options):
+        if options['peticiones'] < 1 or options['consultas'] < 1:
+            raise CommandError('--peticiones y --consultas deben ser mayores que cero')
+
+        perfiles = options['perfiles'] or list(dict.fromkeys(['sin-persistencia', settings.DB_PERFIL]))
+        if 'pool' in perfiles and connection.vendor != 'postgresql':
+            raise CommandError('El perfil "pool" solo existe con PostgreSQL (psycopg 3)')
+
+        self.rtt = options['latencia_red'] / 1000
+        original = dict(connection.settings_dict)
+        is_usable = connection.is_usable
+        connection_created.connect(self.contar_conexion)
+        connection.execute_wrappers.append(self.demorar_consulta)
+        # El ping de CONN_HEALTH_CHECKS también es un viaje de ida y vuelta
+        connection.is_usable = lambda: self.esperar(1) or is_usable()
+        try:
+            resultados = {perfil: self.medir_perfil(perfil, options) for perfil in perfiles}
+        finally:
+            connection.close()
+            if connection.vendor == 'postgresql':
+                connection.close_pool()
+            connection.settings_dict.clear()
+            connection.settings_dict.update(original)
+            connection.execute_wrappers.remove(self.demorar_consulta)
+            del connection.is_usable
+            connection_created.disconnect(self.contar_conexion)
+
+        base = resultados[perfiles[0]]['p50_ms']
+        for datos in resultados.values():
+            datos['diferencia_p50_ms'] = round(datos['p50_ms'] - base, 3)
+
+        texto = json.dumps({
+            'motor': connection.vendor,
+            'host': original.get('HOST') or None,
+            'latencia_red_ms': options['latencia_red'],
+            'peticiones': options['peticiones'],
+            'consultas_por_peticion': options['consultas'],
+            'perfiles': resultados,
+        }, indent=2, ensure_ascii=False)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                archivo.write(texto + '\n')
+            self.stderr.write(f'Resultados guardados en {options["salida"]}')
+        else:
+            self.stdout.write(texto)
+
+    # --- Red simulada ------------------------------------------------------
+
+    def esperar(self, viajes):
+        if self.rtt:
+            time.sleep(self.rtt * viajes)
+
+    def contar_conexion(self, sender, connection, **kwargs):
+        self.conexiones += 1
+        self.esperar(VIAJES_POR_CONEXION)
+
+    def demorar_consulta(self, execute, sql, params, many, context):
+        self.esperar(1)
+        return execute(sql, params, many, context)
+
+    # --- Medición ----------------------------------------------------------
+
+    def medir_perfil(self, perfil, options):
+        self.stderr.write(f'Perfil {perfil}...')
+        connection.close()
+        connection.settings_dict.update({'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False})
+        connection.settings_dict.update(settings.PERFILES_DB[perfil])
+        self.conexiones = 0
+
+        tiempos = []
+        for _ in range(options['peticiones']):
+            inicio = time.perf_counter()
+            # Las mismas señales con las que el handler de Django abre y cierra cada petición
+            request_started.send(sender=self.__class__)
+            try:
+                with connection.cursor() as cursor:
+                    for _ in range(options['consultas']):
+                        cursor.execute('SELECT 1')
+                        cursor.fetchone()
+            finally:
+                request_finished.send(sender=self.__class__)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+
+        tiempos.sort()
+        resumen = {f'p{p}_ms': round(percentil(tiempos, p), 3) for p in PERCENTILES}
+        resumen.update({
+            'media_ms': round(sum(tiempos) / len(tiempos), 3),
+            'conexiones_abiertas': self.conexiones,
+        })
+        return resumen
@@ -0,0 +1,292 @@
+# mypagina/management/commands/medir_latencia.py
+import json
+import subprocess
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.middleware.csrf import CSRF_ALLOWED_CHARS, CSRF_SECRET_LENGTH
+from django.test import Client, RequestFactory, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+from mypagina.busqueda import crear_indices_busqueda
+from mypagina.models import Usuario, Categoria, Producto
+from mypagina.runner import TestRunner
+
+CATEGORIAS = ['Frutas', 'Verduras', 'Carnes', 'Lácteos', 'Granos', 'Limpieza', 'Bebidas', 'Panadería']
+PALABRAS = ['leche', 'arroz', 'frijol', 'manzana', 'jabón', 'refresco', 'pan', 'atún', 'queso', 'café']
+
+PERCENTILES = (50, 90, 99)
+
+
+def percentil(valores_ordenados, p):
+    """Percentil por rango más cercano de una lista ya ordenada"""
+    if not valores_ordenados:
+        return None
+    indice = max(0, -(-p * len(valores_ordenados) // 100) - 1)
+    return valores_ordenados[indice]
+
+
+class ContadorConsultas:
+    """Cuenta las consultas sin guardar el SQL (más ligero que CaptureQueriesContext)"""
+
+    def __init__(self):
+        self.total = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.total += 1
+        return execute(sql, params, many, context)
+
+
+class ClienteWSGI:
+    """
+    Peticiones directas a la aplicación de pagina_web/wsgi.py con el environ
+    que armaría el servidor. A diferencia de django.test.Client no pasa por
+    ClientHandler ni guarda las plantillas y contextos de cada respuesta, y
+    la protección CSRF se aplica como en producción.
+    """
+
+    def __init__(self, usuario):
+        from pagina_web.wsgi import application
+        self.application = application
+        self.fabrica = RequestFactory()
+        # Solo para obtener la cookie de sesión; las mediciones no usan el cliente de pruebas
+        cliente = Client()
+        cliente.force_login(usuario)
+        self.token_csrf = get_random_string(CSRF_SECRET_LENGTH, CSRF_ALLOWED_CHARS)
+        self.cookies = (
+            f'{settings.SESSION_COOKIE_NAME}={cliente.cookies[settings.SESSION_COOKIE_NAME].value}; '
+            f'{settings.CSRF_COOKIE_NAME}={self.token_csrf}'
+        )
+
+    def __call__(self, metodo, ruta, datos):
+        """Hace la petición, consume todo el cuerpo y devuelve el código de estado"""
+        environ = getattr(self.fabrica, metodo)(ruta, datos).environ
+        environ['HTTP_COOKIE'] = self.cookies
+        environ['HTTP_X_CSRFTOKEN'] = self.token_csrf
+
+        estado = []
+
+        def start_response(status, headers, exc_info=None):
+            estado.append(status)
+
+        respuesta = self.application(environ, start_response)
+        try:
+            for _ in respuesta:
+                pass
+        finally:
+            respuesta.close()
+        return int(estado[0].split()[0])
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide la latencia (p50/p90/p99) y las consultas por petición de los endpoints del '
+        'catálogo y el carrito, llamando a la aplicación de pagina_web/wsgi.py sobre una base '
+        'de pruebas temporal con datos sembrados'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--productos', type=int, nargs='+', default=[1000, 10000, 100000],
+                            help='Tamaños del catálogo a medir')
+        parser.add_argument('--carrito', type=int, nargs='+', default=[5, 50],
+                            help='Cantidad de productos en el carrito')
+        parser.add_argument('--repeticiones', type=int, default=50,
+                            help='Peticiones medidas por endpoint')
+        parser.add_argument('--calentamiento', type=int, default=5,
+                            help='Peticiones previas que no se miden')
+        parser.add_argument('--cache-fria', action='store_true',
+                            help='Vaciar las cachés antes de cada petición')
+        parser.add_argument('--salida', help='Archivo donde guardar el JSON (por defecto, la salida estándar)')
+        parser.add_argument('--comparar', help='JSON de una corrida anterior para mostrar las diferencias')
+
+    def handle(self, *args, **options):
+        # Se trabaja siempre sobre una base de pruebas nueva; nunca se tocan los datos reales
+        setup_test_environment()
+        runner = TestRunner(verbosity=0, interactive=False)
+        bases = runner.setup_databases()
+        try:
+            with override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher']):
+                crear_indices_busqueda(connection)
+                resultado = self.medir(options)
+        finally:
+            runner.teardown_databases(bases)
+            teardown_test_environment()
+
+        texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                archivo.write(texto + '\n')
+            self.stderr.write(f'Resultados guardados en {options["salida"]}')
+        else:
+            self.stdout.write(texto)
+
+        if options['comparar']:
+            with open(options['comparar'], encoding='utf-8') as archivo:
+                self.comparar(json.load(archivo), resultado)
+
+    # --- Datos -------------------------------------------------------------
+
+    def sembrar_productos(self, total):
+        """Agrega productos hasta llegar a `total`"""
+        if not Categoria.objects.exists():
+            Categoria.objects.bulk_create([Categoria(nombre=nombre, descripcion=nombre) for nombre in CATEGORIAS])
+        ids_categorias = list(Categoria.objects.values_list('id', flat=True))
+
+        existentes = Producto.objects.count()
+        ahora = timezone.now()
+        lote = []
+        for i in range(existentes, total):
+            palabra = PALABRAS[i % len(PALABRAS)]
+            lote.append(Producto(
+                nombre=f'{palabra.capitalize()} marca {i}',
+                descripcion=f'{palabra} de prueba número {i}',
+                precio=10 + i % 90,
+                stock=1000000,
+                categoria_id=ids_categorias[i % len(ids_categorias)],
+                fecha_creacion=ahora,
+            ))
+            if len(lote) == 5000:
+                Producto.objects.bulk_create(lote)
+                lote = []
+        Producto.objects.bulk_create(lote)
+
+    def preparar_usuarios(self):
+        admin = Usuario.objects.filter(email='admin@benchmark.local').first()
+        if admin is None:
+            admin = Usuario.objects.create_user('admin@benchmark.local', 'Admin', 'Admin123!')
+            admin.is_staff = True
+            admin.is_admin = True
+            admin.save()
+        cliente = Usuario.objects.filter(email='cliente@benchmark.local').first()
+        if cliente is None:
+            cliente = Usuario.objects.create_user('cliente@benchmark.local', 'Cliente', 'Cliente123!')
+        return admin, cliente
+
+    # --- Medición ----------------------------------------------------------
+
+    def endpoints(self, admin, cliente, carrito):
+        """(nombre, usuario, método, ruta, datos) de cada endpoint medido"""
+        categoria_id = Categoria.objects.order_by('id').values_list('id', flat=True).first()
+        en_carrito = carrito[0]['id']
+        return [
+            ('inicio_usuario', cliente, 'get', 'inicio_usuario', {}),
+            ('inicio_usuario_categoria', cliente, 'get', 'inicio_usuario', {'categoria_id': categoria_id}),
+            ('inicio_usuario_busqueda', cliente, 'get', 'inicio_usuario', {'search': 'leche'}),
+            ('buscar_productos', cliente, 'get', 'buscar_productos', {'q': 'arroz'}),
+            ('autocompletar_productos', cliente, 'get', 'autocompletar_productos', {'q': 'fri'}),
+            ('carrito', cliente, 'get', 'carrito', {}),
+            ('obtener_carrito', cliente, 'get', 'obtener_carrito', {}),
+            # Agregar un producto que ya está en el carrito no cambia el número de filas
+            ('agregar_carrito', cliente, 'post', 'agregar_carrito', {'producto_id': en_carrito, 'cantidad': 1}),
+            ('actualizar_carrito', cliente, 'post', 'actualizar_carrito', {'producto_id': en_carrito, 'cantidad': 2}),
+            ('inventario', admin, 'get', 'inventario', {}),
+            ('administrar_usuarios', admin, 'get', 'administrar_usuarios', {}),
+            ('productos_por_categoria', admin, 'get', 'productos_por_categoria', {'categoria_id': categoria_id}),
+            ('productos_por_categoria_stream', admin, 'get', 'productos_por_categoria', {'stream': '1'}),
+        ]
+
+    def limpiar_caches(self):
+        for alias in settings.CACHES:
+            caches[alias].clear()
+
+    def medir_endpoint(self, cliente_http, metodo, url, datos, options):
+        contador = ContadorConsultas()
+        tiempos = []
+        consultas = []
+        total = options['calentamiento'] + options['repeticiones']
+
+        for i in range(total):
+            if options['cache_fria']:
+                self.limpiar_caches()
+            antes = contador.total
+            with connection.execute_wrapper(contador):
+                inicio = time.perf_counter()
+                estado = cliente_http(metodo, url, datos)
+                transcurrido = time.perf_counter() - inicio
+
+            if estado >= 400:
+                raise RuntimeError(f'{url} respondió {estado}')
+            if i >= options['calentamiento']:
+                tiempos.append(transcurrido * 1000)
+                consultas.append(contador.total - antes)
+
+        tiempos.sort()
+        resumen = {f'p{p}_ms': round(percentil(tiempos, p), 3) for p in PERCENTILES}
+        resumen.update({
+            'media_ms': round(sum(tiempos) / len(tiempos), 3),
+            'max_ms': round(tiempos[-1], 3),
+            'peticiones_por_segundo': round(1000 * len(tiempos) / sum(tiempos), 1),
+            'consultas_por_peticion': max(consultas),
+            'peticiones': len(tiempos),
+        })
+        return resumen
+
+    def medir(self, options):
+        admin, cliente = self.preparar_usuarios()
+        clientes_http = {usuario.id: ClienteWSGI(usuario) for usuario in (admin, cliente)}
+
+        escenarios = []
+        for productos in sorted(options['productos']):
+            self.stderr.write(f'Sembrando {productos} productos...')
+            self.sembrar_productos(productos)
+
+            for items in sorted(options['carrito']):
+                carrito = [
+                    {'id': p['id'], 'nombre': p['nombre'], 'precio': p['precio'], 'cantidad': 1}
+                    for p in Producto.objects.order_by('id').values('id', 'nombre', 'precio')[:max(items, 1)]
+                ]
+                cliente.guardar_carrito(carrito)
+                self.limpiar_caches()
+
+                resultados = {}
+                for nombre, usuario, metodo, ruta, datos in self.endpoints(admin, cliente, carrito):
+                    self.stderr.write(f'  {productos} productos / carrito {items}: {nombre}')
+                    resultados[nombre] = self.medir_endpoint(
+                        clientes_http[usuario.id], metodo, reverse(ruta), datos, options
+                    )
+                escenarios.append({'productos': productos, 'items_carrito': items, 'endpoints': resultados})
+
+        return {
+            'commit': self.commit_actual(),
+            'fecha': timezone.now().isoformat(),
+            'motor': connection.vendor,
+            'repeticiones': options['repeticiones'],
+            'cache_fria': options['cache_fria'],
+            'escenarios': escenarios,
+        }
+
+    def commit_actual(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def comparar(self, anterior, actual):
+        """Muestra p50, p99 y consultas de cada endpoint frente a la corrida anterior"""
+        previos = {
+            (e['productos'], e['items_carrito'], nombre): datos
+            for e in anterior.get('escenarios', [])
+            for nombre, datos in e['endpoints'].items()
+        }
+        self.stderr.write(f'\nComparación {anterior.get("commit")} -> {actual.get("commit")}')
+        for escenario in actual['escenarios']:
+            for nombre, datos in escenario['endpoints'].items():
+                previo = previos.get((escenario['productos'], escenario['items_carrito'], nombre))
+                if previo is None:
+                    continue
+                cambios = []
+                for campo in ('p50_ms', 'p99_ms'):
+                    if previo[campo]:
+                        cambios.append(f'{campo} {100 * (datos[campo] / previo[campo] - 1):+.1f}%')
+                diferencia = datos['consultas_por_peticion'] - previo['consultas_por_peticion']
+                cambios.append(f'consultas {diferencia:+d}')
+                self.stderr.write(
+                    f'{escenario["productos"]:>7} / {escenario["items_carrito"]:>3}  {nombre:<32} ' + ', '.join(cambios)
+                )
@@ -0,0 +1,174 @@
+# mypagina/management/commands/medir_sesiones.py
+import json
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from mypagina import correos
+from mypagina.models import Usuario, Categoria, Producto
+from mypagina.runner import TestRunner
+
+MENSAJES_SESION = 'django.contrib.messages.storage.session.SessionStorage'
+MENSAJES_COOKIE = 'django.contrib.messages.storage.fallback.FallbackStorage'
+
+# (perfil de SESIONES_PERFIL, almacenamiento de mensajes); la primera es la configuración anterior
+CONFIGURACIONES = {
+    'db+mensajes_en_sesion': ('db', MENSAJES_SESION),
+    'db+mensajes_en_cookie': ('db', MENSAJES_COOKIE),
+    'cached_db+mensajes_en_cookie': ('cached_db', MENSAJES_COOKIE),
+    'cache+mensajes_en_cookie': ('cache', MENSAJES_COOKIE),
+}
+
+ESCRITURAS = ('INSERT', 'UPDATE', 'DELETE')
+
+
+class ContadorSesiones:
+    """Separa las escrituras a django_session del resto y cuenta las lecturas de sesiones"""
+
+    def __init__(self):
+        self.escrituras_sesion = 0
+        self.escrituras_otras = 0
+        self.lecturas_sesion = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        instruccion = sql.lstrip().split(None, 1)[0].upper()
+        de_sesion = '"django_session"' in sql
+        if instruccion in ESCRITURAS:
+            if de_sesion:
+                self.escrituras_sesion += 1
+            else:
+                self.escrituras_otras += 1
+        elif de_sesion:
+            self.lecturas_sesion += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        'Cuenta las escrituras a la base de datos de los flujos de registro, login y navegación '
+        'con cada combinación de motor de sesiones y almacenamiento de mensajes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=5, help='Veces que se repite cada flujo')
+        parser.add_argument('--paginas', type=int, default=5,
+                            help='Peticiones del flujo de navegación después de iniciar sesión')
+        parser.add_argument('--salida', help='Archivo donde guardar el JSON (por defecto, la salida estándar)')
+
+    def handle(self, *args, **options):
+        if options['repeticiones'] < 1 or options['paginas'] < 1:
+            raise CommandError('--repeticiones y --paginas deben ser mayores que cero')
+
+        # Base de pruebas nueva y caché de sesiones propia: nunca se tocan las sesiones reales
+        setup_test_environment()
+        runner = TestRunner(verbosity=0, interactive=False)
+        bases = runner.setup_databases()
+        cache_sesiones = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'medir_sesiones'}
+        try:
+            with override_settings(
+                PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+                CACHES={**settings.CACHES, settings.SESSION_CACHE_ALIAS: cache_sesiones},
+            ):
+                resultado = self.medir(options)
+        finally:
+            runner.teardown_databases(bases)
+            teardown_test_environment()
+
+        texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                archivo.write(texto + '\n')
+            self.stderr.write(f'Resultados guardados en {options["salida"]}')
+        else:
+            self.stdout.write(texto)
+
+    # --- Flujos ------------------------------------------------------------
+
+    def flujo_registro(self, cliente, n):
+        """Formulario, envío y la página de login que muestra el mensaje de registro exitoso"""
+        cliente.get(reverse('registro'))
+        respuesta = cliente.post(reverse('registro'), {
+            'nombre': 'Nuevo', 'email': f'nuevo{n}@sesiones.local',
+            'password': 'Nuevo123!', 'confirmar_password': 'Nuevo123!',
+        })
+        cliente.get(respuesta.url)
+        return respuesta
+
+    def flujo_login(self, cliente, n):
+        """Formulario, envío y la primera página de la tienda"""
+        cliente.get(reverse('login'))
+        respuesta = cliente.post(reverse('login'), {'email': self.usuario.email, 'password': 'Cliente123!'})
+        cliente.get(respuesta.url)
+        return respuesta
+
+    def flujo_navegacion(self, cliente, n):
+        """Peticiones de un usuario que ya inició sesión"""
+        for _ in range(self.paginas):
+            respuesta = cliente.get(reverse('inicio_usuario'))
+        return respuesta
+
+    # --- Medición ----------------------------------------------------------
+
+    def medir_flujo(self, nombre, flujo, repeticiones):
+        totales = {'escrituras_sesion': 0, 'escrituras_otras': 0, 'lecturas_sesion': 0}
+        for _ in range(repeticiones):
+            self.numero += 1
+            cliente = Client()
+            if nombre == 'navegacion':
+                cliente.force_login(self.usuario)
+            contador = ContadorSesiones()
+            with connection.execute_wrapper(contador):
+                respuesta = flujo(cliente, self.numero)
+            if respuesta.status_code >= 400:
+                raise CommandError(f'El flujo {nombre} respondió {respuesta.status_code}')
+            for clave in totales:
+                totales[clave] += getattr(contador, clave)
+
+        resumen = {clave: round(valor / repeticiones, 2) for clave, valor in totales.items()}
+        resumen['escrituras_totales'] = round(resumen['escrituras_sesion'] + resumen['escrituras_otras'], 2)
+        return resumen
+
+    def medir(self, options):
+        categoria = Categoria.objects.create(nombre='Lácteos', descripcion='Lácteos')
+        Producto.objects.create(nombre='Leche entera', precio=25, stock=100, categoria=categoria)
+        self.usuario = Usuario.objects.create_user('cliente@sesiones.local', 'Cliente', 'Cliente123!')
+        # El resumen del carrito se crea en la primera visita; no es una escritura de la sesión
+        self.usuario.obtener_totales_carrito()
+        correos.reconstruir_filtro()
+        self.paginas = options['paginas']
+        self.numero = 0
+
+        flujos = {
+            'registro': self.flujo_registro,
+            'login': self.flujo_login,
+            'navegacion': self.flujo_navegacion,
+        }
+        configuraciones = {}
+        for nombre, (perfil, mensajes) in CONFIGURACIONES.items():
+            self.stderr.write(f'{nombre}...')
+            with override_settings(SESSION_ENGINE=settings.PERFILES_SESION[perfil], MESSAGE_STORAGE=mensajes):
+                caches[settings.SESSION_CACHE_ALIAS].clear()
+                configuraciones[nombre] = {
+                    flujo: self.medir_flujo(flujo, funcion, options['repeticiones'])
+                    for flujo, funcion in flujos.items()
+                }
+
+        anterior = configuraciones[next(iter(CONFIGURACIONES))]
+        ahorro = {
+            nombre: {
+                flujo: round(anterior[flujo]['escrituras_totales'] - datos[flujo]['escrituras_totales'], 2)
+                for flujo in flujos
+            }
+            for nombre, datos in configuraciones.items()
+        }
+
+        return {
+            'motor': connection.vendor,
+            'repeticiones': options['repeticiones'],
+            'paginas_navegacion': options['paginas'],
+            'configuraciones': configuraciones,
+            'escrituras_ahorradas_por_flujo': ahorro,
+        }
@@ -0,0 +1,225 @@
+# mypagina/management/commands/poblar_datos.py
+import argparse
+import itertools
+import os
+import random
+import time
+from decimal import Decimal
+from multiprocessing import Pool
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from mypagina.models import Usuario, Categoria, Producto, ItemCarrito, ResumenCarrito, emoji_para_categoria
+from mypagina import catalogo, correos, estadisticas
+from mypagina.precios import redondear
+
+CATEGORIAS = [
+    'Frutas', 'Verduras', 'Carnes', 'Lácteos', 'Granos y semillas', 'Limpieza',
+    'Bebidas', 'Panadería', 'Conservas', 'Botanas', 'Higiene personal', 'Mascotas',
+]
+PRODUCTOS = [
+    'Leche', 'Arroz', 'Frijol', 'Manzana', 'Plátano', 'Jabón', 'Refresco', 'Pan de caja',
+    'Atún', 'Queso', 'Café', 'Huevo', 'Tortilla', 'Aceite', 'Azúcar', 'Cereal', 'Yogur',
+    'Galletas', 'Papel higiénico', 'Detergente', 'Jugo', 'Agua', 'Pasta', 'Salsa', 'Chile',
+]
+MARCAS = ['La Granja', 'Del Valle', 'Don Pepe', 'Selecto', 'Económico', 'Premium', 'Casero', 'Natural']
+PRESENTACIONES = ['250 g', '500 g', '1 kg', '1 L', '2 L', '600 ml', 'Paquete', 'Pieza']
+NOMBRES = ['Ana', 'Luis', 'María', 'José', 'Carmen', 'Jorge', 'Lucía', 'Pedro', 'Sofía', 'Miguel']
+APELLIDOS = ['García', 'López', 'Martínez', 'Hernández', 'Pérez', 'Sánchez', 'Ramírez', 'Torres']
+
+# Productos candidatos para los carritos (los más recientes), con popularidad decreciente
+MUESTRA_CARRITOS = 10000
+
+
+def _lotes(iterable, tamano):
+    iterador = iter(iterable)
+    while lote := list(itertools.islice(iterador, tamano)):
+        yield lote
+
+
+def _iniciar_proceso():
+    # Con el método 'spawn' (Windows, macOS) el proceso hijo empieza sin Django configurado
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def _hashear(password):
+    return make_password(password)
+
+
+class Command(BaseCommand):
+    help = 'Genera categorías, productos, usuarios y carritos de prueba en grandes cantidades'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categorias', type=int, default=12)
+        parser.add_argument('--productos', type=int, default=10000)
+        parser.add_argument('--usuarios', type=int, default=1000)
+        parser.add_argument('--con-carrito', type=float, default=0.3,
+                            help='Fracción de usuarios con carrito (0 a 1)')
+        parser.add_argument('--max-items-carrito', type=int, default=15)
+        parser.add_argument('--lote', type=int, default=5000, help='Filas por bulk_create')
+        parser.add_argument('--procesos', type=int, default=os.cpu_count() or 1,
+                            help='Procesos para calcular los hashes con --no-hash-compartido (1 = sin multiprocessing)')
+        parser.add_argument('--hash-compartido', action=argparse.BooleanOptionalAction, default=True,
+                            help='Calcular un solo hash y reutilizarlo en todos los usuarios (por defecto). '
+                                 'Con --no-hash-compartido se calcula uno por usuario, varios segundos por cada mil')
+        parser.add_argument('--password', default='Usuario123!', help='Contraseña de los usuarios generados')
+        parser.add_argument('--semilla', type=int, help='Semilla para obtener siempre los mismos datos')
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1 or options['procesos'] < 1:
+            raise CommandError('--lote y --procesos deben ser mayores que cero')
+        if not 0 <= options['con_carrito'] <= 1:
+            raise CommandError('--con-carrito debe estar entre 0 y 1')
+
+        self.azar = random.Random(options['semilla'])
+        self.lote = options['lote']
+        # Sufijo para que varias corridas no choquen con emails ya existentes
+        self.etiqueta = timezone.now().strftime('%Y%m%d%H%M%S')
+
+        categorias = self.fase('categorías', self.crear_categorias, options['categorias'])
+        if options['productos'] and not categorias:
+            categorias = list(Categoria.objects.values_list('id', 'nombre'))
+            if not categorias:
+                raise CommandError('Se necesita al menos una categoría para crear productos')
+        self.fase('productos', self.crear_productos, options['productos'], categorias)
+        self.fase('usuarios', self.crear_usuarios, options['usuarios'], options)
+
+        # bulk_create no dispara señales: se invalidan a mano las cachés derivadas
+        catalogo.invalidar_categorias()
+        catalogo.invalidar_categoria(*[categoria_id for categoria_id, _ in categorias])
+        estadisticas.invalidar_estadisticas_productos()
+        estadisticas.invalidar_estadisticas_usuarios()
+        # Los filtros de correos de los demás procesos cargan los usuarios nuevos
+        correos.avisar_alta()
+
+    def fase(self, nombre, funcion, *args):
+        inicio = time.perf_counter()
+        resultado = funcion(*args)
+        segundos = time.perf_counter() - inicio
+        total = args[0]
+        velocidad = f' ({total / segundos:,.0f} filas/s)' if total and segundos else ''
+        self.stdout.write(self.style.SUCCESS(f'✅ {total:,} {nombre} en {segundos:.1f} s{velocidad}'))
+        return resultado
+
+    def crear_categorias(self, total):
+        nombres = [
+            CATEGORIAS[i] if i < len(CATEGORIAS) else f'{CATEGORIAS[i % len(CATEGORIAS)]} {i // len(CATEGORIAS)}'
+            for i in range(total)
+        ]
+        existentes = set(Categoria.objects.filter(nombre__in=nombres).values_list('nombre', flat=True))
+        Categoria.objects.bulk_create([
+            Categoria(nombre=nombre, descripcion=f'Productos de {nombre.lower()}')
+            for nombre in nombres if nombre not in existentes
+        ])
+        return list(Categoria.objects.filter(nombre__in=nombres).values_list('id', 'nombre'))
+
+    def generar_productos(self, total, categorias):
+        ahora = timezone.now()
+        for i in range(total):
+            categoria_id, _ = self.azar.choice(categorias)
+            producto = self.azar.choice(PRODUCTOS)
+            precio_lista = max(redondear(Decimal(self.azar.lognormvariate(3.5, 0.8))), Decimal('1.00'))
+            descuento = self.azar.choice([10, 15, 20, 30]) if self.azar.random() < 0.1 else 0
+            yield Producto(
+                nombre=f'{producto} {self.azar.choice(MARCAS)} {self.azar.choice(PRESENTACIONES)}',
+                descripcion=f'{producto} de la marca {self.azar.choice(MARCAS)}',
+                # Con descuento, precio es el de venta y precio_original el de lista
+                precio=redondear(precio_lista * (100 - descuento) / 100),
+                precio_original=precio_lista if descuento else None,
+                descuento=descuento,
+                destacado=self.azar.random() < 0.05,
+                stock=self.azar.randint(0, 500),
+                activo=self.azar.random() < 0.97,
+                categoria_id=categoria_id,
+                fecha_creacion=ahora,
+            )
+
+    def crear_productos(self, total, categorias):
+        for lote in _lotes(self.generar_productos(total, categorias), self.lote):
+            with transaction.atomic():
+                Producto.objects.bulk_create(lote, batch_size=self.lote)
+
+    def hashes(self, total, options):
+        """Un hash por usuario; en paralelo si hay varios procesos"""
+        if options['hash_compartido']:
+            return itertools.repeat(make_password(options['password']), total)
+        passwords = itertools.repeat(options['password'], total)
+        if options['procesos'] == 1:
+            return map(_hashear, passwords)
+        self.pool = Pool(options['procesos'], initializer=_iniciar_proceso)
+        return self.pool.imap(_hashear, passwords, chunksize=max(1, self.lote // options['procesos']))
+
+    def crear_usuarios(self, total, options):
+        if not total:
+            return
+        productos = list(
+            Producto.objects.filter(activo=True)
+            .order_by('-id')
+            .values('id', 'nombre', 'precio', 'categoria_id', 'categoria__nombre')[:MUESTRA_CARRITOS]
+        )
+        # Pocos productos concentran la mayoría de las compras (distribución tipo Zipf)
+        pesos = list(itertools.accumulate(1 / (posicion + 1) for posicion in range(len(productos))))
+
+        self.pool = None
+        hashes = self.hashes(total, options)
+        try:
+            for inicio, lote in zip(itertools.count(0, self.lote), _lotes(hashes, self.lote)):
+                usuarios = [
+                    Usuario(
+                        nombre=f'{self.azar.choice(NOMBRES)} {self.azar.choice(APELLIDOS)}',
+                        email=f'usuario{inicio + i}.{self.etiqueta}@ejemplo.com',
+                        password=password,
+                    )
+                    for i, password in enumerate(lote)
+                ]
+                with transaction.atomic():
+                    Usuario.objects.bulk_create(usuarios, batch_size=self.lote)
+                    if productos:
+                        self.crear_carritos(usuarios, productos, pesos, options)
+        finally:
+            if self.pool is not None:
+                self.pool.close()
+                self.pool.join()
+
+    def crear_carritos(self, usuarios, productos, pesos, options):
+        if usuarios and usuarios[0].pk is None:
+            # Motores que no devuelven el id en bulk_create
+            ids = dict(Usuario.objects.filter(email__in=[u.email for u in usuarios]).values_list('email', 'id'))
+            for usuario in usuarios:
+                usuario.pk = ids[usuario.email]
+
+        items = []
+        resumenes = []
+        maximo = min(options['max_items_carrito'], len(productos))
+        for usuario in usuarios:
+            if maximo < 1 or self.azar.random() >= options['con_carrito']:
+                continue
+            elegidos = {}
+            objetivo = self.azar.randint(1, maximo)
+            while len(elegidos) < objetivo:
+                producto = self.azar.choices(productos, cum_weights=pesos)[0]
+                elegidos[producto['id']] = producto
+
+            total_items = 0
+            subtotal = Decimal('0')
+            for producto in elegidos.values():
+                cantidad = self.azar.choices([1, 2, 3, 4, 6], weights=[60, 20, 10, 6, 4])[0]
+                total_items += cantidad
+                subtotal += cantidad * producto['precio']
+                items.append(ItemCarrito(
+                    usuario_id=usuario.pk,
+                    producto_id=producto['id'],
+                    cantidad=cantidad,
+                    nombre=producto['nombre'],
+                    precio=producto['precio'],
+                    imagen=emoji_para_categoria(producto['categoria__nombre']),
+                    categoria=producto['categoria__nombre'],
+                ))
+            resumenes.append(ResumenCarrito(usuario_id=usuario.pk, total_items=total_items, subtotal=subtotal))
+
+        ItemCarrito.objects.bulk_create(items, batch_size=self.lote)
+        ResumenCarrito.objects.bulk_create(resumenes, batch_size=self.lote)
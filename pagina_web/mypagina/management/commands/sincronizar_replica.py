@@ -0,0 +1,31 @@
+# mypagina/management/commands/sincronizar_replica.py
+import sqlite3
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from mypagina.enrutador import PRIMARIO, replicas
+
+
+class Command(BaseCommand):
+    help = (
+        'Copia la base SQLite primaria a las réplicas locales (DB_LOCAL=1 DB_REPLICA_LOCAL=1), '
+        'como haría la replicación de Postgres; correrlo de nuevo simula que la réplica se pone al día'
+    )
+
+    def handle(self, *args, **options):
+        if not replicas():
+            raise CommandError('No hay réplicas configuradas (usa DB_LOCAL=1 DB_REPLICA_LOCAL=1)')
+        if any(connections[alias].vendor != 'sqlite' for alias in [PRIMARIO, *replicas()]):
+            raise CommandError('Solo sirve con SQLite; en Postgres las réplicas se mantienen con la replicación')
+
+        origen = sqlite3.connect(connections[PRIMARIO].settings_dict['NAME'])
+        try:
+            for alias in replicas():
+                connections[alias].close()
+                destino = sqlite3.connect(connections[alias].settings_dict['NAME'])
+                try:
+                    origen.backup(destino)
+                finally:
+                    destino.close()
+                self.stdout.write(self.style.SUCCESS(f'✅ Réplica {alias} sincronizada con el primario'))
+        finally:
+            origen.close()
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mypagina', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Categoria',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('nombre', models.CharField(max_length=100)),
+                ('descripcion', models.TextField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'categorias',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Producto',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('nombre', models.CharField(max_length=255)),
+                ('descripcion', models.TextField(blank=True, db_column='description', null=True)),
+                ('precio', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('precio_original', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('imagen', models.CharField(blank=True, max_length=255, null=True)),
+                ('destacado', models.BooleanField(default=False)),
+                ('descuento', models.IntegerField(default=0)),
+                ('stock', models.IntegerField(default=0)),
+                ('activo', models.BooleanField(default=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'productos',
+                'managed': False,
+            },
+        ),
+        migrations.AlterModelOptions(
+            name='usuario',
+            options={'managed': False},
+        ),
+        migrations.CreateModel(
+            name='ItemCarrito',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('cantidad', models.PositiveIntegerField(default=1)),
+                ('nombre', models.CharField(max_length=255)),
+                ('precio', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('imagen', models.CharField(default='📦', max_length=16)),
+                ('categoria', models.CharField(default='General', max_length=100)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='mypagina.producto')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items_carrito', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'items_carrito',
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'producto'), name='item_carrito_unico')],
+            },
+        ),
+    ]
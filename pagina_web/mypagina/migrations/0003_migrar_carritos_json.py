@@ -0,0 +1,101 @@
+from decimal import Decimal
+import json
+
+from django.db import migrations
+
+
+def tiene_columna_carrito(connection):
+    with connection.cursor() as cursor:
+        columnas = connection.introspection.get_table_description(cursor, 'usuarios')
+    return any(col.name == 'carrito' for col in columnas)
+
+
+def migrar_carritos(apps, schema_editor):
+    """Copia los carritos guardados como JSON en usuarios.carrito a items_carrito"""
+    ItemCarrito = apps.get_model('mypagina', 'ItemCarrito')
+    Producto = apps.get_model('mypagina', 'Producto')
+    connection = schema_editor.connection
+
+    if not tiene_columna_carrito(connection):
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT id, carrito FROM usuarios WHERE carrito IS NOT NULL AND carrito <> '[]'")
+        filas = cursor.fetchall()
+
+    items = {}
+    for usuario_id, carrito in filas:
+        try:
+            carrito = json.loads(carrito)
+        except (TypeError, ValueError):
+            continue
+
+        for item in carrito:
+            try:
+                producto_id = int(item['id'])
+                cantidad = int(item.get('cantidad', 1))
+            except (KeyError, TypeError, ValueError):
+                continue
+            if cantidad <= 0:
+                continue
+
+            clave = (usuario_id, producto_id)
+            if clave in items:
+                items[clave].cantidad += cantidad
+                continue
+
+            items[clave] = ItemCarrito(
+                usuario_id=usuario_id,
+                producto_id=producto_id,
+                cantidad=cantidad,
+                nombre=item.get('nombre', 'Producto'),
+                precio=Decimal(str(item.get('precio', 0))),
+                imagen=item.get('imagen', '📦'),
+                categoria=item.get('categoria', 'General'),
+            )
+
+    # Descartar productos que ya no existen
+    existentes = set(
+        Producto.objects.filter(id__in={pid for _, pid in items}).values_list('id', flat=True)
+    )
+    ItemCarrito.objects.bulk_create(
+        [item for (_, pid), item in items.items() if pid in existentes],
+        batch_size=1000,
+    )
+
+
+def restaurar_carritos(apps, schema_editor):
+    """Vuelve a escribir los carritos como JSON en usuarios.carrito"""
+    ItemCarrito = apps.get_model('mypagina', 'ItemCarrito')
+    connection = schema_editor.connection
+    if not tiene_columna_carrito(connection):
+        return
+
+    carritos = {}
+    for item in ItemCarrito.objects.order_by('usuario_id', 'id'):
+        carritos.setdefault(item.usuario_id, []).append({
+            'id': item.producto_id,
+            'nombre': item.nombre,
+            'precio': float(item.precio),
+            'cantidad': item.cantidad,
+            'imagen': item.imagen,
+            'categoria': item.categoria,
+        })
+
+    with connection.cursor() as cursor:
+        for usuario_id, carrito in carritos.items():
+            cursor.execute(
+                "UPDATE usuarios SET carrito = %s WHERE id = %s",
+                [json.dumps(carrito), usuario_id],
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mypagina', '0002_items_carrito'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrar_carritos, restaurar_carritos),
+    ]
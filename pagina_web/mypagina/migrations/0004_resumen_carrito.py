@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mypagina', '0003_migrar_carritos_json'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenCarrito',
+            fields=[
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumen_carrito', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total_items', models.IntegerField(default=0)),
+                ('subtotal', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+            ],
+            options={
+                'db_table': 'resumen_carrito',
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:39
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mypagina', '0004_resumen_carrito'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Pedido',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('total_items', models.IntegerField(default=0)),
+                ('subtotal', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('envio', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('descuento', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('usuario', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pedidos', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'pedidos',
+            },
+        ),
+        migrations.CreateModel(
+            name='PedidoLinea',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('fecha', models.DateTimeField()),
+                ('nombre', models.CharField(max_length=255)),
+                ('precio_unitario', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('cantidad', models.PositiveIntegerField()),
+                ('subtotal', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('pedido', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lineas', to='mypagina.pedido')),
+                ('producto', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='mypagina.producto')),
+            ],
+            options={
+                'db_table': 'pedido_lineas',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['usuario', 'fecha'], include=('total', 'total_items'), name='pedido_usuario_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedidolinea',
+            index=models.Index(fields=['producto', 'fecha'], include=('cantidad', 'subtotal'), name='linea_producto_fecha_idx'),
+        ),
+    ]
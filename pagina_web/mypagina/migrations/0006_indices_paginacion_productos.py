@@ -0,0 +1,38 @@
+from django.db import migrations
+
+INDICES = [
+    # Orden por nombre en la paginación por cursor (nombre, id)
+    ('productos_nombre_id_idx', 'productos (nombre, id)'),
+    # Listado de productos activos por categoría ordenado por id
+    ('productos_categoria_activo_id_idx', 'productos (categoria_id, activo, id)'),
+]
+
+
+def crear_indices(apps, schema_editor):
+    """productos no lo administra Django, así que solo se indexa si la tabla existe"""
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if 'productos' not in connection.introspection.table_names(cursor):
+            return
+        for nombre, definicion in INDICES:
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS {nombre} ON {definicion}')
+
+
+def eliminar_indices(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if 'productos' not in connection.introspection.table_names(cursor):
+            return
+        for nombre, _ in INDICES:
+            cursor.execute(f'DROP INDEX IF EXISTS {nombre}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mypagina', '0005_pedidos'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, eliminar_indices),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def crear_indices(apps, schema_editor):
+    from mypagina.busqueda import crear_indices_busqueda
+    crear_indices_busqueda(schema_editor.connection)
+
+
+def eliminar_indices(apps, schema_editor):
+    from mypagina.busqueda import eliminar_indices_busqueda
+    eliminar_indices_busqueda(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mypagina', '0006_indices_paginacion_productos'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, eliminar_indices),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations
+
+INDICE = 'usuarios_email_lower_idx'
+
+
+def crear_indice(apps, schema_editor):
+    """usuarios no lo administra Django, así que solo se indexa si la tabla existe"""
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if 'usuarios' not in connection.introspection.table_names(cursor):
+            return
+        # Búsqueda de correos sin distinguir mayúsculas: WHERE LOWER(email) = ...
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {INDICE} ON usuarios (LOWER(email))')
+
+
+def eliminar_indice(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if 'usuarios' not in connection.introspection.table_names(cursor):
+            return
+        cursor.execute(f'DROP INDEX IF EXISTS {INDICE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mypagina', '0007_busqueda_productos'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, eliminar_indice),
+    ]
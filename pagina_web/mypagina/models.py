@@ -1,7 +1,13 @@
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager
 from django.contrib.auth.hashers import make_password, check_password
-import json
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.db.models import F
+from asgiref.sync import sync_to_async
+from decimal import Decimal
+from functools import lru_cache
+from .precios import calcular_totales, redondear
 
 class UsuarioManager(BaseUserManager):
     def create_user(self, email, nombre, password=None):
@@ -35,6 +41,7 @@ class Usuario(AbstractBaseUser):
     password = models.CharField(max_length=128)
     last_login = models.DateTimeField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
+    # Columna heredada; el carrito vive ahora en la tabla items_carrito
     carrito = models.TextField(default='[]')
     
     # Campos para mapear a la base de datos
@@ -49,6 +56,13 @@ class Usuario(AbstractBaseUser):
     class Meta:
         db_table = 'usuarios'
         managed = False
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        usuario = super().from_db(db, field_names, values)
+        # Para saber al guardar si cambió el correo (ver signals.registrar_email_usuario)
+        usuario._email_cargado = usuario.__dict__.get('email')
+        return usuario
     
     def __str__(self):
         return self.email
@@ -87,87 +101,213 @@ class Usuario(AbstractBaseUser):
     def activar(self):
         """Activar usuario"""
         self.is_active = True
-        self.save()
+        self.save(update_fields=['is_active'])
     
     def desactivar(self):
         """Desactivar usuario"""
         self.is_active = False
-        self.save()
+        self.save(update_fields=['is_active'])
     
     def convertir_en_admin(self):
         """Convertir usuario en administrador"""
         self.is_staff = True
         self.is_admin = True
-        self.save()
+        self.save(update_fields=['is_staff_field', 'is_admin_field'])
     
     def remover_admin(self):
         """Remover permisos de administrador"""
         self.is_staff = False
         self.is_admin = False
-        self.save()
+        self.save(update_fields=['is_staff_field', 'is_admin_field'])
     
     def obtener_carrito(self):
         """Obtiene el carrito del usuario como lista"""
-        try:
-            return json.loads(self.carrito)
-        except:
-            return []
+        return [item.como_dict() for item in self.items_carrito.order_by('id')]
+
+    def obtener_totales_carrito(self):
+        """Totales del carrito a partir del resumen acumulado, sin recorrer los items"""
+        resumen = ResumenCarrito.objects.filter(usuario=self).first()
+        if resumen is None:
+            resumen = self.recalcular_resumen_carrito()
+        return calcular_totales(resumen.subtotal, resumen.total_items)
+
+    def recalcular_resumen_carrito(self):
+        """Recalcula el resumen recorriendo todos los items (solo si falta o se desfasó)"""
+        total_items = 0
+        subtotal = Decimal('0')
+        for cantidad, precio in self.items_carrito.values_list('cantidad', 'precio'):
+            total_items += cantidad
+            subtotal += cantidad * precio
+
+        resumen, _ = ResumenCarrito.objects.update_or_create(
+            usuario=self,
+            defaults={'total_items': total_items, 'subtotal': subtotal},
+        )
+        return resumen
+
+    def _ajustar_resumen_carrito(self, delta_items, delta_subtotal):
+        """Aplica el cambio de un item al resumen con un solo UPDATE"""
+        if not delta_items and not delta_subtotal:
+            return
+        actualizados = ResumenCarrito.objects.filter(usuario=self).update(
+            total_items=F('total_items') + delta_items,
+            subtotal=F('subtotal') + delta_subtotal,
+        )
+        if not actualizados:
+            self.recalcular_resumen_carrito()
 
     def guardar_carrito(self, carrito):
-        """Guarda el carrito del usuario"""
-        self.carrito = json.dumps(carrito)
-        self.save()
+        """Reemplaza todo el carrito del usuario"""
+        with transaction.atomic():
+            self.items_carrito.all().delete()
+            ItemCarrito.objects.bulk_create([
+                ItemCarrito(
+                    usuario=self,
+                    producto_id=item['id'],
+                    cantidad=item['cantidad'],
+                    nombre=item.get('nombre', 'Producto'),
+                    precio=redondear(Decimal(str(item.get('precio', 0)))),
+                    imagen=item.get('imagen', '📦'),
+                    categoria=item.get('categoria', 'General'),
+                )
+                for item in carrito if item.get('cantidad', 0) > 0
+            ])
+            self.recalcular_resumen_carrito()
+
+    def _sumar_a_item(self, producto_id, cantidad):
+        """Suma cantidad a la fila existente; devuelve su precio o None si no existe"""
+        item = self.items_carrito.select_for_update().filter(producto_id=producto_id).first()
+        if item is None:
+            return None
+        ItemCarrito.objects.filter(id=item.id).update(cantidad=F('cantidad') + cantidad)
+        return item.precio
 
     def agregar_al_carrito(self, producto_id, cantidad=1, producto_data=None):
-        """Agrega un producto al carrito"""
-        carrito = self.obtener_carrito()
-        
-        # Buscar si el producto ya está en el carrito
-        for item in carrito:
-            if item['id'] == producto_id:
-                item['cantidad'] += cantidad
-                break
-        else:
-            # Si no existe, agregarlo
-            if producto_data:
-                carrito.append({
-                    'id': producto_id,
-                    'nombre': producto_data.get('nombre', 'Producto'),
-                    'precio': float(producto_data.get('precio', 0)),
-                    'cantidad': cantidad,
-                    'imagen': producto_data.get('imagen', '📦'),
-                    'categoria': producto_data.get('categoria', 'General')
-                })
-        
-        self.guardar_carrito(carrito)
-        return carrito
+        """Agrega un producto al carrito y devuelve los totales"""
+        with transaction.atomic():
+            precio = self._sumar_a_item(producto_id, cantidad)
+
+            if precio is None and producto_data:
+                precio = redondear(Decimal(str(producto_data.get('precio', 0))))
+                try:
+                    with transaction.atomic():
+                        ItemCarrito.objects.create(
+                            usuario=self,
+                            producto_id=producto_id,
+                            cantidad=cantidad,
+                            nombre=producto_data.get('nombre', 'Producto'),
+                            precio=precio,
+                            imagen=producto_data.get('imagen', '📦'),
+                            categoria=producto_data.get('categoria', 'General'),
+                        )
+                except IntegrityError:
+                    # Otra petición insertó la fila al mismo tiempo
+                    precio = self._sumar_a_item(producto_id, cantidad)
+
+            if precio is not None:
+                self._ajustar_resumen_carrito(cantidad, cantidad * precio)
+
+        return self.obtener_totales_carrito()
 
     def eliminar_del_carrito(self, producto_id):
-        """Elimina un producto del carrito"""
-        carrito = self.obtener_carrito()
-        carrito = [item for item in carrito if item['id'] != producto_id]
-        self.guardar_carrito(carrito)
-        return carrito
+        """Elimina un producto del carrito y devuelve los totales"""
+        with transaction.atomic():
+            item = self.items_carrito.select_for_update().filter(producto_id=producto_id).first()
+            if item is not None:
+                ItemCarrito.objects.filter(id=item.id).delete()
+                self._ajustar_resumen_carrito(-item.cantidad, -item.cantidad * item.precio)
+
+        return self.obtener_totales_carrito()
 
     def actualizar_cantidad(self, producto_id, cantidad):
-        """Actualiza la cantidad de un producto en el carrito"""
-        carrito = self.obtener_carrito()
-        
-        for item in carrito:
-            if item['id'] == producto_id:
-                if cantidad <= 0:
-                    carrito = [i for i in carrito if i['id'] != producto_id]
-                else:
-                    item['cantidad'] = cantidad
-                break
-        
-        self.guardar_carrito(carrito)
-        return carrito
+        """Actualiza la cantidad de un producto en el carrito y devuelve los totales"""
+        if cantidad <= 0:
+            return self.eliminar_del_carrito(producto_id)
+
+        with transaction.atomic():
+            item = self.items_carrito.select_for_update().filter(producto_id=producto_id).first()
+            if item is not None:
+                ItemCarrito.objects.filter(id=item.id).update(cantidad=cantidad)
+                delta = cantidad - item.cantidad
+                self._ajustar_resumen_carrito(delta, delta * item.precio)
+
+        return self.obtener_totales_carrito()
 
     def vaciar_carrito(self):
         """Vacía todo el carrito"""
-        self.guardar_carrito([])
-        return []
+        with transaction.atomic():
+            self.items_carrito.all().delete()
+            ResumenCarrito.objects.filter(usuario=self).update(total_items=0, subtotal=0)
+        return calcular_totales(Decimal('0'))
+
+    # --- Versiones asíncronas (views_async.py) -------------------------------
+    # Las lecturas usan el ORM asíncrono. El ORM asíncrono no tiene
+    # transacciones, así que los cambios, que necesitan transaction.atomic y
+    # select_for_update, ejecutan los métodos de arriba en un hilo.
+
+    async def aobtener_carrito(self):
+        return [item.como_dict() async for item in self.items_carrito.order_by('id')]
+
+    async def aobtener_totales_carrito(self):
+        resumen = await ResumenCarrito.objects.filter(usuario=self).afirst()
+        if resumen is None:
+            resumen = await self.arecalcular_resumen_carrito()
+        return calcular_totales(resumen.subtotal, resumen.total_items)
+
+    async def arecalcular_resumen_carrito(self):
+        total_items = 0
+        subtotal = Decimal('0')
+        async for cantidad, precio in self.items_carrito.values_list('cantidad', 'precio'):
+            total_items += cantidad
+            subtotal += cantidad * precio
+
+        resumen, _ = await ResumenCarrito.objects.aupdate_or_create(
+            usuario=self,
+            defaults={'total_items': total_items, 'subtotal': subtotal},
+        )
+        return resumen
+
+    async def aagregar_al_carrito(self, producto_id, cantidad=1, producto_data=None):
+        return await sync_to_async(self.agregar_al_carrito)(producto_id, cantidad, producto_data)
+
+    async def aeliminar_del_carrito(self, producto_id):
+        return await sync_to_async(self.eliminar_del_carrito)(producto_id)
+
+    async def aactualizar_cantidad(self, producto_id, cantidad):
+        return await sync_to_async(self.actualizar_cantidad)(producto_id, cantidad)
+
+    async def avaciar_carrito(self):
+        return await sync_to_async(self.vaciar_carrito)()
+
+    def retirar_items_carrito(self, items):
+        """Quita del carrito los items indicados (por ejemplo, los ya comprados)"""
+        ItemCarrito.objects.filter(id__in=[item.id for item in items]).delete()
+        self._ajustar_resumen_carrito(
+            -sum(item.cantidad for item in items),
+            -sum(item.cantidad * item.precio for item in items),
+        )
+
+# Emoji por palabra clave en el nombre de la categoría, en orden de prioridad
+EMOJIS_CATEGORIA = [
+    (("fruta",), "🍎"),
+    (("verdura",), "🥦"),
+    (("carne",), "🥩"),
+    (("lácteo", "leche"), "🥛"),
+    (("grano", "arroz", "frijol"), "🍚"),
+    (("limpieza",), "🧴"),
+    (("bebida",), "🧃"),
+    (("pan",), "🍞"),
+    (("conserva", "enlatado"), "🥫"),
+]
+
+@lru_cache(maxsize=None)
+def emoji_para_categoria(nombre):
+    """Emoji de una categoría; se calcula una sola vez por nombre"""
+    nombre = (nombre or "").lower()
+    for palabras, emoji in EMOJIS_CATEGORIA:
+        if any(palabra in nombre for palabra in palabras):
+            return emoji
+    return "📦"
 
 class Categoria(models.Model):
     id = models.AutoField(primary_key=True)
@@ -180,6 +320,10 @@ class Categoria(models.Model):
     
     def __str__(self):
         return self.nombre
+    
+    @property
+    def emoji(self):
+        return emoji_para_categoria(self.nombre)
 
 class Producto(models.Model):
     # Cambiado de id_producto a id para coincidir con la base de datos
@@ -218,27 +362,141 @@ class Producto(models.Model):
 
     def obtener_imagen_emoji(self):
         """Obtiene un emoji representativo para el producto"""
-        if not self.categoria:
-            return "📦"
-            
-        nombre_categoria = self.categoria.nombre.lower()
-        if "fruta" in nombre_categoria:
-            return "🍎"
-        elif "verdura" in nombre_categoria:
-            return "🥦"
-        elif "carne" in nombre_categoria:
-            return "🥩"
-        elif "lácteo" in nombre_categoria or "leche" in nombre_categoria:
-            return "🥛"
-        elif "grano" in nombre_categoria or "arroz" in nombre_categoria or "frijol" in nombre_categoria:
-            return "🍚"
-        elif "limpieza" in nombre_categoria:
-            return "🧴"
-        elif "bebida" in nombre_categoria:
-            return "🧃"
-        elif "pan" in nombre_categoria:
-            return "🍞"
-        elif "conserva" in nombre_categoria or "enlatado" in nombre_categoria:
-            return "🥫"
-        else:
-            return "📦"
\ No newline at end of file
+        # Se toma del mapa de categorías en memoria para no consultar self.categoria
+        from .catalogo import datos_categoria
+        datos = datos_categoria(self.categoria_id)
+        return datos['emoji'] if datos else "📦"
+
+class ItemCarrito(models.Model):
+    """Una fila por producto en el carrito de cada usuario"""
+    id = models.AutoField(primary_key=True)
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='items_carrito')
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='+')
+    cantidad = models.PositiveIntegerField(default=1)
+
+    # Copia de los datos del producto al momento de agregarlo
+    nombre = models.CharField(max_length=255)
+    precio = models.DecimalField(max_digits=10, decimal_places=2)
+    imagen = models.CharField(max_length=16, default='📦')
+    categoria = models.CharField(max_length=100, default='General')
+
+    class Meta:
+        db_table = 'items_carrito'
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'producto'], name='item_carrito_unico'),
+        ]
+
+    def __str__(self):
+        return f'{self.usuario_id} - {self.nombre} x{self.cantidad}'
+
+    def como_dict(self):
+        """Formato que usaban los elementos del carrito JSON"""
+        return {
+            'id': self.producto_id,
+            'nombre': self.nombre,
+            'precio': float(self.precio),
+            'cantidad': self.cantidad,
+            'imagen': self.imagen,
+            'categoria': self.categoria,
+        }
+
+class ResumenCarrito(models.Model):
+    """Totales acumulados del carrito, actualizados en cada cambio"""
+    usuario = models.OneToOneField(
+        Usuario, on_delete=models.CASCADE, primary_key=True, related_name='resumen_carrito'
+    )
+    total_items = models.IntegerField(default=0)
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'resumen_carrito'
+
+    def __str__(self):
+        return f'{self.usuario_id}: {self.total_items} items, ${self.subtotal}'
+
+class PedidoManager(models.Manager):
+    def crear_desde_items(self, usuario, items, totales):
+        """Crea el pedido y todas sus líneas en una sola transacción"""
+        with transaction.atomic():
+            pedido = self.create(
+                usuario=usuario,
+                total_items=totales['total_items'],
+                subtotal=totales['subtotal'],
+                envio=totales['envio'],
+                descuento=totales['descuento'],
+                total=totales['total'],
+            )
+            PedidoLinea.objects.bulk_create([
+                PedidoLinea(
+                    pedido=pedido,
+                    producto_id=item.producto_id,
+                    fecha=pedido.fecha,
+                    nombre=item.nombre,
+                    precio_unitario=item.precio,
+                    cantidad=item.cantidad,
+                    subtotal=redondear(item.precio * item.cantidad),
+                )
+                for item in items
+            ], batch_size=500)
+        return pedido
+
+class Pedido(models.Model):
+    id = models.BigAutoField(primary_key=True)
+    usuario = models.ForeignKey(
+        Usuario, on_delete=models.SET_NULL, null=True, related_name='pedidos'
+    )
+    fecha = models.DateTimeField(default=timezone.now)
+    total_items = models.IntegerField(default=0)
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2)
+    envio = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    descuento = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total = models.DecimalField(max_digits=12, decimal_places=2)
+
+    objects = PedidoManager()
+
+    class Meta:
+        db_table = 'pedidos'
+        indexes = [
+            # Historial de pedidos por usuario sin tocar la tabla
+            models.Index(
+                fields=['usuario', 'fecha'],
+                include=['total', 'total_items'],
+                name='pedido_usuario_fecha_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'Pedido {self.numero}'
+
+    @property
+    def numero(self):
+        return f'{self.fecha:%Y%m%d}-{self.id:06d}'
+
+class PedidoLinea(models.Model):
+    id = models.BigAutoField(primary_key=True)
+    pedido = models.ForeignKey(Pedido, on_delete=models.CASCADE, related_name='lineas')
+    producto = models.ForeignKey(
+        Producto, on_delete=models.SET_NULL, null=True, related_name='+'
+    )
+    # Copia de la fecha del pedido para consultar ventas por producto
+    fecha = models.DateTimeField()
+
+    # Datos del producto al momento de la compra
+    nombre = models.CharField(max_length=255)
+    precio_unitario = models.DecimalField(max_digits=10, decimal_places=2)
+    cantidad = models.PositiveIntegerField()
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2)
+
+    class Meta:
+        db_table = 'pedido_lineas'
+        indexes = [
+            # Ventas por producto y periodo sin tocar la tabla
+            models.Index(
+                fields=['producto', 'fecha'],
+                include=['cantidad', 'subtotal'],
+                name='linea_producto_fecha_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.nombre} x{self.cantidad}'
@@ -0,0 +1,110 @@
+"""Paginación por cursor (keyset) para listados grandes"""
+import base64
+import json
+from django.db.models import Q
+
+LIMITE_POR_DEFECTO = 50
+LIMITE_MAXIMO = 200
+
+# Columnas de orden permitidas; siempre terminan en 'id' para desempatar
+ORDENES = {
+    'id': ('id',),
+    'nombre': ('nombre', 'id'),
+}
+
+# Tipo que debe traer el cursor para cada columna de orden. Se revisa aquí
+# para que un cursor bien formado pero con otros tipos no llegue al filtro
+# (donde fallaría con ValueError al evaluar la consulta, ya en la plantilla).
+TIPOS_CURSOR = {
+    'id': int,
+    'nombre': str,
+}
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def codificar_cursor(valores):
+    datos = json.dumps(valores, separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(datos.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(cursor + relleno))
+    except (ValueError, TypeError) as e:
+        raise CursorInvalido('Cursor inválido') from e
+
+
+def leer_limite(valor):
+    try:
+        limite = int(valor)
+    except (TypeError, ValueError):
+        return LIMITE_POR_DEFECTO
+    return max(1, min(limite, LIMITE_MAXIMO))
+
+
+def validar_cursor(cursor, orden='id'):
+    """Valores de la última fila de la página anterior; CursorInvalido si no sirven para ese orden"""
+    campos = ORDENES.get(orden, ORDENES['id'])
+    valores = decodificar_cursor(cursor)
+    if not isinstance(valores, dict) or any(
+        campo not in valores or type(valores[campo]) is not TIPOS_CURSOR[campo] for campo in campos
+    ):
+        raise CursorInvalido('Cursor inválido')
+    return valores
+
+
+def _despues_de(campos, valores):
+    """(a, b) > (x, y) escrito como a > x OR (a = x AND b > y)"""
+    condicion = Q()
+    iguales = Q()
+    for campo in campos:
+        condicion |= iguales & Q(**{f'{campo}__gt': valores[campo]})
+        iguales &= Q(**{campo: valores[campo]})
+    return condicion
+
+
+def paginar(queryset, cursor=None, limite=LIMITE_POR_DEFECTO, orden='id'):
+    """
+    Devuelve (filas, siguiente_cursor). Cada página es un solo SELECT con
+    WHERE sobre las columnas de orden y LIMIT, sin OFFSET, así que el costo
+    no crece al avanzar por el catálogo. Sirve tanto con objetos como con
+    .values(), siempre que las columnas de orden estén incluidas.
+    """
+    campos = ORDENES.get(orden, ORDENES['id'])
+    queryset = queryset.order_by(*campos)
+
+    if cursor:
+        queryset = queryset.filter(_despues_de(campos, validar_cursor(cursor, orden)))
+
+    filas = list(queryset[:limite + 1])
+    if len(filas) <= limite:
+        return filas, None
+
+    filas = filas[:limite]
+    ultima = filas[-1]
+    if isinstance(ultima, dict):
+        valores = {campo: ultima[campo] for campo in campos}
+    else:
+        valores = {campo: getattr(ultima, campo) for campo in campos}
+    return filas, codificar_cursor(valores)
+
+
+def recorrer_por_lotes(queryset, tamano_lote):
+    """
+    Recorre un queryset de .values() (que incluya 'id') en orden de id, con un
+    SELECT ... WHERE id > último LIMIT tamano_lote por lote. A diferencia de
+    .iterator() no depende de cursores del lado del servidor: detrás de un
+    pooler en modo transacción están desactivados (DISABLE_SERVER_SIDE_CURSORS)
+    y .iterator() traería todo el resultado a memoria de una vez.
+    """
+    queryset = queryset.order_by('id')
+    filas = list(queryset[:tamano_lote])
+    while filas:
+        yield from filas
+        if len(filas) < tamano_lote:
+            return
+        filas = list(queryset.filter(id__gt=filas[-1]['id'])[:tamano_lote])
@@ -0,0 +1,84 @@
+"""Reglas de precios del carrito: envío, descuentos y totales"""
+from decimal import Decimal, ROUND_HALF_UP
+from django.conf import settings
+
+CENTAVOS = Decimal('0.01')
+
+# (subtotal mínimo, costo de envío). Se aplica la primera regla cuyo mínimo
+# se alcance, así que deben ir de mayor a menor.
+REGLAS_ENVIO = [
+    (Decimal('500'), Decimal('0')),
+    (Decimal('0'), Decimal('50')),
+]
+
+# (subtotal que hay que superar, porcentaje de descuento), de mayor a menor.
+REGLAS_DESCUENTO = [
+    (Decimal('300'), Decimal('10')),
+]
+
+
+def redondear(valor):
+    return Decimal(valor).quantize(CENTAVOS, rounding=ROUND_HALF_UP)
+
+
+def reglas_envio():
+    """Reglas de envío; se pueden sobreescribir con CARRITO_REGLAS_ENVIO"""
+    reglas = getattr(settings, 'CARRITO_REGLAS_ENVIO', REGLAS_ENVIO)
+    return [(Decimal(str(minimo)), Decimal(str(costo))) for minimo, costo in reglas]
+
+
+def reglas_descuento():
+    """Reglas de descuento; se pueden sobreescribir con CARRITO_REGLAS_DESCUENTO"""
+    reglas = getattr(settings, 'CARRITO_REGLAS_DESCUENTO', REGLAS_DESCUENTO)
+    return [(Decimal(str(minimo)), Decimal(str(porcentaje))) for minimo, porcentaje in reglas]
+
+
+def calcular_envio(subtotal):
+    for minimo, costo in reglas_envio():
+        if subtotal >= minimo:
+            return costo
+    return Decimal('0')
+
+
+def calcular_descuento(subtotal):
+    for minimo, porcentaje in reglas_descuento():
+        if subtotal > minimo:
+            return redondear(subtotal * porcentaje / 100)
+    return Decimal('0')
+
+
+def umbral_envio_gratis():
+    """Subtotal mínimo a partir del cual el envío es gratis"""
+    umbrales = [minimo for minimo, costo in reglas_envio() if costo == 0]
+    return min(umbrales) if umbrales else None
+
+
+def calcular_totales(subtotal, total_items=0):
+    """Calcula envío, descuento y total a partir del subtotal acumulado"""
+    subtotal = redondear(subtotal)
+
+    if not total_items:
+        envio = descuento = Decimal('0')
+    else:
+        envio = calcular_envio(subtotal)
+        descuento = calcular_descuento(subtotal)
+
+    umbral = umbral_envio_gratis()
+    faltante = max(Decimal('0'), umbral - subtotal) if umbral is not None else Decimal('0')
+
+    return {
+        'total_items': total_items,
+        'subtotal': subtotal,
+        'envio': redondear(envio),
+        'descuento': redondear(descuento),
+        'total': redondear(subtotal + envio - descuento),
+        'faltante_envio_gratis': redondear(faltante),
+    }
+
+
+def totales_json(totales):
+    """Convierte los totales a números para JsonResponse"""
+    return {
+        clave: float(valor) if isinstance(valor, Decimal) else valor
+        for clave, valor in totales.items()
+    }
@@ -0,0 +1,45 @@
+import shutil
+import tempfile
+from django.apps import apps
+from django.conf import settings
+from django.core.cache.backends.filebased import FileBasedCache
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+from django.utils.module_loading import import_string
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Los modelos Usuario, Categoria y Producto usan managed = False porque sus
+    tablas ya existen en la base de producción. Para las pruebas se crean
+    directamente desde los modelos actuales en lugar de usar las migraciones.
+
+    Las cachés en archivos se mueven a un directorio temporal para que las
+    pruebas no lean ni borren los datos de runserver.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.directorio_caches = tempfile.mkdtemp(prefix='pruebas-cache-')
+        self.caches_temporales = override_settings(CACHES={
+            alias: {**config, 'LOCATION': f'{self.directorio_caches}/{alias}'}
+            if issubclass(import_string(config['BACKEND']), FileBasedCache) else config
+            for alias, config in settings.CACHES.items()
+        })
+        self.caches_temporales.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.caches_temporales.disable()
+        shutil.rmtree(self.directorio_caches, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
+
+    def setup_databases(self, **kwargs):
+        no_administrados = [m for m in apps.get_app_config('mypagina').get_models() if not m._meta.managed]
+        for modelo in no_administrados:
+            modelo._meta.managed = True
+        try:
+            with override_settings(MIGRATION_MODULES={'mypagina': None}):
+                return super().setup_databases(**kwargs)
+        finally:
+            for modelo in no_administrados:
+                modelo._meta.managed = False
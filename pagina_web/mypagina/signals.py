@@ -0,0 +1,82 @@
+from django.db import transaction
+from django.db.models.signals import pre_delete, post_delete, post_save
+from django.dispatch import receiver
+from .models import Categoria, Producto, Usuario, ItemCarrito
+from .estadisticas import invalidar_estadisticas_productos, invalidar_estadisticas_usuarios
+from . import autenticacion, catalogo, correos, fragmentos
+
+
+@receiver(pre_delete, sender=Producto)
+def recordar_carritos_afectados(sender, instance, **kwargs):
+    """Guarda qué usuarios tienen el producto antes de que se borren sus items en cascada"""
+    instance._usuarios_con_producto = list(
+        ItemCarrito.objects.filter(producto=instance).values_list('usuario_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Producto)
+def recalcular_carritos_afectados(sender, instance, **kwargs):
+    """Recalcula el resumen de los carritos que tenían el producto eliminado"""
+    usuarios = Usuario.objects.filter(id__in=getattr(instance, '_usuarios_con_producto', [])).only('id')
+    for usuario in usuarios:
+        usuario.recalcular_resumen_carrito()
+
+
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+def invalidar_cache_productos(sender, **kwargs):
+    transaction.on_commit(invalidar_estadisticas_productos)
+
+
+@receiver(post_save, sender=Usuario)
+@receiver(post_delete, sender=Usuario)
+def invalidar_cache_usuarios(sender, update_fields=None, **kwargs):
+    # Iniciar sesión solo actualiza last_login, que no cambia los contadores
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    transaction.on_commit(invalidar_estadisticas_usuarios)
+    transaction.on_commit(fragmentos.invalidar_usuarios)
+
+
+@receiver(post_save, sender=Usuario)
+@receiver(post_delete, sender=Usuario)
+def invalidar_usuario_en_cache(sender, instance, update_fields=None, **kwargs):
+    # last_login no se usa en las vistas; el resto (estado, permisos, contraseña) sí
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    usuario_id = instance.pk
+    transaction.on_commit(lambda: autenticacion.invalidar_usuarios(usuario_id))
+
+
+@receiver(post_save, sender=Usuario)
+def registrar_email_usuario(sender, instance, created, update_fields=None, **kwargs):
+    # Se agrega en el acto y no al confirmar: si la transacción se revierte el
+    # correo queda como falso positivo, que solo cuesta una consulta de más
+    if update_fields is not None and 'email' not in update_fields:
+        return
+    if 'email' not in instance.__dict__:
+        return  # Diferido: no se guardó
+    # Guardar sin cambiar el correo no lo vuelve a agregar: cada agregado cuenta
+    # para que el filtro se llene y se reconstruya
+    if not created and instance.email == getattr(instance, '_email_cargado', None):
+        return
+    correos.registrar_email(instance.email)
+
+    # Los filtros de los demás procesos solo se enteran al confirmar
+    transaction.on_commit(correos.avisar_alta if created else correos.avisar_edicion)
+    instance._email_cargado = instance.email
+
+
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+def invalidar_catalogo_producto(sender, instance, **kwargs):
+    transaction.on_commit(lambda: catalogo.invalidar_categoria(instance.categoria_id))
+
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+def invalidar_catalogo_categoria(sender, instance, **kwargs):
+    def invalidar():
+        catalogo.invalidar_categorias()
+        catalogo.invalidar_categoria(instance.id)
+    transaction.on_commit(invalidar)
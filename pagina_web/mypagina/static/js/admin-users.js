@@ -21,6 +21,80 @@ class AdminUsersManager {
                 this.buscarUsuarios(e.target.value);
             }
         });
+
+        // Selección múltiple
+        document.getElementById('seleccionarTodos').addEventListener('change', (e) => {
+            this.seleccionarVisibles(e.target.checked);
+        });
+
+        document.querySelector('.users-table').addEventListener('change', (e) => {
+            if (e.target.classList.contains('seleccionar-usuario')) {
+                this.actualizarSeleccion();
+            }
+        });
+    }
+
+    usuariosSeleccionados() {
+        return Array.from(document.querySelectorAll('.seleccionar-usuario:checked'))
+            .map(casilla => parseInt(casilla.value, 10));
+    }
+
+    seleccionarVisibles(marcar) {
+        // Solo los usuarios que dejan ver la búsqueda y los filtros actuales
+        document.querySelectorAll('.table-row').forEach(fila => {
+            const casilla = fila.querySelector('.seleccionar-usuario');
+            if (casilla) {
+                casilla.checked = marcar && fila.style.display !== 'none';
+            }
+        });
+        this.actualizarSeleccion();
+    }
+
+    actualizarSeleccion() {
+        const total = this.usuariosSeleccionados().length;
+        document.getElementById('totalSeleccionados').textContent = total;
+        document.getElementById('accionesMasivas').style.display = total ? '' : 'none';
+    }
+
+    async accionMasiva(accion) {
+        const usuarioIds = this.usuariosSeleccionados();
+        if (!usuarioIds.length) {
+            return;
+        }
+
+        const descripciones = {
+            activar: 'activar',
+            desactivar: 'desactivar',
+            hacer_admin: 'convertir en administradores a',
+            quitar_admin: 'quitar el rol de administrador a',
+            eliminar: 'ELIMINAR PERMANENTEMENTE a'
+        };
+        if (!confirm(`¿Estás seguro de que quieres ${descripciones[accion]} ${usuarioIds.length} usuarios?`)) {
+            return;
+        }
+
+        try {
+            // Se envía como JSON: miles de ids no caben en los campos de un formulario
+            const response = await fetch('/api/usuarios-masivo/', {
+                method: 'POST',
+                headers: {
+                    'X-CSRFToken': this.getCSRFToken(),
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({ accion: accion, usuario_ids: usuarioIds })
+            });
+
+            const data = await response.json();
+
+            if (data.success) {
+                alert(data.message);
+                location.reload();
+            } else {
+                alert('Error: ' + data.message);
+            }
+        } catch (error) {
+            alert('Error en la operación masiva: ' + error.message);
+        }
     }
 
     buscarUsuarios(termino = null) {
@@ -245,6 +319,10 @@ function eliminarUsuario(usuarioId) {
     window.adminUsersManager.eliminarUsuario(usuarioId);
 }
 
+function accionMasiva(accion) {
+    window.adminUsersManager.accionMasiva(accion);
+}
+
 function buscarUsuarios() {
     window.adminUsersManager.buscarUsuarios();
 }
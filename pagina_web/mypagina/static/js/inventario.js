@@ -17,6 +17,20 @@ function inicializarInventario() {
         console.error('❌ No se encontró el botón agregar producto');
     }
     
+    // Importación y exportación masiva
+    const btnImportar = document.getElementById('btn-importar-productos');
+    const archivoImportar = document.getElementById('archivo-importar');
+    if (btnImportar && archivoImportar) {
+        btnImportar.addEventListener('click', () => archivoImportar.click());
+        archivoImportar.addEventListener('change', importarProductos);
+        console.log('✅ Importación configurada');
+    }
+    
+    const btnExportar = document.getElementById('btn-exportar-productos');
+    if (btnExportar) {
+        btnExportar.addEventListener('click', actualizarEnlaceExportar);
+    }
+    
     // Filtro de categoría
     const categoryFilter = document.getElementById('category-filter');
     if (categoryFilter) {
@@ -49,40 +63,65 @@ function inicializarInventario() {
         console.log('✅ Delegación de eventos configurada');
     }
     
-    // Cargar todos los productos al inicio
-    cargarTodosLosProductos();
+    // Botón para cargar la siguiente página
+    const btnCargarMas = document.getElementById('btn-cargar-mas');
+    if (btnCargarMas) {
+        btnCargarMas.addEventListener('click', cargarSiguientePagina);
+        console.log('✅ Paginación configurada');
+    }
+    
+    // La primera página ya viene renderizada desde el servidor
 }
 
+// Estado de la paginación por cursor
+const paginacion = {
+    categoriaId: '',
+    stockFiltro: '',
+    cargando: false
+};
+
 function aplicarFiltros() {
     const categoriaId = document.getElementById('category-filter').value;
     const stockFiltro = document.getElementById('stock-filter').value;
     
     console.log('🔄 Aplicando filtros - Categoría:', categoriaId, 'Stock:', stockFiltro);
     
-    // Si hay categoría seleccionada, cargar productos de esa categoría
-    if (categoriaId) {
-        console.log('📦 Cargando productos de categoría:', categoriaId);
-        cargarProductosPorCategoria(categoriaId, stockFiltro);
-    } else {
-        // Si no hay categoría seleccionada, cargar todos los productos
-        console.log('📦 Cargando todos los productos');
-        cargarTodosLosProductos(stockFiltro);
+    paginacion.categoriaId = categoriaId;
+    paginacion.stockFiltro = stockFiltro;
+    cargarPaginaProductos(null, false);
+}
+
+function cargarSiguientePagina() {
+    const btnCargarMas = document.getElementById('btn-cargar-mas');
+    const cursor = btnCargarMas ? btnCargarMas.getAttribute('data-cursor') : '';
+    if (cursor) {
+        cargarPaginaProductos(cursor, true);
     }
 }
 
-function cargarTodosLosProductos(stockFiltro = '') {
-    console.log('📦 Cargando todos los productos...');
-    fetch('/api/productos-por-categoria/')
+function cargarPaginaProductos(cursor, agregar) {
+    if (paginacion.cargando) return;
+    paginacion.cargando = true;
+    
+    const params = new URLSearchParams();
+    if (paginacion.categoriaId) params.append('categoria_id', paginacion.categoriaId);
+    if (paginacion.stockFiltro) params.append('stock', paginacion.stockFiltro);
+    if (cursor) params.append('cursor', cursor);
+    
+    console.log('📦 Cargando página de productos:', params.toString());
+    fetch(`/api/productos-por-categoria/?${params.toString()}`)
         .then(response => {
             console.log('📡 Respuesta del servidor:', response.status);
             if (!response.ok) throw new Error('Error del servidor: ' + response.status);
             return response.json();
         })
         .then(data => {
-            console.log('📊 Todos los productos recibidos:', data);
             if (data.success) {
-                mostrarProductosEnTabla(data.productos, stockFiltro);
-                mostrarNotificacion(`✅ Cargados ${data.productos.length} productos`, 'success');
+                mostrarProductosEnTabla(data.productos, agregar);
+                actualizarBotonCargarMas(data.siguiente_cursor);
+                if (!agregar) {
+                    mostrarNotificacion(`✅ Cargados ${data.productos.length} productos`, 'success');
+                }
             } else {
                 mostrarNotificacion('❌ Error: ' + data.message, 'error');
             }
@@ -90,34 +129,22 @@ function cargarTodosLosProductos(stockFiltro = '') {
         .catch(error => {
             console.error('❌ Error al cargar productos:', error);
             mostrarNotificacion('❌ Error al cargar productos: ' + error.message, 'error');
+        })
+        .finally(() => {
+            paginacion.cargando = false;
         });
 }
 
-function cargarProductosPorCategoria(categoriaId, stockFiltro = '') {
-    console.log(`📦 Cargando productos de categoría: ${categoriaId}`);
-    fetch(`/api/productos-por-categoria/?categoria_id=${categoriaId}`)
-        .then(response => {
-            console.log('📡 Respuesta del servidor:', response.status);
-            if (!response.ok) throw new Error('Error del servidor: ' + response.status);
-            return response.json();
-        })
-        .then(data => {
-            console.log(`📊 Productos de categoría ${categoriaId}:`, data);
-            if (data.success) {
-                mostrarProductosEnTabla(data.productos, stockFiltro);
-                mostrarNotificacion(`✅ Cargados ${data.productos.length} productos de esta categoría`, 'success');
-            } else {
-                mostrarNotificacion('❌ Error: ' + data.message, 'error');
-            }
-        })
-        .catch(error => {
-            console.error('❌ Error:', error);
-            mostrarNotificacion('❌ Error al cargar productos: ' + error.message, 'error');
-        });
+function actualizarBotonCargarMas(siguienteCursor) {
+    const btnCargarMas = document.getElementById('btn-cargar-mas');
+    if (!btnCargarMas) return;
+    
+    btnCargarMas.setAttribute('data-cursor', siguienteCursor || '');
+    btnCargarMas.style.display = siguienteCursor ? '' : 'none';
 }
 
-function mostrarProductosEnTabla(productos, stockFiltro = '') {
-    console.log('🔄 Actualizando tabla con', productos.length, 'productos. Filtro stock:', stockFiltro);
+function mostrarProductosEnTabla(productos, agregar = false) {
+    console.log('🔄 Actualizando tabla con', productos.length, 'productos. Agregar:', agregar);
     
     const tbody = document.querySelector('.inventory-table');
     if (!tbody) {
@@ -125,23 +152,16 @@ function mostrarProductosEnTabla(productos, stockFiltro = '') {
         return;
     }
     
-    // Limpiar tabla (mantener header)
-    const rows = tbody.querySelectorAll('.table-row[data-product-id], .no-products-message');
-    rows.forEach(row => row.remove());
-    
-    // Aplicar filtro de stock si existe
-    let productosFiltrados = productos;
-    if (stockFiltro) {
-        productosFiltrados = productos.filter(producto => {
-            if (stockFiltro === 'low') return producto.stock < 10 && producto.stock > 0;
-            if (stockFiltro === 'out') return producto.stock === 0;
-            if (stockFiltro === 'good') return producto.stock >= 10;
-            return true;
-        });
-        console.log(`🔍 Después de filtrar stock (${stockFiltro}):`, productosFiltrados.length, 'productos');
+    // Limpiar tabla (mantener header) salvo que se agregue una página más
+    if (!agregar) {
+        const rows = tbody.querySelectorAll('.table-row:not(.table-header), .no-products-message');
+        rows.forEach(row => row.remove());
     }
     
-    if (productosFiltrados.length === 0) {
+    // El filtro de stock ya se aplica en el servidor
+    const productosFiltrados = productos;
+    
+    if (productosFiltrados.length === 0 && !agregar) {
         const emptyRow = document.createElement('div');
         emptyRow.className = 'table-row no-products-message';
         emptyRow.style.textAlign = 'center';
@@ -360,7 +380,7 @@ function editarProducto(productId, nombreProducto) {
     console.log(`✏️ Editando producto: ${nombreProducto} (ID: ${productId})`);
     
     // Primero obtener los datos actuales del producto
-    fetch('/api/productos-por-categoria/')
+    fetch(`/api/productos-por-categoria/?producto_id=${productId}`)
         .then(response => response.json())
         .then(data => {
             if (data.success) {
@@ -525,6 +545,57 @@ function eliminarProducto(productId, nombreProducto) {
     }
 }
 
+function importarProductos(event) {
+    const archivo = event.target.files[0];
+    if (!archivo) return;
+    
+    console.log(`📥 Importando ${archivo.name}...`);
+    mostrarNotificacion(`⏳ Importando ${archivo.name}...`, 'info');
+    
+    const formData = new FormData();
+    formData.append('archivo', archivo);
+    
+    fetch('/api/importar-productos/', {
+        method: 'POST',
+        body: formData,
+        headers: {
+            'X-CSRFToken': getCSRFToken(),
+            'X-Requested-With': 'XMLHttpRequest'
+        }
+    })
+    .then(response => response.json())
+    .then(data => {
+        console.log('📨 Respuesta importación:', data);
+        if (data.success) {
+            mostrarNotificacion('✅ ' + data.message, data.con_errores ? 'warning' : 'success');
+            if (data.errores && data.errores.length) {
+                console.table(data.errores.map(e => ({ fila: e.fila, errores: e.errores.join('; ') })));
+            }
+            aplicarFiltros(); // Recargar con los filtros actuales
+        } else {
+            mostrarNotificacion('❌ ' + data.message, 'error');
+        }
+    })
+    .catch(error => {
+        console.error('❌ Error:', error);
+        mostrarNotificacion('❌ Error al importar productos', 'error');
+    })
+    .finally(() => {
+        // Permite volver a elegir el mismo archivo
+        event.target.value = '';
+    });
+}
+
+function actualizarEnlaceExportar() {
+    // Exporta solo la categoría seleccionada, si hay una
+    const params = new URLSearchParams({ formato: 'csv' });
+    const categoriaId = document.getElementById('category-filter')?.value;
+    if (categoriaId) {
+        params.set('categoria_id', categoriaId);
+    }
+    this.href = `/api/exportar-productos/?${params.toString()}`;
+}
+
 // Funciones de utilidad
 function getCSRFToken() {
     const cookieValue = document.cookie
@@ -0,0 +1,79 @@
+"""Respuestas que se generan por partes para no cargar todo el resultado en memoria"""
+import csv
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+TAMANO_LOTE = 2000
+FILAS_POR_BLOQUE = 200
+
+
+def generar_json(clave, filas, extra=None):
+    """
+    Emite {"success": true, ..., "<clave>": [fila, fila, ...]} por bloques de filas.
+    `filas` puede ser cualquier iterable (por ejemplo, .values().iterator()).
+    """
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    cabecera = {'success': True, **(extra or {})}
+
+    yield encoder.encode(cabecera)[:-1]
+    yield f', {encoder.encode(clave)}: ['
+    yield from _bloques_json(encoder, filas)
+    yield ']}'
+
+
+def generar_lista_json(filas):
+    """Emite una lista JSON simple: [fila, fila, ...]"""
+    yield '['
+    yield from _bloques_json(DjangoJSONEncoder(ensure_ascii=False), filas)
+    yield ']\n'
+
+
+def _bloques_json(encoder, filas):
+    # Se agrupan varias filas por escritura para no mandar miles de fragmentos diminutos
+    bloque = []
+    separador = ''
+    for fila in filas:
+        bloque.append(encoder.encode(fila))
+        if len(bloque) >= FILAS_POR_BLOQUE:
+            yield separador + ', '.join(bloque)
+            separador = ', '
+            bloque = []
+
+    if bloque:
+        yield separador + ', '.join(bloque)
+
+
+class _Eco:
+    """Archivo falso: csv.writer escribe y el texto se devuelve tal cual"""
+
+    def write(self, valor):
+        return valor
+
+
+def generar_csv(columnas, filas):
+    """Emite un CSV con encabezado; cada fila es un diccionario con esas columnas"""
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(columnas)
+
+    bloque = []
+    for fila in filas:
+        bloque.append(escritor.writerow([fila.get(columna) for columna in columnas]))
+        if len(bloque) >= FILAS_POR_BLOQUE:
+            yield ''.join(bloque)
+            bloque = []
+
+    if bloque:
+        yield ''.join(bloque)
+
+
+def respuesta_json_streaming(clave, filas, extra=None):
+    return StreamingHttpResponse(
+        generar_json(clave, filas, extra),
+        content_type='application/json',
+    )
+
+
+def respuesta_descarga_streaming(generador, content_type, nombre_archivo):
+    respuesta = StreamingHttpResponse(generador, content_type=content_type)
+    respuesta['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
+    return respuesta
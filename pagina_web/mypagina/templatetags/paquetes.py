@@ -0,0 +1,25 @@
+from django import template
+from django.conf import settings
+from django.templatetags.static import static
+from django.utils.html import format_html_join
+from mypagina.estaticos import paquete_construido, paquetes
+
+register = template.Library()
+
+ETIQUETAS = {
+    '.css': '<link rel="stylesheet" href="{}">',
+    '.js': '<script src="{}"></script>',
+}
+
+
+@register.simple_tag
+def paquete(nombre):
+    """
+    Etiquetas para un paquete de PAQUETES_ESTATICOS: una sola si ya se
+    construyó con collectstatic, o una por archivo fuente en desarrollo.
+    """
+    if nombre not in paquetes():
+        raise template.TemplateSyntaxError(f'{nombre} no está en PAQUETES_ESTATICOS')
+    archivos = [nombre] if not settings.DEBUG and paquete_construido(nombre) else paquetes()[nombre]
+    etiqueta = ETIQUETAS[nombre[nombre.rfind('.'):]]
+    return format_html_join('\n    ', etiqueta, ((static(archivo),) for archivo in archivos))
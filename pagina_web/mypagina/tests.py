@@ -1,3 +1,1504 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import importlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from functools import partial
+from types import SimpleNamespace
+from asgiref.sync import async_to_sync
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.sessions.models import Session
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from unittest import mock
+from django.db import connection, connections, router
+from django.db.models.signals import post_delete
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+from .busqueda import NO_DISPONIBLE, autocompletar, buscar_ids, crear_indices_busqueda, eliminar_indices_busqueda
+from .cache_archivos import CacheArchivos
+from .checks import revisar_caches_compartidas
+from . import (
+    catalogo, compras, contrasenas, correos, estadisticas, fragmentos, gestion_usuarios, importacion, views,
+    views_async,
+)
+from .enrutador import ReplicasMiddleware, lectura_en_replica
+from .estaticos import EstaticosMiddleware, minificar_css, minificar_js
+from .paginacion import CursorInvalido, codificar_cursor, paginar, validar_cursor
+from .models import Usuario, Categoria, Producto, ItemCarrito, ResumenCarrito, Pedido
+from .precios import calcular_totales, redondear, totales_json
 
-# Create your tests here.
+# Datos de cada escenario, de menor a mayor
+TAMANOS = [
+    {'categorias': 2, 'productos': 6, 'usuarios': 3, 'items_carrito': 2},
+    {'categorias': 4, 'productos': 40, 'usuarios': 20, 'items_carrito': 10},
+    {'categorias': 8, 'productos': 150, 'usuarios': 60, 'items_carrito': 30},
+]
+
+# Consultas máximas por vista con la caché vacía. Deben ser las mismas sin
+# importar cuántos productos, usuarios o items del carrito haya.
+PRESUPUESTOS = {
+    'home': 0,
+    'sobre_nosotros': 0,
+    'registro': 0,
+    'registro_verificar_email': 0,
+    'registro_verificar_email_existente': 1,
+    'registro_enviar': 3,
+    'login': 0,
+    'login_verificar_email': 1,
+    'login_verificar_email_inexistente': 0,
+    'login_enviar': 9,
+    'inicio_usuario': 3,
+    'inicio_usuario_categoria': 4,
+    'inicio_usuario_busqueda': 5,
+    'carrito': 3,
+    'buscar_productos': 3,
+    'autocompletar_productos': 2,
+    'agregar_carrito': 11,
+    'actualizar_carrito': 7,
+    'eliminar_carrito': 7,
+    'vaciar_carrito': 5,
+    'obtener_carrito': 3,
+    'realizar_compra': 14,
+    'inicio_admin': 3,
+    'inventario': 4,
+    'administrar_usuarios': 3,
+    'crear_usuario': 3,
+    'editar_usuario': 4,
+    'cambiar_estado_usuario': 3,
+    'eliminar_usuario': 7,
+    'crear_producto': 3,
+    'editar_producto': 4,
+    'eliminar_producto': 6,
+    'productos_por_categoria': 2,
+    'productos_por_categoria_stream': 2,
+    'importar_productos': 7,
+    'ajustar_stock': 5,
+    'usuarios_masivo_desactivar': 4,
+    'usuarios_masivo_eliminar': 9,
+    'metricas_contrasenas': 1,
+    'exportar_productos': 2,
+}
+
+
+def limpiar_caches():
+    """Las cachés no se revierten con la transacción de cada prueba"""
+    for alias in settings.CACHES:
+        caches[alias].clear()
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class PresupuestoConsultasTests(TestCase):
+    """Cada vista debe hacer un número fijo de consultas aunque crezcan los datos"""
+
+    @classmethod
+    def setUpTestData(cls):
+        crear_indices_busqueda(connection)
+
+        cls.admin = Usuario.objects.create_user('admin@tienda.com', 'Administrador', 'Admin123!')
+        cls.admin.is_staff = True
+        cls.admin.is_admin = True
+        cls.admin.save()
+        cls.cliente = Usuario.objects.create_user('cliente@tienda.com', 'Cliente', 'Cliente123!')
+
+    def setUp(self):
+        limpiar_caches()
+        self.contador = 0
+
+    def sembrar(self, categorias, productos, usuarios, items_carrito):
+        """Agrega datos hasta llegar a los tamaños indicados"""
+        for i in range(Categoria.objects.count(), categorias):
+            Categoria.objects.create(nombre=f'Categoría {i}', descripcion='Productos de prueba')
+        ids_categorias = list(Categoria.objects.values_list('id', flat=True))
+
+        existentes = Producto.objects.count()
+        Producto.objects.bulk_create([
+            Producto(
+                nombre=f'Leche marca {i}',
+                descripcion='Leche entera de vaca',
+                precio='25.50',
+                stock=100000,
+                categoria_id=ids_categorias[i % len(ids_categorias)],
+            )
+            for i in range(existentes, productos)
+        ])
+
+        existentes = Usuario.objects.count()
+        for i in range(existentes, usuarios):
+            Usuario.objects.create_user(f'usuario{i}@tienda.com', f'Usuario {i}', 'Usuario123!')
+
+        self.categoria = Categoria.objects.order_by('id').first()
+        self.productos = list(Producto.objects.order_by('id'))
+        self.carrito_base = [
+            {'id': p.id, 'nombre': p.nombre, 'precio': p.precio, 'cantidad': 1}
+            for p in self.productos[:items_carrito]
+        ]
+        self.producto_carrito = self.productos[0]
+        self.producto_fuera_carrito = self.productos[-1]
+
+    def casos(self):
+        """(nombre, método, usuario, url, datos, encabezados) de cada vista de urls.py"""
+        self.contador += 1
+        n = self.contador
+        xhr = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'}
+        usuario_extra = Usuario.objects.create_user(f'extra{n}@tienda.com', 'Extra', 'Extra123!')
+        producto_extra = Producto.objects.create(
+            nombre='Producto temporal', precio='10.00', stock=5, categoria=self.categoria
+        )
+        producto = self.producto_carrito
+        # Usuarios para las operaciones masivas; crecen con el tamaño del escenario
+        ids_masivos = [
+            Usuario.objects.create_user(f'masivo{n}.{i}@tienda.com', 'Masivo', 'Masivo123!').id
+            for i in range(len(self.carrito_base))
+        ]
+        archivo_importacion = (
+            'id,nombre,precio,stock,categoria_id\n'
+            f'{producto.id},{producto.nombre},{producto.precio},100000,{self.categoria.id}\n'
+            f',Producto importado {n},15.00,8,{self.categoria.id}\n'
+        )
+
+        return [
+            ('home', 'get', None, 'home', {}, {}),
+            ('sobre_nosotros', 'get', None, 'sobre_nosotros', {}, {}),
+            ('registro', 'get', None, 'registro', {}, {}),
+            ('registro_verificar_email', 'post', None, 'registro', {'email': 'nuevo@tienda.com'}, xhr),
+            ('registro_verificar_email_existente', 'post', None, 'registro', {'email': ' Cliente@Tienda.com'}, xhr),
+            ('registro_enviar', 'post', None, 'registro',
+             {'nombre': 'Nuevo', 'email': f'registro{n}@tienda.com', 'password': 'Nuevo123!',
+              'confirmar_password': 'Nuevo123!'}, {}),
+            ('login', 'get', None, 'login', {}, {}),
+            ('login_verificar_email', 'post', None, 'login', {'email': 'cliente@tienda.com'}, xhr),
+            ('login_verificar_email_inexistente', 'post', None, 'login', {'email': 'nadie@tienda.com'}, xhr),
+            ('login_enviar', 'post', None, 'login', {'email': 'cliente@tienda.com', 'password': 'Cliente123!'}, {}),
+            ('inicio_usuario', 'get', self.cliente, 'inicio_usuario', {}, {}),
+            ('inicio_usuario_categoria', 'get', self.cliente, 'inicio_usuario',
+             {'categoria_id': self.categoria.id}, {}),
+            ('inicio_usuario_busqueda', 'get', self.cliente, 'inicio_usuario', {'search': 'leche'}, {}),
+            ('carrito', 'get', self.cliente, 'carrito', {}, {}),
+            ('buscar_productos', 'get', self.cliente, 'buscar_productos', {'q': 'leche'}, {}),
+            ('autocompletar_productos', 'get', self.cliente, 'autocompletar_productos', {'q': 'lec'}, {}),
+            ('agregar_carrito', 'post', self.cliente, 'agregar_carrito',
+             {'producto_id': self.producto_fuera_carrito.id, 'cantidad': 1}, {}),
+            ('actualizar_carrito', 'post', self.cliente, 'actualizar_carrito',
+             {'producto_id': producto.id, 'cantidad': 3}, {}),
+            ('eliminar_carrito', 'post', self.cliente, 'eliminar_carrito', {'producto_id': producto.id}, {}),
+            ('vaciar_carrito', 'post', self.cliente, 'vaciar_carrito', {}, {}),
+            ('obtener_carrito', 'get', self.cliente, 'obtener_carrito', {}, {}),
+            ('realizar_compra', 'post', self.cliente, 'realizar_compra', {}, {}),
+            ('inicio_admin', 'get', self.admin, 'inicio_admin', {}, {}),
+            ('inventario', 'get', self.admin, 'inventario', {}, {}),
+            ('administrar_usuarios', 'get', self.admin, 'administrar_usuarios', {}, {}),
+            ('crear_usuario', 'post', self.admin, 'crear_usuario',
+             {'nombre': 'Nuevo', 'email': f'nuevo{n}@tienda.com', 'password': 'Nuevo123!'}, {}),
+            ('editar_usuario', 'post', self.admin, 'editar_usuario',
+             {'usuario_id': usuario_extra.id, 'nombre': 'Editado', 'email': usuario_extra.email}, {}),
+            ('cambiar_estado_usuario', 'post', self.admin, 'cambiar_estado_usuario',
+             {'usuario_id': usuario_extra.id, 'accion': 'desactivar'}, {}),
+            ('eliminar_usuario', 'post', self.admin, 'eliminar_usuario', {'usuario_id': usuario_extra.id}, {}),
+            ('crear_producto', 'post', self.admin, 'crear_producto',
+             {'nombre': 'Nuevo', 'precio': '9.99', 'stock': 3, 'categoria_id': self.categoria.id}, {}),
+            ('editar_producto', 'post', self.admin, 'editar_producto',
+             {'producto_id': producto_extra.id, 'nombre': 'Editado', 'precio': '11.00', 'stock': 4,
+              'categoria_id': self.categoria.id}, {}),
+            ('eliminar_producto', 'post', self.admin, 'eliminar_producto', {'producto_id': producto_extra.id}, {}),
+            ('productos_por_categoria', 'get', self.admin, 'productos_por_categoria', {}, {}),
+            ('productos_por_categoria_stream', 'get', self.admin, 'productos_por_categoria', {'stream': '1'}, {}),
+            ('importar_productos', 'post', self.admin, 'importar_productos',
+             {'archivo': SimpleUploadedFile('productos.csv', archivo_importacion.encode())}, {}),
+            ('exportar_productos', 'get', self.admin, 'exportar_productos', {}, {}),
+            ('usuarios_masivo_desactivar', 'post', self.admin, 'usuarios_masivo',
+             json.dumps({'accion': 'desactivar', 'usuario_ids': ids_masivos + [self.admin.id]}),
+             {'content_type': 'application/json'}),
+            ('usuarios_masivo_eliminar', 'post', self.admin, 'usuarios_masivo',
+             json.dumps({'accion': 'eliminar', 'usuario_ids': ids_masivos}),
+             {'content_type': 'application/json'}),
+            ('metricas_contrasenas', 'get', self.admin, 'metricas_contrasenas', {}, {}),
+            ('ajustar_stock', 'post', self.admin, 'ajustar_stock',
+             json.dumps({'ajustes': [{'producto_id': item['id'], 'delta': 5} for item in self.carrito_base]}),
+             {'content_type': 'application/json'}),
+        ]
+
+    def medir(self, metodo, usuario, url, datos, encabezados):
+        # El carrito y el filtro de correos se reconstruyen antes de cada medición (fuera del conteo)
+        self.cliente.guardar_carrito(self.carrito_base)
+        limpiar_caches()
+        correos.reconstruir_filtro()
+        if usuario:
+            self.client.force_login(usuario)
+        else:
+            self.client.logout()
+
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = getattr(self.client, metodo)(reverse(url), datos, **encabezados)
+            if respuesta.streaming:
+                b''.join(respuesta.streaming_content)
+
+        self.assertLess(respuesta.status_code, 400, f'{url} respondió {respuesta.status_code}')
+        # Las vistas JSON responden 200 también cuando fallan
+        if not respuesta.streaming and respuesta.get('Content-Type') == 'application/json':
+            self.assertIsNot(respuesta.json().get('success'), False, f'{url}: {respuesta.json()}')
+        return len(consultas)
+
+    def medir_todo(self):
+        return {
+            nombre: self.medir(metodo, usuario, url, datos, encabezados)
+            for nombre, metodo, usuario, url, datos, encabezados in self.casos()
+        }
+
+    def test_presupuesto_de_consultas_por_vista(self):
+        resultados = []
+        for tamano in TAMANOS:
+            self.sembrar(**tamano)
+            resultados.append(self.medir_todo())
+
+        self.assertEqual(set(resultados[0]), set(PRESUPUESTOS), 'Falta el presupuesto de alguna vista')
+        for nombre, presupuesto in PRESUPUESTOS.items():
+            with self.subTest(vista=nombre):
+                conteos = [resultado[nombre] for resultado in resultados]
+                self.assertLessEqual(max(conteos), presupuesto, f'{nombre}: {conteos} consultas')
+                self.assertEqual(len(set(conteos)), 1, f'{nombre} crece con los datos: {conteos}')
+
+    def test_vistas_asincronas_del_carrito(self):
+        """Las vistas de views_async.py responden lo mismo que las síncronas y con las mismas consultas"""
+        self.sembrar(**TAMANOS[0])
+        fabrica = RequestFactory()
+        for nombre, metodo, usuario, url, datos, encabezados in self.casos():
+            asincrona = getattr(views_async, resolve(reverse(url)).func.__name__, None)
+            if asincrona is None:
+                continue
+
+            with self.subTest(vista=nombre):
+                resultados = []
+                for vista in (getattr(views, asincrona.__name__), asincrona):
+                    self.cliente.guardar_carrito(self.carrito_base)
+                    limpiar_caches()
+                    request = getattr(fabrica, metodo)(reverse(url), datos, **encabezados)
+                    request.user = usuario
+
+                    async def auser(usuario=usuario):
+                        return usuario
+                    request.auser = auser
+
+                    with CaptureQueriesContext(connection) as consultas:
+                        if asyncio.iscoroutinefunction(vista):
+                            respuesta = async_to_sync(vista)(request)
+                        else:
+                            respuesta = vista(request)
+                    resultados.append((json.loads(respuesta.content), len(consultas)))
+
+                self.assertTrue(resultados[0][0]['success'], resultados[0][0])
+                self.assertEqual(resultados[0], resultados[1])
+
+    def test_usuario_de_la_sesion_en_cache(self):
+        """request.user se carga sin la columna carrito, sale de la caché y se invalida al desactivarlo"""
+        self.client.force_login(self.cliente)
+        url = reverse('obtener_carrito')
+
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(url)
+        sql = [consulta['sql'] for consulta in consultas if 'FROM "usuarios"' in consulta['sql']]
+        self.assertEqual(len(sql), 1)
+        self.assertNotIn('"carrito"', sql[0])
+
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(url)
+        self.assertFalse([consulta for consulta in consultas if 'FROM "usuarios"' in consulta['sql']])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cliente.desactivar()
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+    def test_fragmentos_en_cache(self):
+        """La segunda visita no consulta lo que muestran los fragmentos y un cambio los renueva"""
+        self.sembrar(**TAMANOS[0])
+        producto = self.productos[0]
+        paginas = [
+            (self.cliente, reverse('inicio_usuario') + f'?categoria_id={producto.categoria_id}'),
+            (self.admin, reverse('inventario')),
+            (self.admin, reverse('administrar_usuarios')),
+        ]
+
+        def tablas_consultadas(consultas):
+            return {tabla for tabla in ('productos', 'categorias', 'usuarios')
+                    if any(f'FROM "{tabla}"' in consulta['sql'] for consulta in consultas)}
+
+        for usuario, url in paginas:
+            with self.subTest(url=url):
+                self.client.force_login(usuario)
+                primera = self.client.get(url)
+                with CaptureQueriesContext(connection) as consultas:
+                    segunda = self.client.get(url)
+                self.assertEqual(tablas_consultadas(consultas), set())
+                self.assertEqual(primera.content, segunda.content)
+
+        producto.nombre = 'Leche renombrada'
+        with self.captureOnCommitCallbacks(execute=True):
+            producto.save()
+        for usuario, url in paginas[:2]:
+            self.client.force_login(usuario)
+            self.assertContains(self.client.get(url), 'Leche renombrada')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cliente.desactivar()
+        self.assertContains(self.client.get(paginas[2][1]), f'user-inactive" data-user-id="{self.cliente.id}"')
+
+    def test_rutas_cubiertas(self):
+        """Toda ruta de mypagina/urls.py debe tener un caso con presupuesto"""
+        from .urls import urlpatterns
+        self.sembrar(**TAMANOS[0])
+        cubiertas = {url for _, _, _, url, _, _ in self.casos()}
+        self.assertEqual({patron.name for patron in urlpatterns} - cubiertas, set())
+
+
+@mock.patch('mypagina.enrutador.replicas', return_value=['replica1'])
+class EnrutadorReplicasTests(SimpleTestCase):
+    """Qué lecturas van a la réplica y cuándo se fija al usuario en el primario"""
+
+    def pedir(self, metodo='get', marcada=True, cookies=None):
+        destinos = {}
+
+        def vista(request):
+            destinos['producto'] = router.db_for_read(Producto)
+            destinos['carrito'] = router.db_for_read(ItemCarrito)
+            return HttpResponse()
+        if marcada:
+            vista = lectura_en_replica(vista)
+
+        def siguiente(request):
+            middleware.process_view(request, vista, (), {})
+            return vista(request)
+        middleware = ReplicasMiddleware(siguiente)
+
+        request = getattr(RequestFactory(), metodo)('/')
+        request.COOKIES.update(cookies or {})
+        respuesta = middleware(request)
+        destinos['despues'] = router.db_for_read(Producto)
+        return destinos, respuesta
+
+    def test_vista_marcada_lee_de_la_replica(self, replicas):
+        destinos, respuesta = self.pedir()
+        self.assertEqual(destinos, {'producto': 'replica1', 'carrito': 'default', 'despues': 'default'})
+        self.assertNotIn(settings.REPLICA_COOKIE, respuesta.cookies)
+
+    def test_vista_sin_marcar_lee_del_primario(self, replicas):
+        destinos, _ = self.pedir(marcada=False)
+        self.assertEqual(destinos['producto'], 'default')
+
+    def test_escritura_fija_al_primario(self, replicas):
+        destinos, respuesta = self.pedir('post')
+        self.assertEqual(destinos['producto'], 'default')
+        self.assertEqual(respuesta.cookies[settings.REPLICA_COOKIE]['max-age'], settings.REPLICA_PEGAJOSIDAD)
+
+        destinos, _ = self.pedir(cookies={settings.REPLICA_COOKIE: '1'})
+        self.assertEqual(destinos['producto'], 'default')
+
+
+class EstaticosTests(SimpleTestCase):
+    """Minificación, construcción de STATIC_ROOT y cabeceras de EstaticosMiddleware"""
+
+    def test_minificadores_conservan_el_significado(self):
+        self.assertEqual(
+            minificar_css('a :hover , b > c { content: "a  ;  }" ; margin: 0 auto ; } /* fin */'),
+            'a :hover,b>c{content:"a  ;  }";margin:0 auto}\n',
+        )
+        js = minificar_js(
+            'const re = /a\\/b[/]/g\n'    # regex con '/' escapada y dentro de una clase
+            'let x = a++\n'               # el salto de línea termina la instrucción
+            'b = c / d;  // comentario\n'
+            't = `  ${ f({a: 1}) }  `;\n'
+            'z = a + +b\n'
+        )
+        self.assertEqual(js, 'const re=/a\\/b[/]/g\nlet x=a++\nb=c/d;t=`  ${f({a:1})}  `;z=a+ +b\n')
+
+    def test_construir_y_servir(self):
+        with tempfile.TemporaryDirectory() as raiz, override_settings(STATIC_ROOT=raiz, DEBUG=False):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            url = staticfiles_storage.url('css/panel.css')
+            self.assertRegex(url, r'^/static/css/panel\.[0-9a-f]{12}\.css$')
+
+            middleware = EstaticosMiddleware(lambda request: HttpResponse(status=404))
+            respuesta = middleware(RequestFactory().get(url, HTTP_ACCEPT_ENCODING='gzip, br;q=0'))
+            self.assertEqual(respuesta['Content-Encoding'], 'gzip')
+            self.assertEqual(respuesta['Cache-Control'], 'public, max-age=31536000, immutable')
+            self.assertEqual(respuesta['Vary'], 'Accept-Encoding')
+            contenido = gzip.decompress(b''.join(respuesta.streaming_content)).decode()
+            self.assertIn('--primary:', contenido)      # de inicioUsuario.css
+            self.assertNotIn('/*', contenido)
+
+            respuesta = middleware(RequestFactory().get(url, HTTP_IF_MODIFIED_SINCE=respuesta['Last-Modified']))
+            self.assertEqual(respuesta.status_code, 304)
+            self.assertEqual(
+                middleware(RequestFactory().get('/static/css/admin.css'))['Cache-Control'],
+                f'public, max-age={settings.ESTATICOS_MAX_AGE}',
+            )
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class CarritoTests(TestCase):
+    """Filas de items_carrito y resumen acumulado después de cada operación"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.categoria = Categoria.objects.create(nombre='Lácteos')
+        cls.leche = Producto.objects.create(nombre='Leche', precio='25.50', stock=50, categoria=cls.categoria)
+        cls.queso = Producto.objects.create(nombre='Queso', precio='80.00', stock=50, categoria=cls.categoria)
+        cls.usuario = Usuario.objects.create_user('carrito@tienda.com', 'Carrito', 'Carrito123!')
+
+    def items(self):
+        return dict(self.usuario.items_carrito.values_list('producto_id', 'cantidad'))
+
+    def assertResumenAlDia(self):
+        """El resumen acumulado coincide con recorrer los items"""
+        resumen = ResumenCarrito.objects.get(usuario=self.usuario)
+        acumulado = (resumen.total_items, resumen.subtotal)
+        recalculado = self.usuario.recalcular_resumen_carrito()
+        self.assertEqual(acumulado, (recalculado.total_items, recalculado.subtotal))
+
+    def test_migracion_de_carritos_json(self):
+        migracion = importlib.import_module('mypagina.migrations.0003_migrar_carritos_json')
+        Usuario.objects.filter(id=self.usuario.id).update(carrito=json.dumps([
+            {'id': self.leche.id, 'nombre': 'Leche', 'precio': 25.5, 'cantidad': 2},
+            {'id': str(self.leche.id), 'cantidad': 1},          # repetido: se suma
+            {'id': self.queso.id, 'precio': '80', 'cantidad': 0},  # sin cantidad: se descarta
+            {'id': 999999, 'cantidad': 1},                       # producto borrado
+            {'nombre': 'sin id'},
+        ]))
+        otro = Usuario.objects.create_user('roto@tienda.com', 'Roto', 'Roto123!')
+        Usuario.objects.filter(id=otro.id).update(carrito='no es json')
+
+        migracion.migrar_carritos(django_apps, SimpleNamespace(connection=connection))
+
+        item = ItemCarrito.objects.get(usuario=self.usuario)
+        self.assertEqual((item.producto_id, item.cantidad, item.precio), (self.leche.id, 3, Decimal('25.50')))
+        self.assertFalse(ItemCarrito.objects.filter(usuario=otro).exists())
+
+        Usuario.objects.filter(id=self.usuario.id).update(carrito='[]')
+        migracion.restaurar_carritos(django_apps, SimpleNamespace(connection=connection))
+        carrito = json.loads(Usuario.objects.values_list('carrito', flat=True).get(id=self.usuario.id))
+        self.assertEqual([(linea['id'], linea['cantidad']) for linea in carrito], [(self.leche.id, 3)])
+
+    def test_operaciones_actualizan_filas_y_resumen(self):
+        datos = {'nombre': 'Leche', 'precio': 25.5}
+        self.usuario.agregar_al_carrito(self.leche.id, 2, datos)
+        totales = self.usuario.agregar_al_carrito(self.leche.id, 1, datos)
+        self.assertEqual(self.items(), {self.leche.id: 3})
+        self.assertEqual((totales['total_items'], totales['subtotal']), (3, Decimal('76.50')))
+
+        self.usuario.agregar_al_carrito(self.queso.id, 1, {'nombre': 'Queso', 'precio': 80})
+        totales = self.usuario.actualizar_cantidad(self.leche.id, 10)
+        self.assertEqual(self.items(), {self.leche.id: 10, self.queso.id: 1})
+        self.assertEqual(totales['subtotal'], Decimal('335.00'))
+        self.assertResumenAlDia()
+
+        totales = self.usuario.actualizar_cantidad(self.queso.id, 0)
+        self.assertEqual(self.items(), {self.leche.id: 10})
+        self.assertEqual(totales['subtotal'], Decimal('255.00'))
+        self.assertResumenAlDia()
+
+        totales = self.usuario.eliminar_del_carrito(self.leche.id)
+        self.assertEqual((self.items(), totales['total_items'], totales['total']), ({}, 0, Decimal('0.00')))
+        self.assertResumenAlDia()
+
+    def test_agregar_sin_datos_no_crea_la_fila(self):
+        totales = self.usuario.agregar_al_carrito(self.leche.id, 1)
+        self.assertEqual((self.items(), totales['total_items']), ({}, 0))
+
+    def test_guardar_carrito_reemplaza_y_redondea(self):
+        self.usuario.agregar_al_carrito(self.queso.id, 1, {'nombre': 'Queso', 'precio': 80})
+        self.usuario.guardar_carrito([
+            {'id': self.leche.id, 'precio': 10.005, 'cantidad': 3},
+            {'id': self.queso.id, 'precio': 80, 'cantidad': 0},
+        ])
+        self.assertEqual(self.items(), {self.leche.id: 3})
+        self.assertEqual(self.usuario.items_carrito.get().precio, Decimal('10.01'))
+        self.assertEqual(self.usuario.obtener_totales_carrito()['subtotal'], Decimal('30.03'))
+
+        self.usuario.vaciar_carrito()
+        self.assertEqual(self.items(), {})
+        self.assertResumenAlDia()
+
+
+class PreciosTests(SimpleTestCase):
+    """Reglas de envío y descuento en los límites, siempre con Decimal"""
+
+    def test_redondear_a_centavos_hacia_arriba_en_la_mitad(self):
+        self.assertEqual(redondear(Decimal('0.005')), Decimal('0.01'))
+        self.assertEqual(redondear(Decimal('2.675')), Decimal('2.68'))
+        self.assertEqual(redondear(Decimal('-0.005')), Decimal('-0.01'))
+        self.assertEqual(redondear(7), Decimal('7.00'))
+        self.assertEqual(redondear('0.1') + redondear('0.2'), Decimal('0.30'))
+
+    def test_limites_de_envio_y_descuento(self):
+        casos = {
+            # subtotal: (envío, descuento, total)
+            '300.00': ('50', '0', '350.00'),        # el descuento exige superar 300
+            '300.01': ('50', '30.00', '320.01'),
+            '499.99': ('50', '50.00', '499.99'),    # 49.999 de descuento se redondea
+            '500.00': ('0', '50.00', '450.00'),     # envío gratis desde 500 inclusive
+        }
+        for subtotal, (envio, descuento, total) in casos.items():
+            with self.subTest(subtotal=subtotal):
+                totales = calcular_totales(Decimal(subtotal), 1)
+                self.assertEqual(
+                    (totales['envio'], totales['descuento'], totales['total']),
+                    (Decimal(envio), Decimal(descuento), Decimal(total)),
+                )
+
+    def test_carrito_vacio_y_faltante_para_envio_gratis(self):
+        totales = calcular_totales(Decimal('0'))
+        self.assertEqual((totales['envio'], totales['total']), (Decimal('0'), Decimal('0.00')))
+        self.assertEqual(totales['faltante_envio_gratis'], Decimal('500.00'))
+        self.assertEqual(calcular_totales(Decimal('620'), 3)['faltante_envio_gratis'], Decimal('0.00'))
+
+    @override_settings(CARRITO_REGLAS_ENVIO=[(1000, 0), (200, 25.5), (0, 99)], CARRITO_REGLAS_DESCUENTO=[])
+    def test_reglas_configurables(self):
+        self.assertEqual(calcular_totales(Decimal('150'), 1)['envio'], Decimal('99.00'))
+        totales = calcular_totales(Decimal('200'), 1)
+        self.assertEqual((totales['envio'], totales['descuento']), (Decimal('25.50'), Decimal('0')))
+        self.assertEqual(totales['faltante_envio_gratis'], Decimal('800.00'))
+        self.assertEqual(totales_json(totales)['total'], 225.5)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class CompraTests(TestCase):
+    """realizar_compra: pedido, líneas, stock y respuesta JSON"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.categoria = Categoria.objects.create(nombre='Lácteos')
+        cls.leche = Producto.objects.create(nombre='Leche', precio='25.50', stock=10, categoria=cls.categoria)
+        cls.queso = Producto.objects.create(nombre='Queso', precio='80.00', stock=2, categoria=cls.categoria)
+        cls.usuario = Usuario.objects.create_user('compra@tienda.com', 'Compra', 'Compra123!')
+
+    def setUp(self):
+        limpiar_caches()
+        self.client.force_login(self.usuario)
+
+    def comprar(self, **cantidades):
+        productos = {'leche': self.leche, 'queso': self.queso}
+        self.usuario.guardar_carrito([
+            {'id': productos[nombre].id, 'nombre': productos[nombre].nombre,
+             'precio': productos[nombre].precio, 'cantidad': cantidad}
+            for nombre, cantidad in cantidades.items()
+        ])
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('realizar_compra')).json()
+
+    def stock(self):
+        return dict(Producto.objects.values_list('nombre', 'stock'))
+
+    def test_compra_exitosa(self):
+        respuesta = self.comprar(leche=4, queso=2)
+
+        self.assertTrue(respuesta['success'], respuesta)
+        self.assertEqual((respuesta['subtotal'], respuesta['envio'], respuesta['total']), (262.0, 50.0, 312.0))
+        self.assertEqual(self.stock(), {'Leche': 6, 'Queso': 0})
+        pedido = Pedido.objects.get(usuario=self.usuario)
+        self.assertEqual(respuesta['orden_numero'], pedido.numero)
+        self.assertEqual(
+            sorted(pedido.lineas.values_list('nombre', 'cantidad', 'precio_unitario', 'subtotal')),
+            [('Leche', 4, Decimal('25.50'), Decimal('102.00')), ('Queso', 2, Decimal('80.00'), Decimal('160.00'))],
+        )
+        self.assertFalse(self.usuario.items_carrito.exists())
+        self.assertEqual(self.usuario.obtener_totales_carrito()['total_items'], 0)
+
+    def test_stock_insuficiente_revierte_todo(self):
+        respuesta = self.comprar(leche=4, queso=3)
+
+        self.assertFalse(respuesta['success'])
+        self.assertEqual(respuesta['message'], 'No hay suficiente stock de: Queso')
+        self.assertEqual(respuesta['sin_stock'], [{'id': self.queso.id, 'nombre': 'Queso', 'solicitado': 3, 'disponible': 2}])
+        # La leche sí alcanzaba, pero su descuento también se deshace
+        self.assertEqual(self.stock(), {'Leche': 10, 'Queso': 2})
+        self.assertFalse(Pedido.objects.exists())
+        self.assertEqual(self.usuario.items_carrito.count(), 2)
+
+    def test_reabastecimiento_durante_la_compra(self):
+        """Si el stock llega entre el UPDATE fallido y la revisión, la compra se completa"""
+        original = compras.lineas_sin_stock
+
+        def reabastecer(items):
+            Producto.objects.filter(id=self.queso.id).update(stock=5)
+            return original(items)
+
+        with mock.patch('mypagina.compras.lineas_sin_stock', side_effect=reabastecer):
+            respuesta = self.comprar(queso=3)
+
+        self.assertTrue(respuesta['success'], respuesta)
+        self.assertEqual(self.stock()['Queso'], 2)
+        self.assertEqual(Pedido.objects.get().total_items, 3)
+
+    def test_carrito_vacio(self):
+        respuesta = self.client.post(reverse('realizar_compra')).json()
+        self.assertEqual(respuesta, {'success': False, 'message': 'Tu carrito está vacío'})
+
+
+class EstadisticasTests(TestCase):
+    """Los contadores del panel viven en la caché compartida"""
+
+    def setUp(self):
+        limpiar_caches()
+
+    def test_invalidacion_visible_desde_otro_worker(self):
+        categoria = Categoria.objects.create(nombre='Limpieza')
+        Producto.objects.create(nombre='Jabón', precio='12.00', stock=0, categoria=categoria)
+        self.assertEqual(estadisticas.estadisticas_productos()['productos_agotados'], 1)
+
+        # Otra instancia del mismo alias, como la que tendría otro proceso
+        otro_worker = caches.create_connection(settings.ESTADISTICAS_CACHE_ALIAS)
+        self.assertEqual(otro_worker.get(estadisticas.CLAVE_PRODUCTOS)['total_productos'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Producto.objects.create(nombre='Cloro', precio='20.00', stock=0, categoria=categoria)
+        self.assertIsNone(otro_worker.get(estadisticas.CLAVE_PRODUCTOS))
+        self.assertEqual(estadisticas.estadisticas_productos()['productos_agotados'], 2)
+
+    def test_version_de_fragmentos_compartida(self):
+        version = fragmentos.version_usuarios()
+        otro_worker = caches.create_connection(settings.ESTADISTICAS_CACHE_ALIAS)
+        self.assertEqual(otro_worker.get(fragmentos.VERSION_USUARIOS), version)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Usuario.objects.create_user('ana@tienda.com', 'Ana', 'Ana12345!')
+        self.assertNotEqual(otro_worker.get(fragmentos.VERSION_USUARIOS), version)
+        self.assertEqual(otro_worker.get(fragmentos.VERSION_USUARIOS), fragmentos.version_usuarios())
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class BusquedaTests(TestCase):
+    """Relevancia, autocompletado y sincronización del índice FTS5"""
+
+    @classmethod
+    def setUpTestData(cls):
+        crear_indices_busqueda(connection)
+        lacteos = Categoria.objects.create(nombre='Lácteos')
+        cls.quesos = Categoria.objects.create(nombre='Queso')
+        cls.por_nombre = Producto.objects.create(
+            nombre='Queso fresco', precio='40.00', precio_original='50.00', descuento=20, stock=5, categoria=lacteos
+        )
+        cls.por_descripcion = Producto.objects.create(
+            nombre='Tostadas', descripcion='Ideales con queso', precio='20.00', stock=5, categoria=lacteos
+        )
+        cls.por_categoria = Producto.objects.create(nombre='Manchego', precio='90.00', stock=5, categoria=cls.quesos)
+        cls.quesadilla = Producto.objects.create(nombre='Quesadilla', precio='30.00', stock=5, categoria=lacteos)
+        Producto.objects.create(nombre='Queso vencido', precio='1.00', stock=5, categoria=lacteos, activo=False)
+        cls.usuario = Usuario.objects.create_user('busca@tienda.com', 'Busca', 'Busca123!')
+
+    def setUp(self):
+        limpiar_caches()
+        self.client.force_login(self.usuario)
+
+    def test_nombre_antes_que_descripcion_y_categoria(self):
+        ids = buscar_ids('QUESO')
+        self.assertEqual(ids[0], self.por_nombre.id)
+        self.assertEqual(set(ids[1:]), {self.por_descripcion.id, self.por_categoria.id})
+
+        respuesta = self.client.get(reverse('buscar_productos'), {'q': 'queso'})
+        self.assertEqual([p['id_producto'] for p in respuesta.json()['productos']], ids)
+        self.assertEqual(buscar_ids('lacteos tostadas'), [self.por_descripcion.id])
+        self.assertEqual(buscar_ids('   '), [])
+
+    def test_autocompletar_por_prefijo(self):
+        self.assertEqual([s['nombre'] for s in autocompletar('que')], ['Quesadilla', 'Queso fresco'])
+        self.assertEqual([s['nombre'] for s in autocompletar('queso fr')], ['Queso fresco'])
+        self.assertEqual(autocompletar('ideal'), [])  # Solo por nombre
+        respuesta = self.client.get(reverse('autocompletar_productos'), {'q': 'manch'})
+        self.assertEqual(respuesta.json()['sugerencias'], [{'id': self.por_categoria.id, 'nombre': 'Manchego'}])
+
+    def test_triggers_mantienen_el_indice(self):
+        yogur = Producto.objects.create(nombre='Yogur griego', precio='15.00', stock=5, categoria=self.quesos)
+        self.assertEqual(buscar_ids('griego'), [yogur.id])
+
+        yogur.nombre = 'Yogur natural'
+        yogur.save()
+        self.assertEqual(buscar_ids('griego'), [])
+        self.assertEqual(buscar_ids('natural'), [yogur.id])
+
+        self.quesos.nombre = 'Embutidos'
+        self.quesos.save()
+        self.assertEqual(set(buscar_ids('embutidos')), {yogur.id, self.por_categoria.id})
+        self.assertNotIn(self.por_categoria.id, buscar_ids('queso'))
+
+        yogur.delete()
+        self.assertEqual(buscar_ids('natural'), [])
+
+    def test_resultados_con_el_mismo_precio_que_el_catalogo(self):
+        for parametros in ({'search': 'queso fresco'}, {'categoria_id': self.por_nombre.categoria_id}):
+            with self.subTest(**parametros):
+                respuesta = self.client.get(reverse('inicio_usuario'), parametros)
+                self.assertContains(respuesta, '<span class="original-price">$50.00</span>', html=True)
+                self.assertContains(respuesta, '<span class="discount-badge">-20%</span>', html=True)
+
+    def test_sin_indice_responde_503(self):
+        with mock.patch('mypagina.busqueda._conexion_lectura', return_value=mock.MagicMock(vendor='mysql')):
+            self.assertEqual(self.client.get(reverse('buscar_productos'), {'q': 'queso'}).status_code, 503)
+
+        eliminar_indices_busqueda(connection)
+        for nombre in ('buscar_productos', 'autocompletar_productos'):
+            with self.subTest(nombre):
+                respuesta = self.client.get(reverse(nombre), {'q': 'queso'})
+                self.assertEqual(respuesta.status_code, 503)
+                self.assertFalse(respuesta.json()['success'])
+        respuesta = self.client.get(reverse('inicio_usuario'), {'search': 'queso'})
+        self.assertContains(respuesta, 'No encontramos productos')
+        self.assertEqual([str(m) for m in respuesta.context['messages']], [NO_DISPONIBLE])
+
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class CursorTests(TestCase):
+    """Cursores mal formados o con tipos equivocados nunca llegan a la consulta"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Usuario.objects.create_user('cursor@tienda.com', 'Admin', 'Admin123!')
+        cls.admin.convertir_en_admin()
+
+    def setUp(self):
+        limpiar_caches()
+
+    def test_cursores_invalidos(self):
+        invalidos = [
+            'no-es-base64!', codificar_cursor([1]), codificar_cursor({}), codificar_cursor({'id': 'x'}),
+            codificar_cursor({'id': True}), codificar_cursor({'id': 1.5}),
+            codificar_cursor({'nombre': 3, 'id': 1}), codificar_cursor({'nombre': 'a', 'id': None}),
+        ]
+        for cursor in invalidos:
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(CursorInvalido):
+                    paginar(Producto.objects.all(), cursor=cursor, orden='nombre')
+        self.assertEqual(validar_cursor(codificar_cursor({'nombre': 'a', 'id': 7}), 'nombre'), {'nombre': 'a', 'id': 7})
+
+    def test_vistas_con_cursor_de_otro_tipo(self):
+        self.client.force_login(self.admin)
+        cursor = codificar_cursor({'id': 'x'})
+        self.assertRedirects(self.client.get(reverse('inventario'), {'cursor': cursor}), reverse('inventario'))
+        respuesta = self.client.get(reverse('productos_por_categoria'), {'cursor': cursor})
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertFalse(respuesta.json()['success'])
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ProductosStreamingTests(TestCase):
+    """?stream=1 genera un JSON válido aunque cruce lotes y bloques"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Usuario.objects.create_user('stream@tienda.com', 'Admin', 'Admin123!')
+        cls.admin.convertir_en_admin()
+        lacteos = Categoria.objects.create(nombre='Lácteos')
+        panaderia = Categoria.objects.create(nombre='Panadería')
+        cls.activos = [
+            Producto.objects.create(
+                nombre=f'Producto "{i}"', precio=f'{i}.50', stock=i, categoria=lacteos if i % 2 else panaderia,
+                destacado=i == 3, descuento=10 * (i == 4), descripcion='Con ñ y "comillas"' if i == 1 else None,
+            )
+            for i in range(1, 8)
+        ]
+        Producto.objects.create(nombre='Retirado', precio='1.00', stock=5, categoria=lacteos, activo=False)
+
+    def setUp(self):
+        limpiar_caches()
+        self.client.force_login(self.admin)
+
+    def leer(self, **parametros):
+        # Lotes de 3 filas y bloques de 2: 7 productos cruzan varias fronteras de cada uno
+        with mock.patch('mypagina.views.TAMANO_LOTE', 3), mock.patch('mypagina.streaming.FILAS_POR_BLOQUE', 2):
+            respuesta = self.client.get(reverse('productos_por_categoria'), {'stream': '1', **parametros})
+            self.assertTrue(respuesta.streaming)
+            with CaptureQueriesContext(connection) as consultas:
+                cuerpo = b''.join(respuesta.streaming_content)
+        lotes = [q for q in consultas.captured_queries if 'FROM "productos"' in q['sql']]
+        return json.loads(cuerpo), len(lotes)
+
+    def test_todos_los_activos_con_los_campos_proyectados(self):
+        datos, lotes = self.leer()
+        self.assertTrue(datos['success'])
+        self.assertEqual(lotes, 3)
+        self.assertEqual(datos['productos'], [
+            {
+                'id_producto': producto.id,
+                'nombre': producto.nombre,
+                'precio': float(producto.precio),
+                'stock': producto.stock,
+                'categoria': producto.categoria.nombre,
+                'categoria_id': producto.categoria_id,
+                'destacado': producto.destacado,
+                'descuento': producto.descuento,
+                'descripcion': producto.descripcion or '',
+            }
+            for producto in self.activos
+        ])
+
+    def test_filtros_y_resultado_vacio(self):
+        datos, _ = self.leer(categoria_id=self.activos[0].categoria_id, stock='low')
+        self.assertEqual([p['id_producto'] for p in datos['productos']], [p.id for p in self.activos[::2]])
+        datos, lotes = self.leer(stock='out')
+        self.assertEqual((datos, lotes), ({'success': True, 'productos': []}, 1))
+
+
+class RevisionCachesTests(SimpleTestCase):
+    def test_aviso_si_una_cache_compartida_es_local(self):
+        self.assertEqual(revisar_caches_compartidas(None), [])
+        local = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+        with override_settings(CACHES={**settings.CACHES, 'catalogo': local}):
+            self.assertEqual([aviso.id for aviso in revisar_caches_compartidas(None)], ['mypagina.W001'])
+
+
+class PoblarDatosTests(TestCase):
+    def test_datos_generados(self):
+        with mock.patch('mypagina.correos.avisar_alta') as avisar_alta:
+            call_command('poblar_datos', categorias=3, productos=400, usuarios=20, semilla=7, stdout=io.StringIO())
+        avisar_alta.assert_called_once_with()
+
+        descontados = Producto.objects.filter(descuento__gt=0)
+        self.assertTrue(descontados.exists())
+        for precio, original, descuento in descontados.values_list('precio', 'precio_original', 'descuento'):
+            self.assertLess(precio, original)
+            self.assertEqual(precio, redondear(original * (100 - descuento) / 100))
+        self.assertFalse(Producto.objects.filter(descuento=0, precio_original__isnull=False).exists())
+        self.assertFalse(Producto.objects.filter(precio__lt=Decimal('0.70')).exists())
+
+        # Un solo hash por defecto, y sirve para la contraseña indicada
+        self.assertEqual(Usuario.objects.values('password').distinct().count(), 1)
+        self.assertTrue(Usuario.objects.first().check_password('Usuario123!'))
+        for usuario in Usuario.objects.filter(resumen_carrito__isnull=False):
+            self.assertEqual(usuario.obtener_totales_carrito()['subtotal'],
+                             usuario.recalcular_resumen_carrito().subtotal)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ImportacionTests(TestCase):
+    """Importación con upsert, reporte de errores por fila y exportación de ida y vuelta"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Usuario.objects.create_user('importa@tienda.com', 'Admin', 'Admin123!')
+        cls.admin.convertir_en_admin()
+        cls.lacteos = Categoria.objects.create(nombre='Lácteos')
+        cls.leche = Producto.objects.create(
+            nombre='Leche', descripcion='Entera', precio='25.50', stock=10, categoria=cls.lacteos
+        )
+        cls.queso = Producto.objects.create(nombre='Queso', precio='80.00', stock=3, categoria=cls.lacteos)
+
+    def setUp(self):
+        limpiar_caches()
+        self.client.force_login(self.admin)
+
+    def importar(self, contenido, nombre='productos.csv', **datos):
+        archivo = SimpleUploadedFile(nombre, contenido.encode())
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('importar_productos'), {'archivo': archivo, **datos})
+
+    def test_upsert_y_errores_por_fila(self):
+        respuesta = self.importar(
+            'id,nombre,precio,stock,categoria\n'
+            f'{self.leche.id},,$27.00,40,\n'          # 2: actualiza por id; la descripción se conserva
+            ',Queso,81.5,,\n'                          # 3: actualiza por nombre
+            ',Yogur,12,7,lácteos\n'                    # 4: nuevo, categoría por nombre
+            ',Crema,abc,1,Lácteos\n'                   # 5: precio inválido
+            ',Mantequilla,30,1,Carnes\n'               # 6: categoría inexistente
+            '999999,Fantasma,10,1,Lácteos\n'           # 7: id inexistente
+            ',Helado,,2,Lácteos\n'                     # 8: nuevo sin precio
+            f'{self.leche.id},,28.00,-1,\n'            # 9: stock negativo
+        ).json()
+
+        self.assertTrue(respuesta['success'], respuesta)
+        self.assertEqual(
+            (respuesta['filas'], respuesta['creados'], respuesta['actualizados'], respuesta['con_errores']),
+            (8, 1, 2, 5),
+        )
+        self.assertEqual([error['fila'] for error in respuesta['errores']], [5, 6, 7, 8, 9])
+        self.assertIn('precio: "abc" no es un número', respuesta['errores'][0]['errores'])
+
+        self.leche.refresh_from_db()
+        self.assertEqual((self.leche.precio, self.leche.stock, self.leche.descripcion), (Decimal('27.00'), 40, 'Entera'))
+        self.queso.refresh_from_db()
+        self.assertEqual((self.queso.precio, self.queso.stock), (Decimal('81.50'), 3))
+        yogur = Producto.objects.get(nombre='Yogur')
+        self.assertEqual((yogur.precio, yogur.stock, yogur.categoria_id), (Decimal('12.00'), 7, self.lacteos.id))
+        self.assertFalse(Producto.objects.filter(nombre__in=['Crema', 'Mantequilla', 'Fantasma', 'Helado']).exists())
+
+    def test_json_por_lotes_y_simulacion(self):
+        filas = [{'nombre': f'Producto {i}', 'precio': i + 1, 'categoria_id': self.lacteos.id} for i in range(25)]
+        contenido = json.dumps(filas)
+
+        simulado = self.importar(contenido, 'productos.json', simular='true').json()
+        self.assertEqual(simulado['creados'], 25)
+        self.assertEqual(Producto.objects.count(), 2)
+
+        # Lotes y bloques pequeños: los objetos quedan partidos entre lecturas
+        bloques_chicos = partial(importacion._leer_json, tamano_bloque=16)
+        with mock.patch('mypagina.importacion._leer_json', bloques_chicos):
+            resumen = importacion.importar(io.BytesIO(contenido.encode()), 'json', tamano_lote=4)
+        self.assertEqual((resumen['creados'], resumen['con_errores']), (25, 0))
+        self.assertEqual(Producto.objects.get(nombre='Producto 24').precio, Decimal('25.00'))
+
+    def test_archivos_invalidos(self):
+        respuesta = self.importar('a,b\n1,2\n')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertFalse(respuesta.json()['success'])
+        self.assertEqual(self.importar('[{"nombre": "x"', 'productos.json').status_code, 400)
+        self.assertEqual(self.importar('', 'productos.xlsx').status_code, 400)
+
+    def test_exportar_e_importar_de_vuelta(self):
+        respuesta = self.client.get(reverse('exportar_productos'), {'formato': 'csv'})
+        contenido = b''.join(respuesta.streaming_content).decode()
+        self.assertEqual(contenido.splitlines()[0], ','.join(importacion.COLUMNAS))
+        self.assertEqual(len(contenido.splitlines()), 3)
+
+        antes = list(Producto.objects.order_by('id').values(*importacion.CAMPOS_ACTUALIZABLES))
+        resumen = self.importar(contenido).json()
+        self.assertEqual((resumen['creados'], resumen['actualizados'], resumen['con_errores']), (0, 2, 0))
+        self.assertEqual(list(Producto.objects.order_by('id').values(*importacion.CAMPOS_ACTUALIZABLES)), antes)
+
+        exportado = json.loads(b''.join(
+            self.client.get(reverse('exportar_productos'), {'formato': 'json'}).streaming_content
+        ))
+        self.assertEqual({fila['nombre'] for fila in exportado}, {'Leche', 'Queso'})
+
+
+    def test_error_inesperado_va_al_log(self):
+        with mock.patch('mypagina.importacion.importar', side_effect=RuntimeError('disco lleno')), \
+                self.assertLogs('mypagina.views', 'ERROR') as registro:
+            respuesta = self.importar('nombre,precio,stock,categoria\n')
+        self.assertEqual(respuesta.json(), {'success': False, 'message': 'Error al importar productos: disco lleno'})
+        self.assertIn('RuntimeError: disco lleno', registro.output[0])
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class AjusteStockTests(TestCase):
+    """Ajustes de stock en lote: todo o nada"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Usuario.objects.create_user('stock@tienda.com', 'Admin', 'Admin123!')
+        cls.admin.convertir_en_admin()
+        categoria = Categoria.objects.create(nombre='Granos')
+        cls.arroz = Producto.objects.create(nombre='Arroz', precio='20.00', stock=10, categoria=categoria)
+        cls.frijol = Producto.objects.create(nombre='Frijol', precio='30.00', stock=2, categoria=categoria)
+
+    def setUp(self):
+        limpiar_caches()
+        self.client.force_login(self.admin)
+
+    def ajustar(self, ajustes):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                reverse('ajustar_stock'), json.dumps({'ajustes': ajustes}), content_type='application/json'
+            )
+
+    def stock(self):
+        return dict(Producto.objects.values_list('nombre', 'stock'))
+
+    def test_deltas_y_stock_absoluto(self):
+        respuesta = self.ajustar([
+            {'producto_id': self.arroz.id, 'delta': 5},
+            {'producto_id': self.arroz.id, 'delta': -3},   # se suma al anterior
+            {'producto_id': self.frijol.id, 'stock': 40},
+        ]).json()
+
+        self.assertTrue(respuesta['success'], respuesta)
+        self.assertEqual(
+            respuesta['productos'],
+            [{'id': self.arroz.id, 'nombre': 'Arroz', 'stock': 12}, {'id': self.frijol.id, 'nombre': 'Frijol', 'stock': 40}],
+        )
+        self.assertEqual(self.stock(), {'Arroz': 12, 'Frijol': 40})
+
+    def test_stock_negativo_no_aplica_nada(self):
+        respuesta = self.ajustar([
+            {'producto_id': self.arroz.id, 'delta': 5},
+            {'producto_id': self.frijol.id, 'delta': -3},
+            {'producto_id': 999999, 'delta': 1},
+        ])
+
+        self.assertEqual(respuesta.status_code, 400)
+        datos = respuesta.json()
+        self.assertFalse(datos['success'])
+        self.assertEqual(datos['lineas'], [
+            {'id': self.frijol.id, 'nombre': 'Frijol', 'motivo': 'Stock insuficiente: hay 2 y se intentan retirar 3'},
+            {'id': 999999, 'motivo': 'No existe el producto'},
+        ])
+        self.assertEqual(self.stock(), {'Arroz': 10, 'Frijol': 2})
+
+    def test_ajustes_mal_formados(self):
+        invalidos = [
+            [],
+            [{'producto_id': self.arroz.id}],
+            [{'producto_id': self.arroz.id, 'delta': 1, 'stock': 3}],
+            [{'producto_id': self.arroz.id, 'stock': -1}],
+            [{'producto_id': self.arroz.id, 'delta': 1.5}],
+            [{'producto_id': True, 'delta': 1}],
+            [{'producto_id': self.arroz.id, 'stock': 3}, {'producto_id': self.arroz.id, 'delta': 1}],
+        ]
+        for ajustes in invalidos:
+            with self.subTest(ajustes=ajustes):
+                respuesta = self.ajustar(ajustes)
+                self.assertEqual(respuesta.status_code, 400)
+                self.assertFalse(respuesta.json()['success'])
+        self.assertEqual(self.stock(), {'Arroz': 10, 'Frijol': 2})
+
+    def test_error_inesperado_va_al_log(self):
+        with mock.patch('mypagina.views.aplicar_ajustes_stock', side_effect=RuntimeError('sin conexión')), \
+                self.assertLogs('mypagina.views', 'ERROR') as registro:
+            respuesta = self.ajustar([{'producto_id': self.arroz.id, 'delta': 1}])
+        self.assertEqual(respuesta.json(), {'success': False, 'message': 'Error al ajustar el stock: sin conexión'})
+        self.assertIn('RuntimeError: sin conexión', registro.output[0])
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class UsuariosMasivoTests(TestCase):
+    """Operaciones masivas: efecto en la base y en las sesiones abiertas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Usuario.objects.create_user('masivo@tienda.com', 'Admin', 'Admin123!')
+        cls.admin.convertir_en_admin()
+        cls.usuarios = [
+            Usuario.objects.create_user(f'spam{i}@tienda.com', f'Spam {i}', 'Spam123!') for i in range(3)
+        ]
+        cls.producto = Producto.objects.create(
+            nombre='Leche', precio='25.50', stock=10, categoria=Categoria.objects.create(nombre='Lácteos')
+        )
+
+    def setUp(self):
+        limpiar_caches()
+        self.client.force_login(self.admin)
+
+    def aplicar(self, accion, ids):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                reverse('usuarios_masivo'), json.dumps({'accion': accion, 'usuario_ids': ids}),
+                content_type='application/json',
+            )
+
+    def sesion_de(self, usuario):
+        """Cliente con la sesión abierta y el usuario ya guardado en la caché de request.user"""
+        cliente = Client()
+        cliente.force_login(usuario)
+        self.assertEqual(cliente.get(reverse('obtener_carrito')).status_code, 200)
+        return cliente
+
+    def test_desactivar_y_reactivar(self):
+        spam = self.usuarios[0]
+        sesion = self.sesion_de(spam)
+        ids = [usuario.id for usuario in self.usuarios] + [self.admin.id]
+
+        respuesta = self.aplicar('desactivar', ids).json()
+        self.assertEqual((respuesta['success'], respuesta['afectados'], respuesta['omitidos']), (True, 3, [self.admin.id]))
+        self.assertEqual(set(Usuario.objects.filter(is_active=False).values_list('id', flat=True)), set(ids[:3]))
+        self.assertTrue(Usuario.objects.get(id=self.admin.id).is_active)
+        self.assertEqual(sesion.get(reverse('obtener_carrito')).status_code, 302)
+
+        # Solo cambian las filas que no tenían ya ese valor
+        self.assertEqual(self.aplicar('desactivar', ids[:2]).json()['afectados'], 0)
+        self.assertEqual(self.aplicar('activar', ids[:2]).json()['afectados'], 2)
+
+    def test_promover_y_quitar_admin(self):
+        spam = self.usuarios[1]
+        self.assertEqual(self.aplicar('hacer_admin', [spam.id]).json()['afectados'], 1)
+        spam.refresh_from_db()
+        self.assertTrue(spam.is_staff and spam.is_admin)
+        sesion = self.sesion_de(spam)
+        self.assertEqual(sesion.get(reverse('inventario')).status_code, 200)
+
+        self.assertEqual(self.aplicar('quitar_admin', [spam.id, self.admin.id]).json()['afectados'], 1)
+        self.assertEqual(sesion.get(reverse('inventario')).status_code, 302)
+        self.assertTrue(Usuario.objects.get(id=self.admin.id).is_admin)
+
+    def test_eliminar_con_carrito(self):
+        spam = self.usuarios[2]
+        spam.agregar_al_carrito(self.producto.id, 2, {'nombre': 'Leche', 'precio': 25.5})
+        sesion = self.sesion_de(spam)
+
+        respuesta = self.aplicar('eliminar', [spam.id, self.admin.id]).json()
+        self.assertEqual((respuesta['afectados'], respuesta['omitidos']), (1, [self.admin.id]))
+        self.assertFalse(Usuario.objects.filter(id=spam.id).exists())
+        self.assertFalse(ItemCarrito.objects.filter(usuario_id=spam.id).exists())
+        self.assertFalse(ResumenCarrito.objects.filter(usuario_id=spam.id).exists())
+        self.assertEqual(sesion.get(reverse('obtener_carrito')).status_code, 302)
+
+    def test_eliminar_sin_cargar_ni_senal_por_usuario(self):
+        borrados = []
+
+        def receptor(sender, instance, **kwargs):
+            borrados.append(instance.pk)
+
+        post_delete.connect(receptor, sender=Usuario)
+        self.addCleanup(post_delete.disconnect, receptor, sender=Usuario)
+        ids = [usuario.id for usuario in self.usuarios]
+        for usuario in self.usuarios:
+            usuario.agregar_al_carrito(self.producto.id, 1, {'nombre': 'Leche', 'precio': 25.5})
+        pedido = Pedido.objects.create(usuario=self.usuarios[0], subtotal='25.50', total='25.50')
+
+        # Un DELETE o UPDATE por tabla relacionada más el de usuarios, sin importar cuántos sean
+        with self.captureOnCommitCallbacks() as callbacks, self.assertNumQueries(7):
+            resultado = gestion_usuarios.aplicar_accion('eliminar', ids, self.admin)
+        self.assertEqual(resultado, {'afectados': 3, 'omitidos': []})
+        self.assertEqual(borrados, [])
+        self.assertEqual(len(callbacks), 3)
+        self.assertFalse(Usuario.objects.filter(id__in=ids).exists())
+        self.assertFalse(ItemCarrito.objects.filter(usuario_id__in=ids).exists())
+        pedido.refresh_from_db()
+        self.assertIsNone(pedido.usuario_id)
+
+    def test_peticiones_invalidas(self):
+        for accion, ids in [('borrar_todo', [self.usuarios[0].id]), ('activar', []), ('activar', ['x']), ('activar', 5)]:
+            with self.subTest(accion=accion, ids=ids):
+                respuesta = self.aplicar(accion, ids)
+                self.assertEqual(respuesta.status_code, 400)
+                self.assertFalse(respuesta.json()['success'])
+        self.assertEqual(Usuario.objects.filter(is_active=True).count(), 4)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class UsuarioEnCacheTests(TestCase):
+    """request.user se guarda en la caché compartida, no en la local del proceso"""
+
+    def setUp(self):
+        limpiar_caches()
+        self.usuario = Usuario.objects.create_user('ana@tienda.com', 'Ana', 'Ana12345!')
+        self.client.force_login(self.usuario)
+        self.clave = f'autenticacion:usuario:{self.usuario.id}'
+
+    def test_entrada_en_la_cache_compartida(self):
+        self.assertEqual(self.client.get(reverse('obtener_carrito')).status_code, 200)
+        self.assertEqual(caches[settings.USUARIO_CACHE_ALIAS].get(self.clave).id, self.usuario.id)
+        self.assertIsNone(caches['default'].get(self.clave))
+
+        # Con la entrada en caché la petición ya no consulta la tabla usuarios
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(reverse('obtener_carrito'))
+        self.assertFalse([q for q in consultas.captured_queries if 'FROM "usuarios"' in q['sql']])
+
+    def test_desactivar_borra_la_entrada_compartida(self):
+        self.client.get(reverse('obtener_carrito'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.usuario.desactivar()
+        self.assertIsNone(caches[settings.USUARIO_CACHE_ALIAS].get(self.clave))
+        self.assertEqual(self.client.get(reverse('obtener_carrito')).status_code, 302)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+                   CORREOS_FILTRO_REFRESCO=3600)
+class FiltroCorreosTests(TestCase):
+    """El filtro de cada proceso debe enterarse de los cambios hechos en otros"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user('ana@tienda.com', 'Ana', 'Ana12345!')
+
+    def setUp(self):
+        limpiar_caches()
+        correos.reconstruir_filtro()
+
+    def en_otro_proceso(self, cambio):
+        """Aplica el cambio sin tocar el filtro de este proceso, como haría otro worker"""
+        with mock.patch('mypagina.correos.registrar_email'), self.captureOnCommitCallbacks(execute=True):
+            cambio()
+
+    def test_correo_editado_en_otro_proceso(self):
+        def editar():
+            self.usuario.email = 'Ana.Nueva@tienda.com'
+            self.usuario.save()
+
+        self.en_otro_proceso(editar)
+        self.assertNotIn('ana.nueva@tienda.com', correos._estado['filtro'])
+        self.assertTrue(correos.email_registrado('ana.nueva@tienda.com'))
+        self.assertIn('ana.nueva@tienda.com', correos._estado['filtro'])
+
+    def test_alta_en_otro_proceso(self):
+        self.en_otro_proceso(lambda: Usuario.objects.create_user('beto@tienda.com', 'Beto', 'Beto1234!'))
+        self.assertTrue(correos.email_registrado('BETO@tienda.com'))
+
+    def test_guardar_sin_cambiar_correo_no_reconstruye(self):
+        usuario = Usuario.objects.get(id=self.usuario.id)
+        usuario.nombre = 'Ana María'
+        self.en_otro_proceso(usuario.save)
+        with mock.patch('mypagina.correos.reconstruir_filtro') as reconstruir, self.assertNumQueries(1):
+            self.assertTrue(correos.email_registrado('ana@tienda.com'))
+        reconstruir.assert_not_called()
+        with self.assertNumQueries(0):
+            self.assertFalse(correos.email_registrado('nadie@tienda.com'))
+
+    def test_guardar_sin_cambiar_correo_no_agrega_al_filtro(self):
+        usuario = Usuario.objects.get(id=self.usuario.id)
+        elementos = correos._estado['filtro'].elementos
+        usuario.nombre = 'Ana María'
+        usuario.save()
+        self.assertEqual(correos._estado['filtro'].elementos, elementos)
+        usuario.email = 'ana.nueva@tienda.com'
+        usuario.save()
+        self.assertEqual(correos._estado['filtro'].elementos, elementos + 1)
+
+    def test_sin_avisos_solo_el_refresco_periodico(self):
+        # Un UPDATE directo no pasa por las señales: se verá al reconstruir
+        Usuario.objects.filter(id=self.usuario.id).update(email='oculto@tienda.com')
+        self.assertFalse(correos.email_registrado('oculto@tienda.com'))
+        correos.reconstruir_filtro()
+        self.assertTrue(correos.email_registrado('oculto@tienda.com'))
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+                   CONTRASENAS_MAX_CONCURRENCIA=1, CONTRASENAS_MAX_COLA=3)
+class PoolContrasenasTests(TestCase):
+    """Cola acotada del pool de hashes: rechazo, cancelaciones y rehash"""
+
+    def setUp(self):
+        limpiar_caches()
+        self.reiniciar_pool()
+        self.addCleanup(self.reiniciar_pool)
+
+    def reiniciar_pool(self):
+        # El executor y las métricas son del proceso: cada prueba empieza de cero
+        if contrasenas._pool['executor'] is not None:
+            contrasenas._pool['executor'].shutdown(wait=True)
+        contrasenas._pool['executor'] = None
+        for clave, valor in contrasenas._metricas.items():
+            contrasenas._metricas[clave] = type(valor)()
+
+    def test_cancelar_en_cola_libera_el_lugar(self):
+        async def escenario():
+            ocupado, liberar = threading.Event(), threading.Event()
+
+            def bloquear():
+                ocupado.set()
+                liberar.wait(5)
+                return 'listo'
+
+            primera = asyncio.ensure_future(contrasenas._ejecutar(bloquear))
+            await asyncio.to_thread(ocupado.wait, 5)
+            en_cola = [asyncio.ensure_future(contrasenas._ejecutar(str, i)) for i in range(3)]
+            await asyncio.sleep(0)
+            with self.assertRaises(contrasenas.PoolSaturado):
+                await contrasenas._ejecutar(str, 'sobra')
+
+            # Clientes que se desconectan mientras esperan turno
+            for tarea in en_cola:
+                tarea.cancel()
+            await asyncio.gather(*en_cola, return_exceptions=True)
+            self.assertEqual(contrasenas.metricas()['en_cola'], 0)
+
+            liberar.set()
+            self.assertEqual(await primera, 'listo')
+            return await asyncio.gather(*(contrasenas._ejecutar(str, i) for i in range(3)))
+
+        self.assertEqual(asyncio.run(escenario()), ['0', '1', '2'])
+        metricas = contrasenas.metricas()
+        self.assertEqual((metricas['en_cola'], metricas['en_curso'], metricas['completadas']), (0, 0, 4))
+        self.assertEqual(metricas['rechazadas'], 1)
+
+    @override_settings(CONTRASENAS_MAX_COLA=0)
+    def test_pool_saturado_responde_503(self):
+        Usuario.objects.create_user('ana@tienda.com', 'Ana', 'Ana12345!')
+        respuesta = self.client.post(reverse('login'), {'email': 'ana@tienda.com', 'password': 'Ana12345!'})
+        self.assertEqual(respuesta.status_code, 503)
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+        respuesta = self.client.post(reverse('registro'), {
+            'nombre': 'Beto', 'email': 'beto@tienda.com',
+            'password': 'Beto1234!', 'confirmar_password': 'Beto1234!',
+        })
+        self.assertEqual(respuesta.status_code, 503)
+        self.assertFalse(Usuario.objects.filter(email='beto@tienda.com').exists())
+        self.assertEqual(contrasenas.metricas()['rechazadas'], 2)
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.PBKDF2PasswordHasher',
+                                         'django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_login_actualiza_hash_viejo(self):
+        usuario = Usuario.objects.create_user('ana@tienda.com', 'Ana', 'temporal')
+        usuario.password = make_password('Ana12345!', hasher='md5')
+        usuario.save(update_fields=['password'])
+
+        respuesta = self.client.post(reverse('login'), {'email': 'ana@tienda.com', 'password': 'Ana12345!'})
+        self.assertRedirects(respuesta, reverse('inicio_usuario'), fetch_redirect_response=False)
+        usuario.refresh_from_db()
+        self.assertTrue(usuario.password.startswith('pbkdf2_sha256$'))
+        self.assertTrue(usuario.check_password('Ana12345!'))
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ReplicaAtrasadaTests(TransactionTestCase):
+    """Lo que queda en caché se lee del primario aunque la réplica vaya atrasada"""
+
+    # Otra base SQLite con datos viejos, registrada después de que el runner
+    # revisa las bases de cada prueba. TransactionTestCase porque dentro de una
+    # transacción el enrutador manda todo al primario
+    REPLICA = 'replica_atrasada'
+    CATEGORIA_ID = 1
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directorio = tempfile.mkdtemp(prefix='replica-')
+        connections.settings[cls.REPLICA] = {
+            **connections.settings['default'], 'NAME': f'{cls.directorio}/replica.sqlite3'
+        }
+        cls.databases = {'default', cls.REPLICA}
+        with connections[cls.REPLICA].schema_editor() as editor:
+            for modelo in (Usuario, Categoria, Producto):
+                editor.create_model(modelo)
+
+        # La réplica todavía no ve el queso ni al usuario nuevo, y conserva un
+        # producto ya borrado. flush no la vacía: el enrutador no migra réplicas
+        Usuario.objects.using(cls.REPLICA).create(email='viejo@tienda.com', nombre='Viejo', password='x')
+        Categoria.objects.using(cls.REPLICA).create(id=cls.CATEGORIA_ID, nombre='Lácteos')
+        for nombre in ('Leche', 'Yogur retirado'):
+            Producto.objects.using(cls.REPLICA).create(
+                nombre=nombre, precio='20.00', stock=1, categoria_id=cls.CATEGORIA_ID
+            )
+
+    @classmethod
+    def tearDownClass(cls):
+        connections[cls.REPLICA].close()
+        del connections[cls.REPLICA]
+        del connections.settings[cls.REPLICA]
+        shutil.rmtree(cls.directorio, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        limpiar_caches()
+        self.admin = Usuario.objects.create_user('admin@tienda.com', 'Admin', 'Admin123!')
+        self.admin.convertir_en_admin()
+        Usuario.objects.create_user('nuevo@tienda.com', 'Nuevo', 'Nuevo123!')
+        self.categoria = Categoria.objects.create(id=self.CATEGORIA_ID, nombre='Lácteos')
+        Producto.objects.create(nombre='Leche', precio='25.50', stock=10, categoria=self.categoria)
+        Producto.objects.create(nombre='Queso fresco', precio='60.00', stock=4, categoria=self.categoria)
+
+        self.client.force_login(self.admin)
+        replicas = mock.patch('mypagina.enrutador.replicas', return_value=[self.REPLICA])
+        replicas.start()
+        self.addCleanup(replicas.stop)
+
+    def tearDown(self):
+        # flush tampoco vacía en el primario las tablas con managed = False
+        for modelo in (Producto, Categoria, Usuario):
+            modelo.objects.using('default').all().delete()
+
+    def test_la_replica_esta_en_uso(self):
+        respuesta = self.client.get(reverse('productos_por_categoria'), {'categoria_id': self.categoria.id})
+        self.assertEqual([p['nombre'] for p in respuesta.json()['productos']], ['Leche', 'Yogur retirado'])
+
+    def test_catalogo_desde_el_primario(self):
+        for _ in range(2):
+            respuesta = self.client.get(reverse('inicio_usuario'), {'categoria_id': self.categoria.id})
+            self.assertContains(respuesta, 'Queso fresco')
+            self.assertNotContains(respuesta, 'Yogur retirado')
+        self.assertEqual([p.nombre for p in catalogo.obtener_productos(self.categoria)], ['Leche', 'Queso fresco'])
+
+    def test_inventario_desde_el_primario(self):
+        respuesta = self.client.get(reverse('inventario'))
+        self.assertContains(respuesta, 'Queso fresco')
+        self.assertNotContains(respuesta, 'Yogur retirado')
+        self.assertEqual(respuesta.context['total_productos'], 2)
+        self.assertEqual(self.client.get(reverse('inicio_admin')).context['total_productos'], 2)
+
+    def test_usuarios_desde_el_primario(self):
+        respuesta = self.client.get(reverse('administrar_usuarios'))
+        self.assertContains(respuesta, 'nuevo@tienda.com')
+        self.assertNotContains(respuesta, 'viejo@tienda.com')
+        self.assertEqual(respuesta.context['total_usuarios'], 2)
+
+
+class CacheArchivosTests(SimpleTestCase):
+    """La caché en archivos descarta lo vencido antes que lo vigente y casi nunca lista el directorio"""
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp(prefix='cache-archivos-')
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+
+    def crear(self, **opciones):
+        return CacheArchivos(self.directorio, {'OPTIONS': {'REVISAR_CADA': 1, **opciones}})
+
+    def test_al_llenarse_borra_primero_lo_vencido(self):
+        cache = self.crear(MAX_ENTRIES=6)
+        for i in range(3):
+            cache.set(f'vigente{i}', i, 60)
+            cache.set(f'vencida{i}', i, 0)
+        cache.set('nueva', 1, 60)
+        self.assertEqual(len(cache._list_cache_files()), 4)
+        self.assertEqual(cache.get_many([f'vigente{i}' for i in range(3)] + ['nueva']),
+                         {'vigente0': 0, 'vigente1': 1, 'vigente2': 2, 'nueva': 1})
+
+    def test_sin_vencidas_borra_lo_mas_viejo(self):
+        cache = self.crear(MAX_ENTRIES=4, CULL_FREQUENCY=2)
+        for i, clave in enumerate('abcd'):
+            cache.set(clave, i, 60)
+            os.utime(cache._key_to_file(clave), (1000 + i, 1000 + i))
+        cache.set('e', 4, 60)
+        self.assertEqual(cache.get_many(list('abcde')), {'c': 2, 'd': 3, 'e': 4})
+
+    def test_revisa_el_directorio_solo_de_vez_en_cuando(self):
+        cache = CacheArchivos(self.directorio, {'OPTIONS': {'MAX_ENTRIES': 1}})
+        with mock.patch.object(cache, '_list_cache_files', wraps=cache._list_cache_files) as listar, \
+                mock.patch('mypagina.cache_archivos.random.random', side_effect=[0.5, 0.5, 0.001]):
+            for clave in 'abc':
+                cache.set(clave, 1, 60)
+        self.assertEqual(listar.call_count, 1)
+
+    def test_borrar_vencidos(self):
+        cache = self.crear()
+        cache.set('vigente', 1, 60)
+        cache.set('vencida', 1, 0)
+        self.assertEqual(cache.borrar_vencidos(), 1)
+        self.assertEqual(len(cache._list_cache_files()), 1)
+
+
+class ComandosSesionesTests(TestCase):
+    """limpiar_sesiones y medir_sesiones"""
+
+    def test_limpiar_sesiones_borra_filas_y_archivos_vencidos(self):
+        directorio = tempfile.mkdtemp(prefix='sesiones-')
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        sesiones = {'BACKEND': 'mypagina.cache_archivos.CacheArchivos', 'LOCATION': directorio}
+        ahora = timezone.now()
+        for i in range(3):
+            Session.objects.create(session_key=f'vencida{i}', session_data='',
+                                   expire_date=ahora - timedelta(days=1))
+        Session.objects.create(session_key='vigente', session_data='', expire_date=ahora + timedelta(days=1))
+
+        with override_settings(CACHES={**settings.CACHES, settings.SESSION_CACHE_ALIAS: sesiones}):
+            cache = caches[settings.SESSION_CACHE_ALIAS]
+            cache.set('vigente', {}, 60)
+            cache.set('vencida', {}, 0)
+            salida = io.StringIO()
+            call_command('limpiar_sesiones', '--lote', '2', stdout=salida)
+            self.assertTrue(cache.has_key('vigente'))
+            self.assertEqual(len(cache._list_cache_files()), 1)
+
+        self.assertIn('3 sesiones vencidas eliminadas y 1 archivos vencidos', salida.getvalue())
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['vigente'])
+        with self.assertRaises(CommandError):
+            call_command('limpiar_sesiones', '--lote', '0')
+
+    def test_medir_sesiones(self):
+        # Se mide sobre la base de esta prueba en lugar de crear otra
+        ruta = f'{tempfile.mkdtemp(prefix="medir-sesiones-")}/resultado.json'
+        self.addCleanup(shutil.rmtree, ruta.rsplit('/', 1)[0], ignore_errors=True)
+        with mock.patch.multiple('mypagina.management.commands.medir_sesiones',
+                                 setup_test_environment=mock.DEFAULT, teardown_test_environment=mock.DEFAULT,
+                                 TestRunner=mock.DEFAULT):
+            call_command('medir_sesiones', '--repeticiones', '1', '--paginas', '2',
+                         '--salida', ruta, stderr=io.StringIO())
+        with open(ruta, encoding='utf-8') as archivo:
+            resultado = json.load(archivo)
+
+        configuraciones = resultado['configuraciones']
+        self.assertGreater(configuraciones['db+mensajes_en_sesion']['login']['escrituras_sesion'], 0)
+        for flujo in ('registro', 'login', 'navegacion'):
+            self.assertEqual(configuraciones['cache+mensajes_en_cookie'][flujo]['escrituras_sesion'], 0)
+        self.assertEqual(resultado['escrituras_ahorradas_por_flujo']['db+mensajes_en_sesion']['login'], 0)
+        with self.assertRaises(CommandError):
+            call_command('medir_sesiones', '--repeticiones', '0')
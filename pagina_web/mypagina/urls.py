@@ -1,5 +1,9 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import views, views_async
+
+# Con ASGI la API del carrito se sirve con las vistas asíncronas
+carrito_api = views_async if settings.VISTAS_ASINCRONAS else views
 
 urlpatterns = [
     path('', views.home, name="home"),
@@ -9,12 +13,17 @@ urlpatterns = [
     path('inicioUsuario/', views.inicio_usuario, name="inicio_usuario"),
     path('carrito/', views.carrito, name="carrito"),
     
+    # Búsqueda de productos
+    path('api/buscar-productos/', views.buscar_productos, name='buscar_productos'),
+    path('api/autocompletar-productos/', views.autocompletar_productos, name='autocompletar_productos'),
+    
     # API endpoints para el carrito
-    path('api/agregar-carrito/', views.agregar_al_carrito, name='agregar_carrito'),
-    path('api/actualizar-carrito/', views.actualizar_carrito, name='actualizar_carrito'),
-    path('api/eliminar-carrito/', views.eliminar_del_carrito, name='eliminar_carrito'),
-    path('api/vaciar-carrito/', views.vaciar_carrito, name='vaciar_carrito'),
-    path('api/obtener-carrito/', views.obtener_carrito, name='obtener_carrito'),
+    path('api/agregar-carrito/', carrito_api.agregar_al_carrito, name='agregar_carrito'),
+    path('api/actualizar-carrito/', carrito_api.actualizar_carrito, name='actualizar_carrito'),
+    path('api/eliminar-carrito/', carrito_api.eliminar_del_carrito, name='eliminar_carrito'),
+    path('api/vaciar-carrito/', carrito_api.vaciar_carrito, name='vaciar_carrito'),
+    path('api/obtener-carrito/', carrito_api.obtener_carrito, name='obtener_carrito'),
+    path('realizar-compra/', views.realizar_compra, name='realizar_compra'),
 
     # Panel de administración
     path('inicioAdmin/', views.inicio_admin, name="inicio_admin"),
@@ -25,10 +34,15 @@ urlpatterns = [
     path('api/editar-usuario/', views.editar_usuario, name='editar_usuario'),
     path('api/cambiar-estado-usuario/', views.cambiar_estado_usuario, name='cambiar_estado_usuario'),
     path('api/eliminar-usuario/', views.eliminar_usuario, name='eliminar_usuario'),
+    path('api/usuarios-masivo/', views.usuarios_masivo, name='usuarios_masivo'),
+    path('api/metricas-contrasenas/', views.metricas_contrasenas, name='metricas_contrasenas'),
     
     # NUEVAS RUTAS PARA PRODUCTOS - AGREGA ESTAS
     path('api/crear-producto/', views.crear_producto, name='crear_producto'),
     path('api/editar-producto/', views.editar_producto, name='editar_producto'),
     path('api/eliminar-producto/', views.eliminar_producto, name='eliminar_producto'),
+    path('api/ajustar-stock/', views.ajustar_stock, name='ajustar_stock'),
     path('api/productos-por-categoria/', views.obtener_productos_por_categoria, name='productos_por_categoria'),
+    path('api/importar-productos/', views.importar_productos, name='importar_productos'),
+    path('api/exportar-productos/', views.exportar_productos, name='exportar_productos'),
 ]
\ No newline at end of file
@@ -1,27 +1,47 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from django.contrib.auth import login as auth_login
+from django.contrib.auth import alogin
 from django.contrib.auth.decorators import login_required
+from django.conf import settings
 from django.http import JsonResponse
+from django.utils.functional import SimpleLazyObject
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
+from asgiref.sync import sync_to_async
 import json
+import logging
+from decimal import Decimal
+from functools import partial
 from .forms import RegistroForm, LoginForm
 from .models import Usuario, Categoria, Producto
+from .precios import redondear, totales_json
+from .compras import procesar_compra, CarritoVacio, StockInsuficiente
+from .existencias import normalizar_ajustes, ajustar_stock as aplicar_ajustes_stock, AjusteInvalido
+from . import gestion_usuarios
+from .correos import email_registrado
+from . import contrasenas
+from .estadisticas import estadisticas_productos, estadisticas_usuarios
+from .paginacion import paginar, validar_cursor, leer_limite, recorrer_por_lotes, CursorInvalido
+from .streaming import respuesta_json_streaming, respuesta_descarga_streaming, TAMANO_LOTE
+from . import catalogo, fragmentos, importacion
+from .busqueda import buscar_ids, autocompletar, BusquedaNoDisponible
+from .enrutador import lectura_en_replica, PRIMARIO
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import user_passes_test
 
+logger = logging.getLogger(__name__)
+
 def home(request):
-    return render(request, 'inicio.html')
+    return render(request, 'Inicio.html')
 
 def sobre_nosotros(request):
     return render(request, 'SobreNosotros.html')
 
-def registro(request):
+async def registro(request):
     if request.method == 'POST':
         if request.headers.get('x-requested-with') == 'XMLHttpRequest':
             email = request.POST.get('email')
-            if Usuario.objects.filter(email=email).exists():
+            if await sync_to_async(email_registrado)(email):
                 return JsonResponse({
                     'exists': True,
                     'message': 'Este correo ya está registrado. ¿Quieres iniciar sesión?'
@@ -30,10 +50,14 @@ def registro(request):
                 return JsonResponse({'exists': False})
         
         form = RegistroForm(request.POST)
-        if form.is_valid():
-            usuario = form.save()
-            messages.success(request, '¡Registro exitoso! Ahora puedes iniciar sesión.')
-            return redirect('login')
+        if await sync_to_async(form.is_valid)():
+            try:
+                usuario = await form.asave()
+                messages.success(request, '¡Registro exitoso! Ahora puedes iniciar sesión.')
+                return redirect('login')
+            except contrasenas.PoolSaturado as e:
+                messages.error(request, str(e))
+                return await sync_to_async(render)(request, 'Registro.html', {'form': form}, status=503)
         else:
             for field, errors in form.errors.items():
                 for error in errors:
@@ -42,13 +66,14 @@ def registro(request):
     else:
         form = RegistroForm()
     
-    return render(request, 'Registro.html', {'form': form})
+    # La plantilla lee los mensajes y el usuario de la sesión: se renderiza en un hilo
+    return await sync_to_async(render)(request, 'Registro.html', {'form': form})
 
-def login(request):
+async def login(request):
     if request.method == 'POST':
         if request.headers.get('x-requested-with') == 'XMLHttpRequest':
             email = request.POST.get('email')
-            if not Usuario.objects.filter(email=email).exists():
+            if not await sync_to_async(email_registrado)(email):
                 return JsonResponse({
                     'exists': False,
                     'message': 'Este correo no está registrado. ¿Quieres crear una cuenta?'
@@ -62,9 +87,10 @@ def login(request):
             password = form.cleaned_data['password']
             
             try:
-                usuario = Usuario.objects.get(email=email)
-                if usuario.check_password(password):
-                    auth_login(request, usuario)
+                usuario = await Usuario.objects.defer('carrito').aget(email=email)
+                # PBKDF2 se calcula en el pool de contraseñas, no en el bucle de eventos
+                if await contrasenas.verificar(usuario, password):
+                    await alogin(request, usuario, backend=settings.AUTHENTICATION_BACKENDS[0])
                     messages.success(request, f'¡Bienvenido {usuario.nombre}!')
                     
                     if usuario.is_staff:
@@ -76,65 +102,112 @@ def login(request):
                     messages.error(request, 'Contraseña incorrecta')
             except Usuario.DoesNotExist:
                 messages.error(request, 'Este correo no está registrado')
+            except contrasenas.PoolSaturado as e:
+                messages.error(request, str(e))
+                return await sync_to_async(render)(request, 'Login.html', {'form': form}, status=503)
         else:
             messages.error(request, 'Por favor corrige los errores del formulario')
     else:
         form = LoginForm()
     
-    return render(request, 'login.html', {'form': form})
+    return await sync_to_async(render)(request, 'Login.html', {'form': form})
 
 @login_required
+@lectura_en_replica
 def inicio_usuario(request):
-    categorias = Categoria.objects.all()
+    # Categorías y productos salen de la caché del catálogo
+    categorias = catalogo.obtener_categorias()
     
     categoria_id = request.GET.get('categoria_id')
     productos = None
     categoria_seleccionada = None
     
+    busqueda = request.GET.get('search', '').strip()
+    
     if categoria_id:
-        try:
-            categoria_seleccionada = Categoria.objects.get(id=categoria_id)
-            productos = Producto.objects.filter(categoria=categoria_seleccionada, activo=True)
-        except Categoria.DoesNotExist:
+        categoria_seleccionada = catalogo.obtener_categoria(categoria_id)
+        if categoria_seleccionada:
+            # Solo se leen si el fragmento de la categoría no está en caché
+            productos = SimpleLazyObject(partial(catalogo.obtener_productos, categoria_seleccionada))
+        else:
             messages.error(request, 'Categoría no encontrada')
+    elif busqueda:
+        try:
+            ids = buscar_ids(busqueda)
+            encontrados = Producto.objects.select_related('categoria').in_bulk(ids)
+            productos = [encontrados[i] for i in ids if i in encontrados]
+        except BusquedaNoDisponible as e:
+            messages.error(request, str(e))
     
-    # Obtener el carrito del usuario
-    carrito = request.user.obtener_carrito()
-    total_carrito = sum(item['cantidad'] for item in carrito)
+    # Obtener el total de productos del carrito
+    total_carrito = request.user.obtener_totales_carrito()['total_items']
     
     context = {
         'usuario': request.user,
         'categorias': categorias,
         'productos': productos,
         'categoria_seleccionada': categoria_seleccionada,
-        'total_carrito': total_carrito
+        'busqueda': busqueda,
+        'total_carrito': total_carrito,
+        'fragmentos_timeout': fragmentos.timeout(),
+        'version_categorias': catalogo.version_categorias(),
+        'version_categoria': catalogo.version_categoria(categoria_seleccionada.id) if categoria_seleccionada else None,
     }
     
     return render(request, 'inicioUsuario.html', context)
 
+@login_required
+@lectura_en_replica
+def buscar_productos(request):
+    """Búsqueda de productos ordenada por relevancia"""
+    try:
+        ids = buscar_ids(request.GET.get('q', ''), leer_limite(request.GET.get('limite')))
+        filas = Producto.objects.filter(id__in=ids).values(*CAMPOS_PRODUCTO_API)
+        por_id = {fila['id']: fila for fila in filas}
+        
+        return JsonResponse({
+            'success': True,
+            'productos': [producto_api(por_id[i]) for i in ids if i in por_id]
+        })
+        
+    except BusquedaNoDisponible as e:
+        return JsonResponse({
+            'success': False,
+            'message': str(e)
+        }, status=503)
+
+@login_required
+@lectura_en_replica
+def autocompletar_productos(request):
+    """Sugerencias de nombres mientras se escribe en el buscador"""
+    try:
+        return JsonResponse({
+            'success': True,
+            'sugerencias': autocompletar(request.GET.get('q', ''))
+        })
+        
+    except BusquedaNoDisponible as e:
+        return JsonResponse({
+            'success': False,
+            'message': str(e)
+        }, status=503)
+
 @login_required
 def carrito(request):
     # Obtener el carrito del usuario
     carrito_items = request.user.obtener_carrito()
     
-    # Calcular totales y subtotales por item
+    # Subtotales por item
     for item in carrito_items:
-        item['subtotal'] = float(item['precio']) * item['cantidad']
+        item['subtotal'] = redondear(Decimal(str(item['precio'])) * item['cantidad'])
     
-    subtotal = sum(item['subtotal'] for item in carrito_items)
-    envio = 0 if subtotal >= 500 else 50
-    descuento = subtotal * 0.1 if subtotal > 300 else 0
-    total = subtotal + envio - descuento
+    # Los mismos totales que devuelve la API del carrito
+    totales = request.user.obtener_totales_carrito()
     
     context = {
         'usuario': request.user,
         'carrito_items': carrito_items,
-        'subtotal': subtotal,
-        'envio': envio,
-        'descuento': descuento,
-        'total': total,
-        'total_items': sum(item['cantidad'] for item in carrito_items),
-        'faltante_envio_gratis': max(0, 500 - subtotal)  # Para el mensaje de envío gratis
+        **totales,
     }
     
     return render(request, 'carrito.html', context)
@@ -146,7 +219,7 @@ def agregar_al_carrito(request):
         producto_id = int(request.POST.get('producto_id'))
         cantidad = int(request.POST.get('cantidad', 1))
         
-        producto = get_object_or_404(Producto, id=producto_id)
+        producto = get_object_or_404(Producto.objects.select_related('categoria'), id=producto_id)
         
         # Verificar stock
         if producto.stock < cantidad:
@@ -162,14 +235,12 @@ def agregar_al_carrito(request):
             'categoria': producto.categoria.nombre
         }
         
-        carrito = request.user.agregar_al_carrito(producto_id, cantidad, producto_data)
-        total_items = sum(item['cantidad'] for item in carrito)
+        totales = request.user.agregar_al_carrito(producto_id, cantidad, producto_data)
         
         return JsonResponse({
             'success': True,
             'message': f'¡{producto.nombre} agregado al carrito!',
-            'total_items': total_items,
-            'carrito': carrito
+            **totales_json(totales)
         })
         
     except Exception as e:
@@ -185,22 +256,11 @@ def actualizar_carrito(request):
         producto_id = int(request.POST.get('producto_id'))
         cantidad = int(request.POST.get('cantidad', 1))
         
-        carrito = request.user.actualizar_cantidad(producto_id, cantidad)
-        total_items = sum(item['cantidad'] for item in carrito)
-        
-        # Recalcular totales
-        subtotal = sum(item['precio'] * item['cantidad'] for item in carrito)
-        envio = 0 if subtotal >= 500 else 50
-        descuento = subtotal * 0.1 if subtotal > 300 else 0
-        total = subtotal + envio - descuento
+        totales = request.user.actualizar_cantidad(producto_id, cantidad)
         
         return JsonResponse({
             'success': True,
-            'total_items': total_items,
-            'subtotal': subtotal,
-            'envio': envio,
-            'descuento': descuento,
-            'total': total
+            **totales_json(totales)
         })
         
     except Exception as e:
@@ -215,23 +275,12 @@ def eliminar_del_carrito(request):
     try:
         producto_id = int(request.POST.get('producto_id'))
         
-        carrito = request.user.eliminar_del_carrito(producto_id)
-        total_items = sum(item['cantidad'] for item in carrito)
-        
-        # Recalcular totales
-        subtotal = sum(item['precio'] * item['cantidad'] for item in carrito)
-        envio = 0 if subtotal >= 500 else 50
-        descuento = subtotal * 0.1 if subtotal > 300 else 0
-        total = subtotal + envio - descuento
+        totales = request.user.eliminar_del_carrito(producto_id)
         
         return JsonResponse({
             'success': True,
             'message': 'Producto eliminado del carrito',
-            'total_items': total_items,
-            'subtotal': subtotal,
-            'envio': envio,
-            'descuento': descuento,
-            'total': total
+            **totales_json(totales)
         })
         
     except Exception as e:
@@ -244,16 +293,12 @@ def eliminar_del_carrito(request):
 @require_POST
 def vaciar_carrito(request):
     try:
-        carrito = request.user.vaciar_carrito()
+        totales = request.user.vaciar_carrito()
         
         return JsonResponse({
             'success': True,
             'message': 'Carrito vaciado correctamente',
-            'total_items': 0,
-            'subtotal': 0,
-            'envio': 0,
-            'descuento': 0,
-            'total': 0
+            **totales_json(totales)
         })
         
     except Exception as e:
@@ -267,12 +312,11 @@ def obtener_carrito(request):
     """Endpoint para obtener el carrito actual"""
     try:
         carrito = request.user.obtener_carrito()
-        total_items = sum(item['cantidad'] for item in carrito)
         
         return JsonResponse({
             'success': True,
             'carrito': carrito,
-            'total_items': total_items
+            **totales_json(request.user.obtener_totales_carrito())
         })
         
     except Exception as e:
@@ -280,6 +324,42 @@ def obtener_carrito(request):
             'success': False,
             'message': f'Error al obtener carrito: {str(e)}'
         })
+
+@login_required
+@require_POST
+def realizar_compra(request):
+    """Convierte el carrito en un pedido y descuenta el inventario"""
+    try:
+        pedido = procesar_compra(request.user)
+        
+        return JsonResponse({
+            'success': True,
+            'message': '¡Compra realizada exitosamente!',
+            'orden_numero': pedido.numero,
+            'total_items': pedido.total_items,
+            'subtotal': float(pedido.subtotal),
+            'envio': float(pedido.envio),
+            'descuento': float(pedido.descuento),
+            'total': float(pedido.total)
+        })
+        
+    except CarritoVacio:
+        return JsonResponse({
+            'success': False,
+            'message': 'Tu carrito está vacío'
+        })
+    except StockInsuficiente as e:
+        nombres = ', '.join(linea['nombre'] for linea in e.lineas)
+        return JsonResponse({
+            'success': False,
+            'message': f'No hay suficiente stock de: {nombres}',
+            'sin_stock': e.lineas
+        })
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': f'Error al realizar la compra: {str(e)}'
+        })
     
 def admin_required(function=None):
     """
@@ -295,69 +375,76 @@ def admin_required(function=None):
     return actual_decorator
 
 @admin_required
+@lectura_en_replica
 def inicio_admin(request):
     """Vista para el panel de administración"""
-    # Obtener estadísticas
-    total_usuarios = Usuario.objects.count()
-    total_productos = Producto.objects.count()
-    productos_bajo_stock = Producto.objects.filter(stock__lt=10).count()
-    productos_agotados = Producto.objects.filter(stock=0).count()
-    
     context = {
         'usuario': request.user,
-        'total_usuarios': total_usuarios,
-        'total_productos': total_productos,
-        'productos_bajo_stock': productos_bajo_stock,
-        'productos_agotados': productos_agotados
+        'total_usuarios': estadisticas_usuarios()['total_usuarios'],
+        **estadisticas_productos()
     }
     
     return render(request, 'inicioAdmin.html', context)
 
 @admin_required
+@lectura_en_replica
 def inventario(request):
     """Vista para gestionar el inventario"""
-    productos = Producto.objects.all().select_related('categoria')
-    categorias = Categoria.objects.all()
+    # Solo la primera página; inventario.js pide las siguientes con el cursor
+    cursor = request.GET.get('cursor')
+    limite = leer_limite(request.GET.get('limite'))
+    orden = request.GET.get('orden', 'id')
+    try:
+        if cursor:
+            validar_cursor(cursor, orden)
+    except CursorInvalido:
+        return redirect('inventario')
     
-    # Estadísticas
-    total_productos = productos.count()
-    productos_bajo_stock = productos.filter(stock__lt=10).count()
-    productos_agotados = productos.filter(stock=0).count()
+    def pagina():
+        productos, siguiente_cursor = paginar(
+            Producto.objects.using(PRIMARIO).select_related('categoria'),
+            cursor=cursor, limite=limite, orden=orden
+        )
+        return {'productos': productos, 'siguiente_cursor': siguiente_cursor}
     
+    # La página y las categorías solo se consultan si sus fragmentos no están en
+    # caché, y del primario porque quedan guardadas (ver enrutador.py)
     context = {
         'usuario': request.user,
-        'productos': productos,
-        'categorias': categorias,
-        'total_productos': total_productos,
-        'productos_bajo_stock': productos_bajo_stock,
-        'productos_agotados': productos_agotados
+        'pagina': SimpleLazyObject(pagina),
+        'cursor': cursor,
+        'limite': limite,
+        'orden': orden,
+        'categorias': Categoria.objects.using(PRIMARIO),
+        'fragmentos_timeout': fragmentos.timeout(),
+        'version_productos': catalogo.version_productos(),
+        'version_categorias': catalogo.version_categorias(),
+        **estadisticas_productos()
     }
     
     return render(request, 'inventario.html', context)
 
 @staff_member_required
+@lectura_en_replica
 def administrar_usuarios(request):
     """Vista para administrar usuarios"""
-    usuarios = Usuario.objects.all()
-    
-    # Estadísticas
-    total_usuarios = usuarios.count()
-    usuarios_activos = usuarios.filter(is_active=True).count()
-    administradores = usuarios.filter(is_staff=True).count()
+    # El queryset solo se evalúa si la tabla no está en la caché de fragmentos,
+    # y en el primario porque el fragmento queda guardado (ver enrutador.py)
+    usuarios = Usuario.objects.using(PRIMARIO)
     
     context = {
         'usuario': request.user,
         'usuarios': usuarios,
-        'total_usuarios': total_usuarios,
-        'usuarios_activos': usuarios_activos,
-        'administradores': administradores
+        'fragmentos_timeout': fragmentos.timeout(),
+        'version_usuarios': fragmentos.version_usuarios(),
+        **estadisticas_usuarios()
     }
     
     return render(request, 'administrar_usuarios.html', context)
 
 @staff_member_required
 @require_POST
-def crear_usuario(request):
+async def crear_usuario(request):
     """Crear nuevo usuario desde el panel admin"""
     try:
         nombre = request.POST.get('nombre')
@@ -371,7 +458,7 @@ def crear_usuario(request):
                 'message': 'Todos los campos son obligatorios'
             })
         
-        if Usuario.objects.filter(email=email).exists():
+        if await Usuario.objects.filter(email=email).aexists():
             return JsonResponse({
                 'success': False,
                 'message': 'Este email ya está registrado'
@@ -383,8 +470,8 @@ def crear_usuario(request):
             is_staff=es_admin,
             is_admin=es_admin
         )
-        usuario.set_password(password)
-        usuario.save()
+        usuario.password = await contrasenas.cifrar(password)
+        await usuario.asave()
         
         return JsonResponse({
             'success': True,
@@ -407,7 +494,7 @@ def editar_usuario(request):
         email = request.POST.get('email')
         es_admin = request.POST.get('es_admin') == 'true'
         
-        usuario = get_object_or_404(Usuario, id=usuario_id)
+        usuario = get_object_or_404(Usuario.objects.defer('carrito'), id=usuario_id)
         
         # Verificar si el email ya existe en otro usuario
         if Usuario.objects.filter(email=email).exclude(id=usuario_id).exists():
@@ -441,7 +528,7 @@ def cambiar_estado_usuario(request):
         usuario_id = request.POST.get('usuario_id')
         accion = request.POST.get('accion')  # 'activar' o 'desactivar'
         
-        usuario = get_object_or_404(Usuario, id=usuario_id)
+        usuario = get_object_or_404(Usuario.objects.only('id', 'nombre', 'is_active'), id=usuario_id)
         
         if accion == 'activar':
             usuario.activar()
@@ -467,7 +554,7 @@ def eliminar_usuario(request):
     """Eliminar usuario permanentemente"""
     try:
         usuario_id = request.POST.get('usuario_id')
-        usuario = get_object_or_404(Usuario, id=usuario_id)
+        usuario = get_object_or_404(Usuario.objects.only('id', 'nombre'), id=usuario_id)
         
         # No permitir eliminar al propio usuario
         if usuario.id == request.user.id:
@@ -490,6 +577,55 @@ def eliminar_usuario(request):
             'message': f'Error al eliminar usuario: {str(e)}'
         })
 
+@staff_member_required
+@require_POST
+def usuarios_masivo(request):
+    """Activar, desactivar, promover o eliminar muchos usuarios seleccionados a la vez"""
+    try:
+        datos = json.loads(request.body or b'{}')
+        if not isinstance(datos, dict):
+            raise gestion_usuarios.SeleccionInvalida('Formato de petición inválido')
+        
+        accion = datos.get('accion')
+        ids = gestion_usuarios.leer_ids(datos.get('usuario_ids'))
+        resultado = gestion_usuarios.aplicar_accion(accion, ids, request.user)
+        
+        mensaje = f'{resultado["afectados"]} usuarios actualizados'
+        if accion == 'eliminar':
+            mensaje = f'{resultado["afectados"]} usuarios eliminados permanentemente'
+        if resultado['omitidos']:
+            mensaje += ' (se omitió tu propio usuario)'
+        
+        return JsonResponse({
+            'success': True,
+            'message': mensaje,
+            **resultado
+        })
+        
+    except gestion_usuarios.SeleccionInvalida as e:
+        return JsonResponse({
+            'success': False,
+            'message': str(e)
+        }, status=400)
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'success': False,
+            'message': 'El cuerpo de la petición no es un JSON válido'
+        }, status=400)
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': f'Error en la operación masiva: {str(e)}'
+        })
+
+@staff_member_required
+def metricas_contrasenas(request):
+    """Ocupación y cola del pool que calcula los hashes de contraseñas"""
+    return JsonResponse({
+        'success': True,
+        'metricas': contrasenas.metricas()
+    })
+
 # Funciones para productos
 @staff_member_required
 @require_POST
@@ -555,6 +691,10 @@ def editar_producto(request):
         producto = get_object_or_404(Producto, id=producto_id)
         categoria = get_object_or_404(Categoria, id=categoria_id)
         
+        # Si el producto cambia de categoría, la anterior también queda desactualizada
+        if producto.categoria_id != categoria.id:
+            catalogo.invalidar_categoria(producto.categoria_id)
+        
         producto.nombre = nombre
         producto.descripcion = descripcion
         producto.precio = float(precio)
@@ -575,6 +715,44 @@ def editar_producto(request):
             'message': f'Error al editar producto: {str(e)}'
         })
 
+@staff_member_required
+@require_POST
+def ajustar_stock(request):
+    """Ajustar el stock de muchos productos a la vez (entrega de proveedor, conteo físico)"""
+    try:
+        # Cuerpo JSON {"ajustes": [...]} o campo de formulario "ajustes" con la lista en JSON
+        if request.content_type == 'application/json':
+            datos = json.loads(request.body or b'null')
+            ajustes = datos.get('ajustes') if isinstance(datos, dict) else datos
+        else:
+            ajustes = json.loads(request.POST.get('ajustes') or 'null')
+        
+        productos = aplicar_ajustes_stock(normalizar_ajustes(ajustes))
+        
+        return JsonResponse({
+            'success': True,
+            'message': f'Stock actualizado en {len(productos)} productos',
+            'productos': productos
+        })
+        
+    except AjusteInvalido as e:
+        return JsonResponse({
+            'success': False,
+            'message': str(e),
+            'lineas': e.lineas
+        }, status=400)
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'success': False,
+            'message': 'Los ajustes no son un JSON válido'
+        }, status=400)
+    except Exception as e:
+        logger.exception('Error en ajustar_stock')
+        return JsonResponse({
+            'success': False,
+            'message': f'Error al ajustar el stock: {str(e)}'
+        })
+
 @staff_member_required
 @require_POST
 def eliminar_producto(request):
@@ -597,42 +775,137 @@ def eliminar_producto(request):
             'message': f'Error al eliminar producto: {str(e)}'
         })
 
+def filtrar_por_stock(productos, filtro):
+    """Aplica el filtro de stock del inventario ('low', 'out' o 'good')"""
+    if filtro == 'low':
+        return productos.filter(stock__gt=0, stock__lt=10)
+    if filtro == 'out':
+        return productos.filter(stock=0)
+    if filtro == 'good':
+        return productos.filter(stock__gte=10)
+    return productos
+
+# Columnas que devuelve la API de productos; se leen con .values() sin crear objetos Producto
+CAMPOS_PRODUCTO_API = (
+    'id', 'nombre', 'precio', 'stock', 'categoria_id', 'categoria__nombre',
+    'destacado', 'descuento', 'descripcion',
+)
+
+def producto_api(fila):
+    """Convierte una fila de .values(*CAMPOS_PRODUCTO_API) al formato de la API"""
+    return {
+        'id_producto': fila['id'],
+        'nombre': fila['nombre'],
+        'precio': float(fila['precio']),
+        'stock': fila['stock'],
+        'categoria': fila['categoria__nombre'],
+        'categoria_id': fila['categoria_id'],
+        'destacado': fila['destacado'],
+        'descuento': fila['descuento'],
+        'descripcion': fila['descripcion'] or ''
+    }
+
 @staff_member_required
+@lectura_en_replica
 def obtener_productos_por_categoria(request):
-    """Obtener productos filtrados por categoría"""
+    """Obtener productos filtrados por categoría, una página a la vez o en streaming"""
     try:
         categoria_id = request.GET.get('categoria_id')
+        producto_id = request.GET.get('producto_id')
         
+        productos = Producto.objects.filter(activo=True)
         if categoria_id and categoria_id != '':
-            productos = Producto.objects.filter(
-                categoria_id=categoria_id, 
-                activo=True
-            ).select_related('categoria')
-        else:
-            productos = Producto.objects.filter(activo=True).select_related('categoria')
-        
-        productos_data = []
-        for producto in productos:
-            productos_data.append({
-                'id_producto': producto.id,
-                'nombre': producto.nombre,
-                'precio': float(producto.precio),
-                'stock': producto.stock,
-                'categoria': producto.categoria.nombre,
-                'categoria_id': producto.categoria.id,
-                'destacado': producto.destacado,
-                'descuento': producto.descuento,
-                'descripcion': producto.descripcion or ''
-            })
+            productos = productos.filter(categoria_id=categoria_id)
+        if producto_id:
+            productos = productos.filter(id=producto_id)
+        productos = filtrar_por_stock(productos, request.GET.get('stock'))
+        productos = productos.values(*CAMPOS_PRODUCTO_API)
+        
+        # ?stream=1 devuelve todos los productos sin paginar, generando el JSON por partes
+        if request.GET.get('stream') == '1':
+            filas = recorrer_por_lotes(productos, TAMANO_LOTE)
+            return respuesta_json_streaming('productos', map(producto_api, filas))
+        
+        pagina, siguiente_cursor = paginar(
+            productos,
+            cursor=request.GET.get('cursor'),
+            limite=leer_limite(request.GET.get('limite')),
+            orden=request.GET.get('orden', 'id'),
+        )
         
         return JsonResponse({
             'success': True,
-            'productos': productos_data
+            'productos': [producto_api(fila) for fila in pagina],
+            'siguiente_cursor': siguiente_cursor,
+            'hay_mas': siguiente_cursor is not None
         })
         
+    except CursorInvalido as e:
+        return JsonResponse({
+            'success': False,
+            'message': str(e)
+        }, status=400)
     except Exception as e:
         print(f"Error en obtener_productos_por_categoria: {str(e)}")
         return JsonResponse({
             'success': False,
             'message': f'Error al obtener productos: {str(e)}'
-        })
\ No newline at end of file
+        })
+
+@staff_member_required
+@require_POST
+def importar_productos(request):
+    """Crear o actualizar productos en masa desde un archivo CSV o JSON"""
+    try:
+        archivo = request.FILES.get('archivo')
+        if not archivo:
+            return JsonResponse({
+                'success': False,
+                'message': 'Selecciona un archivo CSV o JSON'
+            }, status=400)
+        
+        formato = importacion.formato_de(archivo.name, request.POST.get('formato'))
+        simular = request.POST.get('simular') == 'true'
+        resumen = importacion.importar(archivo, formato, simular=simular)
+        
+        if simular:
+            mensaje = f'Simulación: se crearían {resumen["creados"]} y se actualizarían {resumen["actualizados"]} productos'
+        else:
+            mensaje = f'Se crearon {resumen["creados"]} y se actualizaron {resumen["actualizados"]} productos'
+        if resumen['con_errores']:
+            mensaje += f' ({resumen["con_errores"]} filas con errores)'
+        
+        return JsonResponse({
+            'success': True,
+            'message': mensaje,
+            **resumen
+        })
+        
+    except importacion.ArchivoInvalido as e:
+        return JsonResponse({
+            'success': False,
+            'message': str(e)
+        }, status=400)
+    except Exception as e:
+        logger.exception('Error en importar_productos')
+        return JsonResponse({
+            'success': False,
+            'message': f'Error al importar productos: {str(e)}'
+        })
+
+@staff_member_required
+@lectura_en_replica
+def exportar_productos(request):
+    """Descargar el catálogo completo en CSV o JSON, generado por partes"""
+    formato = request.GET.get('formato', 'csv')
+    if formato not in importacion.FORMATOS:
+        return JsonResponse({
+            'success': False,
+            'message': 'Formato no soportado; usa CSV o JSON'
+        }, status=400)
+    
+    return respuesta_descarga_streaming(
+        importacion.exportar(formato, request.GET.get('categoria_id')),
+        importacion.FORMATOS[formato],
+        f'productos.{formato}',
+    )
\ No newline at end of file
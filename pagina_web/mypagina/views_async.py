@@ -0,0 +1,134 @@
+"""
+Versiones asíncronas de la API JSON del carrito, para servir con ASGI.
+
+urls.py las usa en lugar de las de views.py cuando VISTAS_ASINCRONAS está
+activo (asgi.py lo activa); con WSGI se siguen usando las síncronas. Las
+respuestas son idénticas en ambos casos.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import aget_object_or_404
+from django.views.decorators.http import require_POST
+from .models import Producto
+from .precios import totales_json
+
+
+@login_required
+@require_POST
+async def agregar_al_carrito(request):
+    try:
+        producto_id = int(request.POST.get('producto_id'))
+        cantidad = int(request.POST.get('cantidad', 1))
+
+        producto = await aget_object_or_404(Producto.objects.select_related('categoria'), id=producto_id)
+
+        # Verificar stock
+        if producto.stock < cantidad:
+            return JsonResponse({
+                'success': False,
+                'message': f'No hay suficiente stock. Stock disponible: {producto.stock}'
+            })
+
+        producto_data = {
+            'nombre': producto.nombre,
+            'precio': float(producto.precio),
+            # Puede consultar las categorías si la caché del catálogo está vacía
+            'imagen': await sync_to_async(producto.obtener_imagen_emoji)(),
+            'categoria': producto.categoria.nombre
+        }
+
+        usuario = await request.auser()
+        totales = await usuario.aagregar_al_carrito(producto_id, cantidad, producto_data)
+
+        return JsonResponse({
+            'success': True,
+            'message': f'¡{producto.nombre} agregado al carrito!',
+            **totales_json(totales)
+        })
+
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': f'Error al agregar al carrito: {str(e)}'
+        })
+
+@login_required
+@require_POST
+async def actualizar_carrito(request):
+    try:
+        producto_id = int(request.POST.get('producto_id'))
+        cantidad = int(request.POST.get('cantidad', 1))
+
+        usuario = await request.auser()
+        totales = await usuario.aactualizar_cantidad(producto_id, cantidad)
+
+        return JsonResponse({
+            'success': True,
+            **totales_json(totales)
+        })
+
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': f'Error al actualizar carrito: {str(e)}'
+        })
+
+@login_required
+@require_POST
+async def eliminar_del_carrito(request):
+    try:
+        producto_id = int(request.POST.get('producto_id'))
+
+        usuario = await request.auser()
+        totales = await usuario.aeliminar_del_carrito(producto_id)
+
+        return JsonResponse({
+            'success': True,
+            'message': 'Producto eliminado del carrito',
+            **totales_json(totales)
+        })
+
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': f'Error al eliminar del carrito: {str(e)}'
+        })
+
+@login_required
+@require_POST
+async def vaciar_carrito(request):
+    try:
+        usuario = await request.auser()
+        totales = await usuario.avaciar_carrito()
+
+        return JsonResponse({
+            'success': True,
+            'message': 'Carrito vaciado correctamente',
+            **totales_json(totales)
+        })
+
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': f'Error al vaciar carrito: {str(e)}'
+        })
+
+@login_required
+async def obtener_carrito(request):
+    """Endpoint para obtener el carrito actual"""
+    try:
+        usuario = await request.auser()
+        carrito = await usuario.aobtener_carrito()
+
+        return JsonResponse({
+            'success': True,
+            'carrito': carrito,
+            **totales_json(await usuario.aobtener_totales_carrito())
+        })
+
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': f'Error al obtener carrito: {str(e)}'
+        })
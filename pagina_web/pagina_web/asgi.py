@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pagina_web.settings')
+# La API del carrito usa sus vistas asíncronas (ver mypagina/views_async.py)
+os.environ.setdefault('VISTAS_ASINCRONAS', '1')
 
 application = get_asgi_application()
@@ -1,4 +1,6 @@
+import os
 from pathlib import Path
+from django.core.exceptions import ImproperlyConfigured
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -25,22 +27,35 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Antes que las sesiones: un archivo estático no necesita nada más
+    'mypagina.estaticos.EstaticosMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'mypagina.enrutador.ReplicasMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'pagina_web.urls'
 
+# Fuera de DEBUG cada plantilla se compila una sola vez por proceso. Se declara
+# aquí para que no se pierda al agregar cargadores; con DEBUG se leen del disco
+# en cada petición, como hace Django, para que los cambios se vean al instante.
+CARGADORES_PLANTILLAS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if not DEBUG:
+    CARGADORES_PLANTILLAS = [('django.template.loaders.cached.Loader', CARGADORES_PLANTILLAS)]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': CARGADORES_PLANTILLAS,
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
@@ -59,14 +74,202 @@ WSGI_APPLICATION = 'pagina_web.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'postgres', 
-        'USER': 'postgres.yxerbrzojxpbmhnuucks', 
-        'PASSWORD': 'Invierno_2018',
-        'HOST': 'aws-0-us-west-2.pooler.supabase.com', 
-        'PORT': '5432',
+        'NAME': os.environ.get('DB_NAME', 'postgres'),
+        'USER': os.environ.get('DB_USER', 'postgres.yxerbrzojxpbmhnuucks'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', 'Invierno_2018'),
+        'HOST': os.environ.get('DB_HOST', 'aws-0-us-west-2.pooler.supabase.com'),
+        'PORT': os.environ.get('DB_PORT', '5432'),
     }
 }
 
+# Manejo de conexiones según lo que haya entre Django y Postgres (DB_PERFIL).
+# Abrir una conexión al pooler remoto cuesta el saludo TLS y la autenticación,
+# así que se reutilizan entre peticiones y se revisan antes de usarlas.
+#  - 'pooler-transacciones': PgBouncer/Supavisor en modo transacción. Cada
+#    transacción puede ir a otro backend, así que no hay cursores con nombre
+#    (los recorridos grandes usan paginacion.recorrer_por_lotes).
+#  - 'pooler-sesion' / 'directo': el backend es fijo durante la conexión.
+#  - 'pool': pool de psycopg dentro del proceso (requiere psycopg[pool]).
+#    Es el indicado con ASGI, donde cada petición corre en su propio hilo y
+#    las conexiones persistentes por hilo no se reutilizan.
+#  - 'sin-persistencia': una conexión nueva por petición (comportamiento anterior).
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 600))
+
+PERFILES_DB = {
+    'pooler-transacciones': {
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'DISABLE_SERVER_SIDE_CURSORS': True,
+    },
+    'pooler-sesion': {'CONN_MAX_AGE': DB_CONN_MAX_AGE, 'CONN_HEALTH_CHECKS': True},
+    'directo': {'CONN_MAX_AGE': DB_CONN_MAX_AGE, 'CONN_HEALTH_CHECKS': True},
+    'pool': {
+        # Django no permite combinar el pool con CONN_MAX_AGE
+        'CONN_MAX_AGE': 0,
+        'OPTIONS': {'pool': {
+            'min_size': int(os.environ.get('DB_POOL_MIN', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX', 10)),
+            'timeout': 10,
+        }},
+    },
+    'sin-persistencia': {'CONN_MAX_AGE': 0},
+}
+
+DB_PERFIL = os.environ.get('DB_PERFIL', 'pooler-transacciones')
+if DB_PERFIL not in PERFILES_DB:
+    raise ImproperlyConfigured(f'DB_PERFIL debe ser uno de: {", ".join(PERFILES_DB)}')
+DATABASES['default'].update(PERFILES_DB[DB_PERFIL])
+
+# Sin acceso a la base remota (desarrollo local y pruebas): DB_LOCAL=1 usa SQLite
+if os.environ.get('DB_LOCAL') == '1':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+    # SQLite crea los índices de Pedido y PedidoLinea sin las columnas INCLUDE
+    # (solo Postgres las admite); el índice sigue sirviendo, así que el aviso
+    # en cada comando y en cada corrida de pruebas sobra
+    SILENCED_SYSTEM_CHECKS = ['models.W040']
+    # Un segundo archivo hace de réplica para probar el enrutador en local;
+    # se copia del primario con manage.py sincronizar_replica
+    if os.environ.get('DB_REPLICA_LOCAL') == '1':
+        DATABASES['replica1'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db_replica.sqlite3',
+        }
+else:
+    # Réplicas de lectura (ver mypagina/enrutador.py): hosts separados por
+    # comas con los mismos datos que 'default'
+    for numero, host in enumerate(filter(None, os.environ.get('DB_REPLICAS', '').split(',')), start=1):
+        DATABASES[f'replica{numero}'] = {**DATABASES['default'], 'HOST': host.strip()}
+
+# En las pruebas las réplicas apuntan a la misma base que 'default'
+for alias in DATABASES:
+    if alias != 'default':
+        DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['mypagina.enrutador.EnrutadorReplicas']
+REPLICA_COOKIE = 'leer_primario'
+# Segundos que se leen del primario después de modificar datos
+REPLICA_PEGAJOSIDAD = 10
+
+TEST_RUNNER = 'mypagina.runner.TestRunner'
+
+
+# Cache
+# La caché del catálogo puede ser compartida entre los procesos del mismo
+# servidor mediante archivos ('file') o local a cada proceso ('locmem'). Con
+# 'locmem' invalidar_categoria solo cambia las versiones del worker que hizo
+# el cambio y los demás mostrarían precios y stock viejos hasta
+# CATALOGO_CACHE_TIMEOUT, así que solo sirve con un único proceso (runserver).
+# manage.py check avisa si una caché que debe ser compartida es local.
+
+CATALOGO_CACHE = os.environ.get('CATALOGO_CACHE', 'file')
+if CATALOGO_CACHE not in ('file', 'locmem'):
+    raise ImproperlyConfigured('CATALOGO_CACHE debe ser uno de: file, locmem')
+
+# Las sesiones deben verse igual desde todos los procesos: con 'locmem' un
+# cierre de sesión hecho en un worker no llega a los demás, así que solo
+# sirve con un único proceso (runserver). 'file' se comparte entre los
+# procesos del mismo servidor y 'redis' entre servidores (requiere redis-py).
+# 'file' usa CacheArchivos (mypagina/cache_archivos.py): revisa el directorio
+# solo de vez en cuando y al llenarse descarta primero las sesiones vencidas,
+# pero con cientos de miles de sesiones activas conviene 'redis'. Los archivos
+# vencidos se borran con manage.py limpiar_sesiones.
+SESIONES_CACHE = os.environ.get('SESIONES_CACHE', 'file')
+
+CACHES_SESIONES = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sesiones',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    'file': {
+        'BACKEND': 'mypagina.cache_archivos.CacheArchivos',
+        'LOCATION': os.environ.get('SESIONES_CACHE_DIR', str(BASE_DIR / 'cache' / 'sesiones')),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('SESIONES_CACHE_URL', 'redis://127.0.0.1:6379/1'),
+    },
+}
+if SESIONES_CACHE not in CACHES_SESIONES:
+    raise ImproperlyConfigured(f'SESIONES_CACHE debe ser uno de: {", ".join(CACHES_SESIONES)}')
+
+# Datos que se escriben o invalidan desde cualquier worker y deben verse igual
+# en todos: los contadores del panel (estadisticas.py), request.user
+# (autenticacion.py) y los avisos de altas y cambios de correo para los
+# filtros de correos.py. Mismas opciones que
+# SESIONES_CACHE; 'locmem' solo sirve con un único proceso, porque la
+# invalidación de un worker no llegaría a los demás.
+COMPARTIDA_CACHE = os.environ.get('COMPARTIDA_CACHE', 'file')
+
+CACHES_COMPARTIDA = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'compartida',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'file': {
+        'BACKEND': 'mypagina.cache_archivos.CacheArchivos',
+        'LOCATION': os.environ.get('COMPARTIDA_CACHE_DIR', str(BASE_DIR / 'cache' / 'compartida')),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('COMPARTIDA_CACHE_URL', 'redis://127.0.0.1:6379/2'),
+    },
+}
+if COMPARTIDA_CACHE not in CACHES_COMPARTIDA:
+    raise ImproperlyConfigured(f'COMPARTIDA_CACHE debe ser uno de: {", ".join(CACHES_COMPARTIDA)}')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalogo': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'catalogo',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    } if CATALOGO_CACHE == 'locmem' else {
+        'BACKEND': 'mypagina.cache_archivos.CacheArchivos',
+        'LOCATION': os.environ.get('CATALOGO_CACHE_DIR', str(BASE_DIR / 'cache' / 'catalogo')),
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+    'sesiones': CACHES_SESIONES[SESIONES_CACHE],
+    'compartida': CACHES_COMPARTIDA[COMPARTIDA_CACHE],
+    # {% cache %} de las plantillas (ver mypagina/fragmentos.py). Siempre local:
+    # se reconstruye en cada proceso y desaparece al desplegar plantillas nuevas
+    'template_fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'fragmentos',
+        'OPTIONS': {'MAX_ENTRIES': 2000},
+    },
+}
+
+CATALOGO_CACHE_TIMEOUT = 60 * 60 * 24
+ESTADISTICAS_CACHE_ALIAS = 'compartida'
+CORREOS_CACHE_ALIAS = 'compartida'
+ESTADISTICAS_CACHE_TIMEOUT = 60 * 60
+FRAGMENTOS_CACHE_TIMEOUT = 60 * 60
+
+
+# Vistas asíncronas de la API del carrito; asgi.py las activa y con WSGI
+# se usan las síncronas.
+
+VISTAS_ASINCRONAS = os.environ.get('VISTAS_ASINCRONAS') == '1'
+
+
+# Hash de contraseñas en las vistas asíncronas de login y registro:
+# hashes calculados a la vez y peticiones que pueden esperar turno antes de
+# responder 503 (ver mypagina/contrasenas.py).
+
+CONTRASENAS_MAX_CONCURRENCIA = int(os.environ.get('CONTRASENAS_MAX_CONCURRENCIA', os.cpu_count() or 1))
+CONTRASENAS_MAX_COLA = int(os.environ.get('CONTRASENAS_MAX_COLA', 64))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -88,13 +291,45 @@ AUTH_PASSWORD_VALIDATORS = [
 # Después de AUTH_PASSWORD_VALIDATORS
 AUTH_USER_MODEL = 'mypagina.Usuario'
 
+# request.user se carga sin la columna carrito y se guarda por
+# USUARIO_CACHE_TIMEOUT segundos en USUARIO_CACHE_ALIAS, que debe ser una caché
+# compartida: guarda is_active e is_staff (ver mypagina/autenticacion.py).
+# ModelBackend sigue en la lista para no cerrar las sesiones iniciadas antes con él.
+AUTHENTICATION_BACKENDS = [
+    'mypagina.autenticacion.UsuarioLigeroBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+USUARIO_CACHE_ALIAS = 'compartida'
+USUARIO_CACHE_TIMEOUT = 60
+
+# Sesiones (SESIONES_PERFIL):
+#  - 'cached_db': se leen de la caché 'sesiones' y solo se escriben en la base
+#    al cambiar (iniciar o cerrar sesión). Si la caché pierde una entrada, se
+#    recupera de la base.
+#  - 'cache': solo en la caché 'sesiones'; ninguna escritura a la base, pero
+#    vaciar o reiniciar la caché cierra todas las sesiones.
+#  - 'db': solo en la base; una lectura por petición (comportamiento anterior).
+# Las filas vencidas se borran con manage.py limpiar_sesiones.
+PERFILES_SESION = {
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'db': 'django.contrib.sessions.backends.db',
+}
+
+SESIONES_PERFIL = os.environ.get('SESIONES_PERFIL', 'cached_db')
+if SESIONES_PERFIL not in PERFILES_SESION:
+    raise ImproperlyConfigured(f'SESIONES_PERFIL debe ser uno de: {", ".join(PERFILES_SESION)}')
+SESSION_ENGINE = PERFILES_SESION[SESIONES_PERFIL]
+SESSION_CACHE_ALIAS = 'sesiones'
+
 # Agrega estas configuraciones de sesión
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/inicioUsuario/'
 LOGOUT_REDIRECT_URL = '/'
 
-# Configuración para mensajes
-MESSAGE_STORAGE = 'django.contrib.messages.storage.session.SessionStorage'
+# Configuración para mensajes: viajan en una cookie firmada y solo pasan a la
+# sesión si no caben, así que un mensaje ya no obliga a guardar la sesión
+MESSAGE_STORAGE = 'django.contrib.messages.storage.fallback.FallbackStorage'
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -113,6 +348,26 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# manage.py construir_estaticos deja aquí los archivos minificados, con hash y
+# comprimidos (.gz y, si está instalado brotli, .br); ver mypagina/estaticos.py.
+# Con DEBUG en False los sirve EstaticosMiddleware; sin construir, las
+# plantillas siguen usando los archivos originales.
+STATIC_ROOT = os.environ.get('STATIC_ROOT', BASE_DIR / 'staticfiles')
+
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'mypagina.estaticos.AlmacenEstaticos'},
+}
+
+# Archivos que se sirven juntos en una sola petición ({% paquete %} en las
+# plantillas). El orden importa: admin.css usa las variables de inicioUsuario.css
+PAQUETES_ESTATICOS = {
+    'css/panel.css': ['css/inicioUsuario.css', 'css/admin.css'],
+}
+
+# Cache-Control de los estáticos sin hash (imágenes referidas por nombre fijo)
+ESTATICOS_MAX_AGE = 60
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 